@@ -0,0 +1,3 @@
+"""
+性能基准脚本包初始化文件
+"""
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+绘图基础操作基准：对比 draw.imaging 中的渐变、圆角遮罩、白底替换与原先逐行/逐像素实现的耗时，
+并校验两者输出逐像素一致
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.draw_primitives --repeat 20
+"""
+import argparse
+import time
+from typing import Callable, Tuple
+
+from PIL import Image, ImageDraw
+
+from ..draw import assets, imaging
+
+# 帮助图片和状态图片的画布与配色
+HELP_GRADIENT = ((800, 2800), (240, 248, 255), (255, 255, 255))
+STATE_GRADIENT = ((620, 540), (174, 214, 241), (245, 251, 255))
+AVATAR_SIZE = 60
+
+
+# ==================原实现（对照）==================
+def loop_vertical_gradient(size, top_color, bottom_color) -> Image.Image:
+    """逐行 draw.line 绘制渐变"""
+    w, h = size
+    base = Image.new('RGB', (w, h), top_color)
+    draw = ImageDraw.Draw(base)
+    for y in range(h):
+        ratio = y / (h - 1)
+        color = tuple(int(top + (bottom - top) * ratio) for top, bottom in zip(top_color, bottom_color))
+        draw.line([(0, y), (w, y)], fill=color)
+    return base
+
+
+def loop_rounded_mask(size: int, radius: int, scale_factor: int = 4) -> Image.Image:
+    """每次重新绘制 4 倍超采样的遮罩"""
+    large_size = size * scale_factor
+    large_mask = Image.new('L', (large_size, large_size), 0)
+    ImageDraw.Draw(large_mask).rounded_rectangle([0, 0, large_size, large_size],
+                                                 radius=radius * scale_factor, fill=255)
+    return large_mask.resize((size, size), Image.Resampling.LANCZOS)
+
+
+def loop_replace_white(img: Image.Image, new_color, threshold: int = 240) -> Image.Image:
+    """逐像素替换白色背景"""
+    img = img.convert("RGBA")
+    new_data = []
+    for item in img.getdata():
+        r, g, b, alpha = item
+        if r >= threshold and g >= threshold and b >= threshold:
+            new_data.append((*new_color, alpha))
+        else:
+            new_data.append(item)
+    img.putdata(new_data)
+    return img
+
+
+# ==================计时==================
+def measure(func: Callable, repeat: int) -> float:
+    """平均每次调用的耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def compare(name: str, old: Callable, new: Callable, clear: Callable, repeat: int) -> Tuple[float, float]:
+    """校验输出一致并打印原实现、新实现（未缓存）和新实现（缓存命中）的耗时"""
+    if old().tobytes() != new().tobytes():
+        raise SystemExit(f"{name}: 新旧实现的输出不一致")
+
+    old_ms = measure(old, repeat)
+    cold_ms = measure(lambda: (clear(), new()), repeat)
+    warm_ms = measure(new, repeat)
+    print(f"{name:<18} 原实现 {old_ms:8.2f}ms  新实现 {cold_ms:8.2f}ms  缓存命中 {warm_ms:8.3f}ms")
+    return old_ms, warm_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="绘图基础操作基准")
+    parser.add_argument("--repeat", type=int, default=10, help="每项操作的重复次数")
+    args = parser.parse_args()
+
+    logo_path = assets.resource_path("astrbot_logo.jpg")
+    logo = Image.open(logo_path)
+    logo.load()
+    avatar_radius = AVATAR_SIZE // 8
+
+    results = [
+        compare("帮助渐变 800x2800",
+                lambda: loop_vertical_gradient(*HELP_GRADIENT),
+                lambda: imaging.vertical_gradient(*HELP_GRADIENT),
+                imaging.vertical_gradient.cache_clear, args.repeat),
+        compare("状态渐变 620x540",
+                lambda: loop_vertical_gradient(*STATE_GRADIENT),
+                lambda: imaging.vertical_gradient(*STATE_GRADIENT),
+                imaging.vertical_gradient.cache_clear, args.repeat),
+        compare("头像遮罩 60x60",
+                lambda: loop_rounded_mask(AVATAR_SIZE, avatar_radius),
+                lambda: imaging.rounded_mask((AVATAR_SIZE, AVATAR_SIZE), avatar_radius, supersample=4),
+                imaging.rounded_mask.cache_clear, args.repeat),
+        compare("logo 白底替换",
+                lambda: loop_replace_white(logo, HELP_GRADIENT[1]),
+                lambda: imaging.replace_near_white_file(logo_path, HELP_GRADIENT[1]),
+                imaging.replace_near_white_file.cache_clear, args.repeat),
+    ]
+
+    saved = sum(old - new for old, new in results)
+    print(f"\n绘制一次帮助底图、状态底图和头像共节省约 {saved:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""
+钓鱼命令 SQL 语句数基准：统计单次 /钓鱼 执行的 SQL 语句数量，并校验不超过上限
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.fish_statements --commands 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from ..enums.messages import Messages
+from ..models.database import DatabaseManager
+from ..models.user import User
+from ..services.fishing_service import FishingService
+
+USER_ID = "bench_angler"
+
+# 单条 /钓鱼 命令允许执行的 SQL 语句上限（不含 BEGIN/COMMIT 等事务控制语句）
+STATEMENT_UPPER_BOUND = 18
+
+
+class _Event:
+    """最小化的消息事件，只提供钓鱼命令用到的接口"""
+
+    def get_sender_id(self):
+        return USER_ID
+
+    def get_sender_name(self):
+        return USER_ID
+
+    def plain_result(self, text):
+        return text
+
+
+class _StatementCounter:
+    """包装 DatabaseManager 的连接，统计执行过的 SQL 语句"""
+
+    def __init__(self, db: DatabaseManager):
+        self.statements = []
+        self._get_connection = db.get_connection
+        db.get_connection = self._connect
+
+    def _connect(self):
+        conn = self._get_connection()
+        conn.set_trace_callback(self._trace)
+        return conn
+
+    def _trace(self, statement: str):
+        if statement.split(None, 1)[0].upper() not in ("BEGIN", "COMMIT", "ROLLBACK"):
+            self.statements.append(statement)
+
+    def take(self) -> list:
+        statements, self.statements = self.statements, []
+        return statements
+
+
+def _setup(db: DatabaseManager) -> None:
+    """创建测试用户并装备新手鱼竿"""
+    now = int(time.time())
+    db.execute_query(
+        "INSERT INTO users (user_id, nickname, gold, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+        (USER_ID, USER_ID, 10 ** 9, now, now)
+    )
+    db.execute_query(
+        """INSERT INTO user_rod_instances (user_id, rod_template_id, level, exp, is_equipped, acquired_at, durability)
+           VALUES (?, 1, 1, 0, TRUE, ?, NULL)""",
+        (USER_ID, now)
+    )
+
+
+async def _run_command(service: FishingService) -> str:
+    messages = [message async for message in service.fish_command(_Event())]
+    return messages[-1]
+
+
+def run(commands: int = 200, seed: int = 0) -> dict:
+    """执行若干次钓鱼命令，返回每条命令的语句数统计"""
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        _setup(db)
+        service = FishingService(db)
+        # 科技列表在第一次升级时加载（每个进程一次），不计入单条命令的语句数
+        service.user_service._all_technologies
+        counter = _StatementCounter(db)
+
+        caught, missed = [], []
+        loop = asyncio.new_event_loop()
+        try:
+            for _ in range(commands):
+                # 跳过冷却时间
+                db.execute_query("UPDATE users SET last_fishing_time = 0 WHERE user_id = ?", (USER_ID,))
+                counter.take()
+
+                message = loop.run_until_complete(_run_command(service))
+                count = len(counter.take())
+                (missed if message == Messages.FISHING_FAILURE.value else caught).append(count)
+        finally:
+            loop.close()
+
+    return {
+        'commands': commands,
+        'caught': caught,
+        'missed': missed,
+        'max': max(caught + missed),
+        'bound': STATEMENT_UPPER_BOUND,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="钓鱼命令 SQL 语句数基准")
+    parser.add_argument("--commands", type=int, default=200, help="执行的钓鱼命令次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--verbose", action="store_true", help="打印一次成功钓鱼执行的全部语句")
+    args = parser.parse_args()
+
+    result = run(args.commands, args.seed)
+    for name, counts in (("钓到鱼", result['caught']), ("空军", result['missed'])):
+        if counts:
+            print(f"{name}: {len(counts)} 次  平均 {sum(counts) / len(counts):.1f} 条语句  最多 {max(counts)} 条")
+    print(f"单条命令最多 {result['max']} 条语句，上限 {result['bound']} 条")
+
+    if args.verbose:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+            _setup(db)
+            service = FishingService(db)
+            counter = _StatementCounter(db)
+            random.seed(args.seed)
+            while True:
+                db.execute_query("UPDATE users SET last_fishing_time = 0 WHERE user_id = ?", (USER_ID,))
+                counter.take()
+                message = asyncio.run(_run_command(service))
+                statements = counter.take()
+                if message != Messages.FISHING_FAILURE.value:
+                    break
+            for statement in statements:
+                print("  " + " ".join(statement.split()))
+
+    if result['max'] > result['bound']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
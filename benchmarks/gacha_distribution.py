@@ -0,0 +1,239 @@
+"""
+抽卡概率校验与吞吐基准：用真实的抽卡采样代码模拟大量抽卡，
+对比观测概率与卡池配置概率（卡方检验），并统计每秒抽卡次数
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.gacha_distribution --draws 2000000
+    python -m astrbot_plugin_gaismanor.benchmarks.gacha_distribution --db data/fishing.db --pool 1
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from ..models.database import DatabaseManager
+from ..services.gacha_service import GachaService
+
+# 每个工作进程持有的抽卡服务
+_worker_service: Optional[GachaService] = None
+
+
+def _init_worker(db_path: str) -> None:
+    """工作进程初始化：用同一个数据库编译卡池"""
+    global _worker_service
+    _worker_service = GachaService(DatabaseManager(db_path))
+
+
+def _draw_chunk(args: Tuple[int, int, int]) -> Counter:
+    """在工作进程中通过 GachaService.draw_item 完整抽卡路径抽取一批"""
+    pool_id, count, seed = args
+    random.seed(seed)
+    draw_item = _worker_service.draw_item
+    counts = Counter()
+    for _ in range(count):
+        item = draw_item(pool_id)
+        counts[(item.item_type, item.template_id, item.rarity)] += 1
+    return counts
+
+
+def _regularized_gamma_q(a: float, x: float) -> float:
+    """正则化上不完全伽马函数 Q(a, x)，用于计算卡方分布的 p 值"""
+    if x <= 0:
+        return 1.0
+    log_prefix = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        # 级数展开求 P(a, x)
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+
+    # 连分式求 Q(a, x)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return h * math.exp(log_prefix)
+
+
+def chi_square(observed: List[int], expected_probabilities: List[float]) -> Dict[str, float]:
+    """对观测次数与期望概率做卡方拟合优度检验"""
+    total = sum(observed)
+    statistic = sum(
+        (count - total * p) ** 2 / (total * p)
+        for count, p in zip(observed, expected_probabilities) if p > 0
+    )
+    df = max(1, sum(1 for p in expected_probabilities if p > 0) - 1)
+    return {'statistic': statistic, 'df': df, 'p_value': _regularized_gamma_q(df / 2, statistic / 2)}
+
+
+def expected_item_probabilities(pool) -> Dict[Tuple[str, int, int], float]:
+    """根据编译后的卡池计算每件物品的理论抽中概率"""
+    total_weight = sum(pool.effective_weights.values())
+    probabilities = {}
+    for rarity, weight in pool.effective_weights.items():
+        types = pool.types_by_rarity[rarity]
+        for item_type in types:
+            items = pool.items_by_type_rarity[(item_type, rarity)]
+            for item in items:
+                key = (item.item_type, item.template_id, item.rarity)
+                probabilities[key] = probabilities.get(key, 0.0) + weight / total_weight / len(types) / len(items)
+    return probabilities
+
+
+def run_vectorized(service: GachaService, pool_id: int, draws: int, seed: Optional[int] = None) -> dict:
+    """用卡池的别名采样表向量化抽取稀有度"""
+    pool = service.get_gacha_pools()[pool_id]
+    start = time.perf_counter()
+    rarities = pool.rarity_sampler.sample_many(draws, seed)
+    elapsed = time.perf_counter() - start
+
+    counts = Counter(int(rarity) for rarity in rarities)
+    return {'rarity_counts': counts, 'item_counts': None, 'elapsed': elapsed}
+
+
+def run_processes(db_path: str, pool_id: int, draws: int, workers: int, seed: Optional[int] = None) -> dict:
+    """多进程调用 GachaService.draw_item 完整抽卡路径"""
+    base_seed = seed if seed is not None else random.randrange(1 << 30)
+    chunks = workers * 4
+    sizes = [draws // chunks + (1 if i < draws % chunks else 0) for i in range(chunks)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_path,)) as pool:
+        # 先让每个进程完成初始化，计时只包含抽卡本身
+        list(pool.map(_draw_chunk, [(pool_id, 1, base_seed)] * workers))
+        start = time.perf_counter()
+        results = list(pool.map(_draw_chunk, [(pool_id, size, base_seed + i) for i, size in enumerate(sizes)]))
+        elapsed = time.perf_counter() - start
+
+    item_counts = Counter()
+    for counts in results:
+        item_counts.update(counts)
+    rarity_counts = Counter()
+    for (_, _, rarity), count in item_counts.items():
+        rarity_counts[rarity] += count
+    return {'rarity_counts': rarity_counts, 'item_counts': item_counts, 'elapsed': elapsed}
+
+
+def verify(service: GachaService, pool_id: int, result: dict) -> dict:
+    """对比观测概率与配置概率"""
+    pool = service.get_gacha_pools()[pool_id]
+    draws = sum(result['rarity_counts'].values())
+    configured_total = sum(pool.rarity_weights.values())
+    effective_total = sum(pool.effective_weights.values())
+
+    rarities = sorted(set(pool.rarity_weights) | set(result['rarity_counts']))
+    rows = []
+    for rarity in rarities:
+        rows.append({
+            'rarity': rarity,
+            'configured': pool.rarity_weights.get(rarity, 0) / configured_total if configured_total else 0.0,
+            'effective': pool.effective_weights.get(rarity, 0) / effective_total if effective_total else 0.0,
+            'observed': result['rarity_counts'].get(rarity, 0) / draws,
+        })
+
+    report = {
+        'draws': draws,
+        'draws_per_second': draws / result['elapsed'] if result['elapsed'] else 0.0,
+        'rarities': rows,
+        'rarity_chi_square': chi_square(
+            [result['rarity_counts'].get(row['rarity'], 0) for row in rows],
+            [row['effective'] for row in rows]
+        ),
+        'item_chi_square': None,
+    }
+
+    if result['item_counts'] is not None:
+        probabilities = expected_item_probabilities(pool)
+        keys = sorted(set(probabilities) | set(result['item_counts']))
+        report['item_chi_square'] = chi_square(
+            [result['item_counts'].get(key, 0) for key in keys],
+            [probabilities.get(key, 0.0) for key in keys]
+        )
+    return report
+
+
+def _print_report(title: str, report: dict, alpha: float) -> bool:
+    """打印校验结果，返回是否通过"""
+    print(f"\n--- {title} ---")
+    print(f"抽卡次数: {report['draws']}  吞吐: {report['draws_per_second']:,.0f} 次/秒")
+    print("稀有度   配置概率   生效概率   观测概率   偏差")
+    for row in report['rarities']:
+        print(f"  {row['rarity']}★    {row['configured']:8.4%}  {row['effective']:8.4%}  "
+              f"{row['observed']:8.4%}  {row['observed'] - row['effective']:+.4%}")
+
+    passed = True
+    for name, result in (("稀有度", report['rarity_chi_square']), ("物品", report['item_chi_square'])):
+        if result is None:
+            continue
+        ok = result['p_value'] >= alpha
+        passed = passed and ok
+        print(f"{name}卡方: χ²={result['statistic']:.2f}  自由度={result['df']}  "
+              f"p={result['p_value']:.4f}  {'通过' if ok else '不通过'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抽卡概率校验与吞吐基准")
+    parser.add_argument("--db", help="要校验的数据库文件，默认使用初始数据新建临时数据库")
+    parser.add_argument("--pool", type=int, action="append", help="要校验的卡池ID，可重复指定，默认全部")
+    parser.add_argument("--draws", type=int, default=1_000_000, help="每个卡池的模拟抽卡次数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="多进程模式的进程数")
+    parser.add_argument("--mode", choices=("vector", "process", "both"), default="both",
+                        help="vector: 向量化别名表抽样；process: 多进程完整抽卡路径")
+    parser.add_argument("--alpha", type=float, default=0.001, help="卡方检验的显著性水平")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = args.db or os.path.join(tmp_dir, "bench.db")
+        service = GachaService(DatabaseManager(db_path))
+        pools = service.get_gacha_pools()
+        pool_ids = args.pool or sorted(pools)
+
+        passed = True
+        for pool_id in pool_ids:
+            pool = pools.get(pool_id)
+            if not pool or not pool.rarity_sampler:
+                print(f"卡池 {pool_id} 不存在或没有可抽取的物品")
+                passed = False
+                continue
+
+            print(f"\n=== 卡池 {pool_id}: {pool.name} ===")
+            if pool.effective_weights != {r: w for r, w in pool.rarity_weights.items() if w > 0}:
+                print("注意: 部分稀有度没有物品，已从抽样中剔除，生效概率与配置不同")
+
+            if args.mode in ("vector", "both"):
+                report = verify(service, pool_id, run_vectorized(service, pool_id, args.draws, args.seed))
+                passed = _print_report("向量化别名表抽样", report, args.alpha) and passed
+            if args.mode in ("process", "both"):
+                result = run_processes(db_path, pool_id, args.draws, args.workers, args.seed)
+                report = verify(service, pool_id, result)
+                passed = _print_report(f"{args.workers} 进程完整抽卡路径", report, args.alpha) and passed
+
+    if not passed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
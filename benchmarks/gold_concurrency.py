@@ -0,0 +1,127 @@
+"""
+金币并发写回校验：多个线程同时对少数几个用户执行命令写回（CommandContext.flush）和金币增减（add_gold / deduct_gold），
+校验所有成功的金币变化都体现在最终余额中，没有被整行写回覆盖
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.gold_concurrency --threads 16 --ops 200
+加 --full-row 时命令按整行写回（修改前的行为），用来对比会丢失多少金币
+"""
+import argparse
+import dataclasses
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..dao.command_context import CommandContext
+from ..dao.user_dao import UserDAO
+from ..models.database import DatabaseManager
+
+INITIAL_GOLD = 10 ** 6
+
+
+def _setup(db: DatabaseManager, users: int) -> list:
+    now = int(time.time())
+    user_ids = [f"bench_{i}" for i in range(users)]
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, nickname, gold, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(user_id, user_id, INITIAL_GOLD, now, now) for user_id in user_ids]
+        )
+    return user_ids
+
+
+def _worker(db: DatabaseManager, user_ids: list, ops: int, full_row: bool, seed: int) -> dict:
+    """执行 ops 次随机操作，返回每个用户成功的金币变化和命令写回次数"""
+    rng = random.Random(seed)
+    dao = UserDAO(db)
+    gold = dict.fromkeys(user_ids, 0)
+    commands = dict.fromkeys(user_ids, 0)
+    for _ in range(ops):
+        user_id = rng.choice(user_ids)
+        amount = rng.randint(1, 50)
+        op = rng.randrange(3)
+        if op == 0:
+            # 命令：读取用户，修改金币和钓鱼次数，稍后写回
+            ctx = CommandContext(db)
+            user = ctx.get_user(user_id)
+            delta = rng.randint(-20, 50)
+            user.gold += delta
+            user.fishing_count += 1
+            time.sleep(rng.random() * 0.002)  # 命令执行期间其他线程可能修改了金币
+            if full_row:
+                ok = dao.update_user(dataclasses.replace(user))
+            else:
+                ctx.mark_dirty(user)
+                ok = ctx.flush()
+            if ok:
+                gold[user_id] += delta
+                commands[user_id] += 1
+        elif op == 1:
+            if dao.add_gold(user_id, amount):
+                gold[user_id] += amount
+        elif dao.deduct_gold(user_id, amount):
+            gold[user_id] -= amount
+    return {'gold': gold, 'commands': commands}
+
+
+def run(threads: int = 16, ops: int = 200, users: int = 4, full_row: bool = False, seed: int = 0) -> dict:
+    """执行校验，返回各用户预期与实际的金币"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        user_ids = _setup(db, users)
+
+        barrier = threading.Barrier(threads)
+
+        def task(index):
+            barrier.wait()
+            return _worker(db, user_ids, ops, full_row, seed + index)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(task, range(threads)))
+        elapsed = time.perf_counter() - start
+
+        errors = []
+        lost = 0
+        for user_id in user_ids:
+            expected_gold = INITIAL_GOLD + sum(result['gold'][user_id] for result in results)
+            expected_commands = sum(result['commands'][user_id] for result in results)
+            row = db.fetch_one("SELECT gold, fishing_count FROM users WHERE user_id = ?", (user_id,))
+            if row['gold'] != expected_gold:
+                lost += abs(expected_gold - row['gold'])
+                errors.append(f"{user_id} 金币应为 {expected_gold}，实际 {row['gold']}")
+            if not full_row and row['fishing_count'] != expected_commands:
+                errors.append(f"{user_id} 钓鱼次数应为 {expected_commands}，实际 {row['fishing_count']}")
+
+        return {
+            'operations': threads * ops,
+            'elapsed': elapsed,
+            'lost_gold': lost,
+            'errors': errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="金币并发写回校验")
+    parser.add_argument("--threads", type=int, default=16, help="并发线程数")
+    parser.add_argument("--ops", type=int, default=200, help="每个线程的操作次数")
+    parser.add_argument("--users", type=int, default=4, help="被并发修改的用户数")
+    parser.add_argument("--full-row", action="store_true", help="命令按整行写回（修改前的行为）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    result = run(args.threads, args.ops, args.users, args.full_row, args.seed)
+    print(f"操作: {result['operations']}  耗时: {result['elapsed']:.3f}s  金币差额: {result['lost_gold']}")
+    if result['errors']:
+        print("校验失败:")
+        for error in result['errors']:
+            print(f"  · {error}")
+        raise SystemExit(1)
+    print("校验通过：所有成功的金币变化都已写入")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+图片编码方案基准：用示例数据绘制状态、排行榜和帮助图片，按每个编码方案编码，
+统计编码耗时和输出大小（相对默认 png 的比例）
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.image_encoding --repeat 5
+    python -m astrbot_plugin_gaismanor.benchmarks.image_encoding --profile webp --profile jpeg
+"""
+import argparse
+import time
+
+from ..services.render_service import ENCODING_PROFILES, _draw, encode_image
+
+# 示例数据：装备齐全的状态面板和满 10 人的排行榜
+SAMPLE_STATE = {
+    'user_id': '10001',
+    'nickname': '钓鱼佬',
+    'coins': 1234567,
+    'current_rod': {'name': '碳素鱼竿', 'rarity': 5, 'refine_level': 5},
+    'current_accessory': {'name': '幸运戒指', 'rarity': 4},
+    'current_bait': {'name': '红虫', 'rarity': 3, 'quantity': 12},
+    'auto_fishing_enabled': True,
+    'current_title': {'name': '钓鱼大师'},
+    'total_fishing_count': 4321,
+    'signed_in_today': True,
+    'wipe_bomb_remaining': 2,
+    'pond_info': {'total_count': 35, 'total_value': 8800},
+    'rank': {'group': 3, 'global': 1024},
+    'generated_at': '2024-01-01 12:00',
+}
+SAMPLE_RANKING = {
+    "title": "钓鱼排行榜 TOP10",
+    "users": [
+        {"nickname": f"玩家{i}", "title": "钓鱼大师", "coins": 100000 // i, "fish_count": 500 // i,
+         "fishing_rod": "碳素鱼竿", "accessory": "幸运戒指"}
+        for i in range(1, 11)
+    ],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="图片编码方案基准")
+    parser.add_argument("--repeat", type=int, default=3, help="每个方案的编码次数")
+    parser.add_argument("--profile", action="append", choices=sorted(ENCODING_PROFILES),
+                        help="要测试的编码方案，可重复指定，默认全部")
+    args = parser.parse_args()
+    profiles = args.profile or list(ENCODING_PROFILES)
+
+    images = {
+        'state': _draw('state', SAMPLE_STATE),
+        'ranking': _draw('ranking', SAMPLE_RANKING),
+        'help': _draw('help', None),
+    }
+
+    for kind, image in images.items():
+        baseline = len(encode_image(image, ENCODING_PROFILES['png']))
+        print(f"\n{kind} ({image.width}x{image.height})")
+        print(f"  {'方案':<16}{'编码耗时':>10}{'大小':>12}{'相对 png':>10}")
+        for name in profiles:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                data = encode_image(image, ENCODING_PROFILES[name])
+            encode_ms = (time.perf_counter() - start) / args.repeat * 1000
+            print(f"  {name:<16}{encode_ms:>8.1f}ms{len(data) / 1024:>10.1f}KB{len(data) / baseline:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+排行榜查询基准：批量生成用户后统计各排行榜（按群和全服）取前 N 名和查询随机用户名次的耗时，
+并校验取前 N 名时使用了排行索引或群成员索引而不是整表扫描、内存排行的名次与 SQL 查询一致
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.leaderboard_query --users 100000 --groups 50
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from ..dao.other_dao import OtherDAO
+from ..enums.constants import Constants
+from ..models.database import DatabaseManager, LEADERBOARD_COLUMNS
+from ..services.rank_service import RankService
+
+
+def _populate(db: DatabaseManager, users: int, groups: int) -> None:
+    """批量写入随机用户及其所在的群"""
+    now = int(time.time())
+    rows = [
+        (f"bench_{i}", f"玩家{i}", f"group_{i % groups}", random.randint(0, 10 ** 6),
+         random.randint(0, 5000), random.randint(0, 10 ** 6), random.uniform(0, 5000),
+         random.randint(0, 200), random.randint(1, 100), now, now)
+        for i in range(users)
+    ]
+    # 每个用户在注册的群之外，还有三分之一的概率在另一个群里玩
+    memberships = [(f"bench_{i}", f"group_{i % groups}", now) for i in range(users)]
+    memberships += [(f"bench_{i}", f"group_{(i + 1) % groups}", now) for i in range(0, users, 3) if groups > 1]
+    with db.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO users (user_id, nickname, group_id, gold, fishing_count, total_income,
+                               total_fish_weight, rare_fish_count, level, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.executemany("INSERT INTO user_groups (user_id, group_id, last_seen) VALUES (?, ?, ?)", memberships)
+
+
+def _query_plan(db: DatabaseManager, board: str, group_id) -> str:
+    """DAO 实际执行的排行榜查询的执行计划"""
+    statements = []
+    get_connection = db.get_connection
+
+    def connect():
+        conn = get_connection()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    db.get_connection = connect
+    try:
+        OtherDAO(db).get_leaderboard(board, group_id, Constants.LEADERBOARD_SIZE)
+    finally:
+        db.get_connection = get_connection
+    return " / ".join(row['detail'] for row in db.fetch_all(f"EXPLAIN QUERY PLAN {statements[-1]}"))
+
+
+def _index_step(plan: str) -> str:
+    """
+    取前 N 名时读取用户的步骤：全服按排行索引读取 users，按群按群索引读取 user_groups；
+    没有走这些索引，或扫描了整张 users / user_groups 表时返回空
+    """
+    steps = plan.split(" / ")
+    if any(step.startswith(("SCAN u ", "SCAN m ", "SCAN g ")) for step in steps):
+        return ""
+    for step in steps:
+        if step.startswith(("SCAN users USING INDEX idx_users_",
+                            "SEARCH g USING COVERING INDEX idx_user_groups_group ")):
+            return step
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="排行榜查询基准")
+    parser.add_argument("--users", type=int, default=20000, help="生成的用户数量")
+    parser.add_argument("--groups", type=int, default=20, help="用户分布的群数量")
+    parser.add_argument("--repeat", type=int, default=50, help="每个排行榜的查询次数")
+    parser.add_argument("--lookups", type=int, default=200, help="每个排行榜查询名次的随机用户数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        _populate(db, args.users, args.groups)
+        dao = OtherDAO(db)
+        rank_service = RankService(db)
+
+        failed = False
+        print(f"{args.users} 个用户，{args.groups} 个群")
+        for board in LEADERBOARD_COLUMNS:
+            for group_id in ("group_0", None):
+                plan = _query_plan(db, board, group_id)
+                step = _index_step(plan)
+                failed |= not step
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    dao.get_leaderboard(board, group_id, Constants.LEADERBOARD_SIZE)
+                elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+                scope = "按群" if group_id else "全服"
+                print(f"  {board:<14}{scope}  {elapsed_ms:8.3f}ms  {step or '未使用索引：' + plan}")
+
+        rank_service.wait_ready()
+        print(f"\n查询 {args.lookups} 个随机用户的名次（含前后各一名），SQL 与内存排行对比")
+        for board in LEADERBOARD_COLUMNS:
+            user_ids = [f"bench_{random.randrange(args.users)}" for _ in range(args.lookups)]
+            for scoped in (True, False):
+                timings = {"SQL": [], "内存": []}
+                for user_id in user_ids:
+                    group_id = f"group_{int(user_id.rsplit('_', 1)[1]) % args.groups}" if scoped else None
+                    start = time.perf_counter()
+                    expected = rank_service.get_rank_from_db(user_id, board, group_id)
+                    timings["SQL"].append((time.perf_counter() - start) * 1000)
+                    start = time.perf_counter()
+                    actual = rank_service.get_rank(user_id, board, group_id)
+                    timings["内存"].append((time.perf_counter() - start) * 1000)
+                    if (actual.rank, actual.total) != (expected.rank, expected.total):
+                        failed = True
+                        print(f"  名次不一致：{user_id} {board} 内存 {actual.rank}/{actual.total}"
+                              f" SQL {expected.rank}/{expected.total}")
+
+                scope = "按群" if scoped else "全服"
+                for source, values in timings.items():
+                    values.sort()
+                    print(f"  {board:<14}{scope}  {source:<4}平均 {sum(values) / len(values):8.3f}ms"
+                          f"  p95 {values[int(len(values) * 0.95)]:8.3f}ms  最慢 {values[-1]:8.3f}ms")
+
+        user_ids = [f"bench_{random.randrange(args.users)}" for _ in range(args.lookups)]
+        start = time.perf_counter()
+        for user_id in user_ids:
+            db.notify_user_changed(user_id, {'gold': random.randint(0, 10 ** 6)})
+        elapsed_ms = (time.perf_counter() - start) / len(user_ids) * 1000
+        print(f"\n内存排行增量更新（4 个排行榜，全服和所在群）：平均 {elapsed_ms:.3f}ms")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
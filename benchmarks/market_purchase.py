@@ -0,0 +1,119 @@
+"""
+市场购买并发基准：大量买家同时抢购同一件商品，统计吞吐量并校验结果正确性
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.market_purchase --buyers 32 --rounds 50
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..models.database import DatabaseManager
+from ..services.market_service import MarketService
+
+SELLER_ID = "bench_seller"
+PRICE = 100
+
+
+def _setup(db: DatabaseManager, buyers: int, buyer_gold: int, rounds: int) -> None:
+    """创建卖家、买家和待上架的鱼"""
+    now = int(time.time())
+    users = [(SELLER_ID, "seller", 0)] + [(f"bench_buyer_{i}", f"buyer{i}", buyer_gold) for i in range(buyers)]
+    with db.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, nickname, gold, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(user_id, nickname, gold, now, now) for user_id, nickname, gold in users]
+        )
+        conn.executemany(
+            """INSERT INTO user_fish_inventory (user_id, fish_template_id, weight, value, caught_at)
+               VALUES (?, 1, 1.0, ?, ?)""",
+            [(SELLER_ID, PRICE, now)] * rounds
+        )
+
+
+def run(buyers: int = 32, rounds: int = 50, buyer_gold: int = PRICE * 10) -> dict:
+    """执行基准并返回统计结果"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        market = MarketService(db)
+        _setup(db, buyers, buyer_gold, rounds)
+        total_gold_before = db.fetch_one("SELECT SUM(gold) AS total FROM users")['total']
+
+        fish_ids = [row['id'] for row in db.fetch_all(
+            "SELECT id FROM user_fish_inventory WHERE user_id = ? ORDER BY id", (SELLER_ID,)
+        )]
+        buyer_ids = [f"bench_buyer_{i}" for i in range(buyers)]
+        errors = []
+        attempts = 0
+        elapsed = 0.0
+
+        with ThreadPoolExecutor(max_workers=buyers) as pool:
+            for fish_id in fish_ids:
+                market.list_fish(SELLER_ID, fish_id, PRICE)
+                listing_id = db.fetch_one(
+                    "SELECT id FROM market_listings WHERE item_type = 'fish' AND item_id = ?", (fish_id,)
+                )['id']
+
+                barrier = threading.Barrier(buyers)
+
+                def attempt(buyer_id):
+                    barrier.wait()
+                    return buyer_id, market.buy_item(buyer_id, listing_id)
+
+                start = time.perf_counter()
+                results = list(pool.map(attempt, buyer_ids))
+                elapsed += time.perf_counter() - start
+                attempts += len(results)
+
+                winners = [buyer_id for buyer_id, success in results if success]
+                if len(winners) != 1:
+                    errors.append(f"商品 {listing_id} 成交 {len(winners)} 次")
+                    continue
+
+                owner = db.fetch_one("SELECT user_id FROM user_fish_inventory WHERE id = ?", (fish_id,))
+                if not owner or owner['user_id'] != winners[0]:
+                    errors.append(f"商品 {listing_id} 未转移给买家 {winners[0]}")
+
+        total_gold_after = db.fetch_one("SELECT SUM(gold) AS total FROM users")['total']
+        if total_gold_after != total_gold_before:
+            errors.append(f"金币总量不守恒: {total_gold_before} -> {total_gold_after}")
+        negative = db.fetch_one("SELECT COUNT(*) AS count FROM users WHERE gold < 0")['count']
+        if negative:
+            errors.append(f"{negative} 名用户金币为负")
+
+        sales = db.fetch_one("SELECT gold FROM users WHERE user_id = ?", (SELLER_ID,))['gold'] // PRICE
+
+        return {
+            'buyers': buyers,
+            'rounds': rounds,
+            'attempts': attempts,
+            'sales': sales,
+            'elapsed': elapsed,
+            'attempts_per_second': attempts / elapsed if elapsed else 0.0,
+            'errors': errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="市场购买并发基准")
+    parser.add_argument("--buyers", type=int, default=32, help="并发买家数量")
+    parser.add_argument("--rounds", type=int, default=50, help="抢购轮数（每轮一件商品）")
+    args = parser.parse_args()
+
+    result = run(args.buyers, args.rounds)
+    print(f"买家: {result['buyers']}  轮数: {result['rounds']}  成交: {result['sales']}")
+    print(f"购买请求: {result['attempts']}  耗时: {result['elapsed']:.3f}s  "
+          f"吞吐: {result['attempts_per_second']:.0f} 次/秒")
+    if result['errors']:
+        print("正确性校验失败:")
+        for error in result['errors']:
+            print(f"  · {error}")
+        raise SystemExit(1)
+    print("正确性校验通过：每件商品只成交一次，金币总量守恒")
+
+
+if __name__ == '__main__':
+    main()
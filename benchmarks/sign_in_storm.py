@@ -0,0 +1,161 @@
+"""
+签到高峰基准：大量用户同时签到，统计吞吐量和每次签到执行的 SQL 语句数，并校验连续天数、奖励和签到记录
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.sign_in_storm --users 5000 --threads 16
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..enums.constants import Constants
+from ..enums.messages import Messages
+from ..models.database import DatabaseManager
+from ..services.container import ServiceContainer
+from ..utils.exp_utils import calculate_level
+from ..utils.sign_in_utils import calculate_sign_in_rewards, get_current_date, get_yesterday_date
+
+INITIAL_GOLD = 1000
+
+
+class _Event:
+    """最小化的消息事件，只提供签到命令用到的接口"""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+
+    def get_sender_id(self):
+        return self.user_id
+
+    def plain_result(self, text):
+        return text
+
+
+def _setup(db: DatabaseManager, users: int) -> dict:
+    """
+    创建用户：三分之一昨天签到过（连续签到），三分之一今天已签到，其余从未签到；
+    每 50 个用户中有一个差一点经验升级。返回 用户ID → (上次签到日期, 连续天数, 经验)
+    """
+    today, yesterday = get_current_date(), get_yesterday_date()
+    level_up_exp = Constants.BASE_EXP_PER_LEVEL - 1  # 再获得签到经验就升到 2 级
+    assert calculate_level(level_up_exp) == 1
+    now = int(time.time())
+    states = {}
+    for i in range(users):
+        last_date, streak = [(yesterday, random.randint(1, 10)), (today, random.randint(1, 10)), ("", 0)][i % 3]
+        states[f"bench_{i}"] = (last_date, streak, level_up_exp if i % 50 == 0 else 0)
+    with db.transaction() as conn:
+        conn.executemany(
+            """INSERT INTO users (user_id, nickname, gold, exp, level, last_sign_in_date, sign_in_streak,
+                                  created_at, updated_at)
+               VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?)""",
+            [(user_id, user_id, INITIAL_GOLD, exp, last_date, streak, now, now)
+             for user_id, (last_date, streak, exp) in states.items()]
+        )
+    return states
+
+
+def _sign_in(user_service, user_id: str) -> str:
+    async def collect():
+        return [message async for message in user_service.sign_in_command(_Event(user_id))]
+
+    return asyncio.run(collect())[-1]
+
+
+def run(users: int = 5000, threads: int = 16, seed: int = 0) -> dict:
+    """执行基准，返回吞吐量、语句数和校验错误"""
+    random.seed(seed)
+    today = get_current_date()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        states = _setup(db, users)
+        user_service = ServiceContainer(db).user_service
+
+        # 统计签到命令执行的语句（不含 BEGIN/COMMIT 等事务控制语句）
+        statements = []
+        statements_lock = threading.Lock()
+        get_connection = db.get_connection
+
+        def trace(statement):
+            if statement.split(None, 1)[0].upper() not in ("BEGIN", "COMMIT", "ROLLBACK"):
+                with statements_lock:
+                    statements.append(statement)
+
+        def connect():
+            conn = get_connection()
+            conn.set_trace_callback(trace)
+            return conn
+
+        db.get_connection = connect
+        # 每个用户签到两次，第二次应提示已签到
+        user_ids = list(states) * 2
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            messages = list(pool.map(lambda user_id: (user_id, _sign_in(user_service, user_id)), user_ids))
+        elapsed = time.perf_counter() - start
+        db.get_connection = get_connection
+
+        signed = [user_id for user_id, message in messages if message != Messages.ALREADY_SIGNED_IN.value]
+        # 后台线程可能已写入一部分，剩余的在这里写完
+        user_service.flush_sign_in_logs()
+
+        errors = []
+        expected_signed = [user_id for user_id, (last_date, _, _) in states.items() if last_date != today]
+        if sorted(signed) != sorted(expected_signed):
+            errors.append(f"签到成功 {len(signed)} 次，应为 {len(expected_signed)} 次")
+
+        for user_id, (last_date, streak, exp) in states.items():
+            row = db.fetch_one("SELECT gold, level, last_sign_in_date, sign_in_streak FROM users WHERE user_id = ?",
+                               (user_id,))
+            if last_date == today:
+                expected_streak, expected_gold = streak, INITIAL_GOLD
+            else:
+                expected_streak = streak + 1 if last_date else 1
+                expected_gold = INITIAL_GOLD + calculate_sign_in_rewards(expected_streak)[0]
+            if row['sign_in_streak'] != expected_streak or row['last_sign_in_date'] != today:
+                errors.append(f"{user_id} 连续签到 {row['sign_in_streak']} 天，应为 {expected_streak} 天")
+            leveled_up = exp and last_date != today
+            if row['level'] != (2 if leveled_up else 1):
+                errors.append(f"{user_id} 等级为 {row['level']}")
+            elif not leveled_up and row['gold'] != expected_gold:
+                errors.append(f"{user_id} 金币为 {row['gold']}，应为 {expected_gold}")
+
+        log_count = db.fetch_one("SELECT COUNT(*) AS count FROM sign_in_logs WHERE date = ?", (today,))['count']
+        if log_count != len(expected_signed):
+            errors.append(f"签到记录 {log_count} 条，应为 {len(expected_signed)} 条")
+
+        return {
+            'commands': len(user_ids),
+            'signed': len(signed),
+            'elapsed': elapsed,
+            'statements_per_command': len(statements) / len(user_ids),
+            'errors': errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="签到高峰基准")
+    parser.add_argument("--users", type=int, default=5000, help="签到的用户数量（每人签到两次）")
+    parser.add_argument("--threads", type=int, default=16, help="并发线程数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    result = run(args.users, args.threads, args.seed)
+    print(f"签到命令: {result['commands']}  成功: {result['signed']}  耗时: {result['elapsed']:.3f}s  "
+          f"吞吐: {result['commands'] / result['elapsed']:.0f} 次/秒")
+    print(f"平均每条命令 {result['statements_per_command']:.2f} 条语句")
+    if result['errors']:
+        print(f"校验失败（{len(result['errors'])} 项）:")
+        for error in result['errors'][:20]:
+            print(f"  · {error}")
+        raise SystemExit(1)
+    print("校验通过：连续天数、奖励、升级和签到记录都正确")
+
+
+if __name__ == '__main__':
+    main()
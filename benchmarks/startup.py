@@ -0,0 +1,75 @@
+"""
+插件加载耗时基准：在全新的子进程中导入并初始化插件，统计总耗时、各阶段耗时和最慢的导入，
+并校验是否超过 Constants.STARTUP_TIME_TARGET_MS
+
+第一次运行使用空数据库（建表和写入初始数据），之后的运行复用同一个数据库，对应插件重载
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from ..enums.constants import Constants
+
+PACKAGE = __package__.rsplit('.', 1)[0]
+
+# 子进程中执行：导入插件、构造插件实例，输出启动分析结果
+_CHILD_SCRIPT = """
+import importlib, json, sys
+main = importlib.import_module(sys.argv[1] + ".main")
+plugin = main.GaismanorPlugin(None, {"port": int(sys.argv[2])})
+profiler = main.startup_profiler
+print(json.dumps({
+    "total": profiler.total,
+    "phases": profiler.phases,
+    "imports": profiler.slowest_imports(int(sys.argv[3])),
+}))
+"""
+
+
+def run_once(work_dir: str, port: int, top: int) -> dict:
+    """在子进程中加载一次插件"""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD_SCRIPT, PACKAGE, str(port), str(top)],
+        cwd=work_dir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="插件加载耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="加载次数，第一次为空数据库")
+    parser.add_argument("--port", type=int, default=16200, help="子进程中 WebUI 使用的端口")
+    parser.add_argument("--top", type=int, default=10, help="列出最慢的导入数量")
+    parser.add_argument("--target-ms", type=float, default=Constants.STARTUP_TIME_TARGET_MS,
+                        help="重载耗时目标（毫秒）")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for i in range(args.runs):
+            result = run_once(work_dir, args.port + i, args.top)
+            results.append(result)
+            phases = "  ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in result['phases'].items())
+            label = "首次（空数据库）" if i == 0 else f"重载 {i}"
+            print(f"{label}: 总耗时 {result['total'] * 1000:.1f}ms  {phases}")
+
+    print("\n最慢的导入（最后一次加载）:")
+    for module_name, seconds in results[-1]['imports']:
+        print(f"  {module_name}: {seconds * 1000:.1f}ms")
+
+    reloads = [result['total'] * 1000 for result in results[1:]] or [results[0]['total'] * 1000]
+    worst = max(reloads)
+    print(f"\n重载最慢 {worst:.1f}ms，目标 {args.target_ms:.0f}ms")
+    if worst > args.target_ms:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
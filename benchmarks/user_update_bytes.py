@@ -0,0 +1,113 @@
+"""
+用户写回字节数基准：模拟钓鱼后写回用户，对比整行更新和只写修改字段两种方式每次写入的 WAL 字节数和 SQL 参数字节数
+
+整行更新会改写所有排行索引；只写修改字段时只改写受影响的索引，写入的页更少
+
+在 AstrBot 插件目录下运行：
+    python -m astrbot_plugin_gaismanor.benchmarks.user_update_bytes --users 20000 --updates 500
+"""
+import argparse
+import dataclasses
+import os
+import random
+import tempfile
+import time
+
+from ..dao.user_dao import UserDAO
+from ..models.database import DatabaseManager
+
+
+def _populate(db: DatabaseManager, users: int) -> None:
+    """批量写入随机用户，使各排行索引有一定深度"""
+    now = int(time.time())
+    rows = [
+        (f"bench_{i}", f"玩家{i}", random.randint(0, 10 ** 6), random.randint(0, 5000),
+         random.randint(0, 10 ** 6), random.uniform(0, 5000), random.randint(0, 200),
+         random.randint(1, 100), now, now)
+        for i in range(users)
+    ]
+    with db.transaction() as conn:
+        conn.executemany("""
+            INSERT INTO users (user_id, nickname, gold, fishing_count, total_income,
+                               total_fish_weight, rare_fish_count, level, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+
+def _wal_size(db: DatabaseManager) -> int:
+    path = db.db_path + "-wal"
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _measure(db: DatabaseManager, dao: UserDAO, user_ids: list, full_row: bool) -> dict:
+    """对每个用户做一次钓鱼后的修改并写回，返回平均每次写入的字节数"""
+    db.execute_query("PRAGMA wal_checkpoint(TRUNCATE)")
+    # 最后一个连接关闭时 SQLite 会做检查点并删除 WAL 文件，测量期间保持一个连接
+    keeper = db.get_connection()
+    keeper.execute("SELECT COUNT(*) FROM users").fetchone()
+    wal_before = _wal_size(db)
+    param_bytes = 0
+    for user_id in user_ids:
+        user = dao.get_user_by_id(user_id)
+        if full_row:
+            # 复制出的用户不知道数据库中的值，按整行写回
+            user = dataclasses.replace(user)
+        user.gold -= 10
+        user.fishing_count += 1
+        user.exp += 5
+        user.last_fishing_time = int(time.time())
+
+        query, params, _ = UserDAO.build_update(user)
+        param_bytes += len(query.encode()) + sum(len(str(param).encode()) for param in params)
+        dao.update_user(user)
+
+    wal_after = _wal_size(db)
+    keeper.close()
+    return {
+        'wal_bytes': (wal_after - wal_before) / len(user_ids),
+        'sql_bytes': param_bytes / len(user_ids),
+    }
+
+
+def run(users: int = 20000, updates: int = 500, seed: int = 0) -> dict:
+    """执行基准，返回两种写回方式的平均写入字节数"""
+    random.seed(seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = DatabaseManager(os.path.join(tmp_dir, "bench.db"))
+        _populate(db, users)
+
+        # 关闭自动检查点，WAL 文件的增长即为写入的字节数
+        get_connection = db.get_connection
+
+        def connect():
+            conn = get_connection()
+            conn.execute("PRAGMA wal_autocheckpoint = 0")
+            return conn
+
+        db.get_connection = connect
+        dao = UserDAO(db)
+        user_ids = [f"bench_{random.randrange(users)}" for _ in range(updates)]
+        return {
+            'full_row': _measure(db, dao, user_ids, full_row=True),
+            'minimal': _measure(db, dao, user_ids, full_row=False),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用户写回字节数基准")
+    parser.add_argument("--users", type=int, default=20000, help="生成的用户数量")
+    parser.add_argument("--updates", type=int, default=500, help="写回次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    result = run(args.users, args.updates, args.seed)
+    for name, key in (("整行更新", 'full_row'), ("只写修改字段", 'minimal')):
+        print(f"{name:<8}  WAL {result[key]['wal_bytes']:10,.0f} 字节/次  SQL 及参数 {result[key]['sql_bytes']:6,.0f} 字节/次")
+
+    if result['minimal']['wal_bytes'] >= result['full_row']['wal_bytes']:
+        print("只写修改字段没有减少写入的字节数")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
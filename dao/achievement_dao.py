@@ -107,6 +107,31 @@ class AchievementDAO(BaseDAO):
             print(f"激活用户称号失败: {e}")
             return False
 
+    def get_completed_achievement_ids(self, user_id: str) -> set:
+        """获取用户已完成的成就ID集合"""
+        results = self.db.fetch_all(
+            "SELECT achievement_id FROM user_achievements WHERE user_id = ? AND completed = TRUE",
+            (user_id,)
+        )
+        return {row['achievement_id'] for row in results}
+
+    def get_fishing_log_stats(self, user_id: str) -> Dict[str, Any]:
+        """一次扫描钓鱼日志，统计成就检查需要的鱼种数、垃圾数、最大擦弹倍率和是否钓到过重鱼"""
+        result = self.db.fetch_one(
+            """SELECT COUNT(DISTINCT CASE WHEN success = TRUE THEN fish_template_id END) AS unique_fish_count,
+                      COUNT(CASE WHEN success = TRUE AND fish_template_id = 0 THEN 1 END) AS garbage_count,
+                      MAX(CASE WHEN wipe_multiplier > 1 THEN wipe_multiplier END) AS max_wipe_multiplier,
+                      COUNT(CASE WHEN success = TRUE AND fish_weight >= 100 THEN 1 END) AS heavy_fish_count
+               FROM fishing_logs WHERE user_id = ?""",
+            (user_id,)
+        )
+        return {
+            'unique_fish_count': result['unique_fish_count'] or 0,
+            'garbage_count': result['garbage_count'] or 0,
+            'max_wipe_multiplier': result['max_wipe_multiplier'] or 0.0,
+            'has_heavy_fish': (result['heavy_fish_count'] or 0) > 0,
+        }
+
     def get_unique_fish_count(self, user_id: str) -> int:
         """获取用户收集的不同鱼种数量"""
         result = self.db.fetch_one(
@@ -0,0 +1,118 @@
+"""
+命令上下文（身份映射）
+"""
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ..models.database import DatabaseManager
+from ..models.fishing import AccessoryTemplate, RodTemplate
+from ..models.user import User
+from .achievement_dao import AchievementDAO
+from .fishing_dao import FishingDAO
+from .technology_dao import TechnologyDAO
+from .user_dao import UserDAO, UserUpdateRejected
+
+_MISSING = object()
+
+
+class CommandContext:
+    """
+    单条命令内共享的身份映射
+
+    同一条命令中，用户行、装备、已解锁科技和已完成成就只查询一次，
+    调用链上的各个服务都通过同一个上下文读取；对用户行的修改先记在内存里，
+    命令结束时由 flush 在一个事务中统一写回（只写修改过的字段，计数字段按差值累加）
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+        self.user_dao = UserDAO(db_manager)
+        self.fishing_dao = FishingDAO(db_manager)
+        self.tech_dao = TechnologyDAO(db_manager)
+        self.achievement_dao = AchievementDAO(db_manager)
+
+        self._users: Dict[str, Optional[User]] = {}
+        self._dirty_users: Dict[str, User] = {}
+        self._memo: Dict[Tuple[str, str], Any] = {}
+        self._deferred: List[Tuple[str, tuple]] = []
+
+    def _memoize(self, kind: str, user_id: str, loader: Callable[[str], Any]) -> Any:
+        """按 (类型, 用户ID) 缓存一次查询结果"""
+        key = (kind, user_id)
+        value = self._memo.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader(user_id)
+            self._memo[key] = value
+        return value
+
+    # ==================用户==================
+    def get_user(self, user_id: str) -> Optional[User]:
+        """获取用户，同一命令内多次调用返回同一个对象"""
+        if user_id not in self._users:
+            self._users[user_id] = self.user_dao.get_user_by_id(user_id)
+        return self._users[user_id]
+
+    def add_user(self, user: User) -> User:
+        """登记调用方已加载的用户对象"""
+        return self._users.setdefault(user.user_id, user)
+
+    def mark_dirty(self, user: User) -> None:
+        """标记用户已修改，flush 时写回"""
+        self.add_user(user)
+        self._dirty_users[user.user_id] = user
+
+    # ==================装备==================
+    def get_equipped_rod(self, user_id: str) -> Optional[RodTemplate]:
+        """获取用户装备的鱼竿模板"""
+        return self._memoize("rod", user_id, self.fishing_dao.get_equipped_rod)
+
+    def get_equipped_rod_instance(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """获取用户装备的鱼竿实例"""
+        return self._memoize("rod_instance", user_id, self.fishing_dao.get_equipped_rod_instance)
+
+    def get_equipped_accessory(self, user_id: str) -> Optional[AccessoryTemplate]:
+        """获取用户装备的饰品模板"""
+        return self._memoize("accessory", user_id, self.fishing_dao.get_equipped_accessory)
+
+    # ==================科技==================
+    def get_unlocked_tech_ids(self, user_id: str) -> Set[int]:
+        """获取用户已解锁的科技ID"""
+        return self._memoize("tech_ids", user_id, self.tech_dao.get_user_unlocked_tech_ids)
+
+    # ==================成就==================
+    def get_completed_achievement_ids(self, user_id: str) -> Set[int]:
+        """获取用户已完成的成就ID"""
+        return self._memoize("achievement_ids", user_id, self.achievement_dao.get_completed_achievement_ids)
+
+    # ==================写回==================
+    def defer(self, query: str, params: tuple = ()) -> None:
+        """登记一条延迟到 flush 时执行的写语句"""
+        self._deferred.append((query, params))
+
+    def flush(self) -> bool:
+        """
+        在一个事务中写回所有已修改的用户（只写修改过的字段）和延迟的写语句
+
+        任何一个用户没有更新到行（如金币会变为负数）时整个事务回滚并返回 False，用户保持未写回状态
+        """
+        if not self._dirty_users and not self._deferred:
+            return True
+
+        updates = [(user, UserDAO.build_update(user)) for user in self._dirty_users.values()]
+        updates = [(user, update) for user, update in updates if update is not None]
+        try:
+            with self.db.transaction() as conn:
+                for user, (query, params, _) in updates:
+                    if conn.execute(query, params).rowcount <= 0:
+                        # 金币会变为负数（其他命令同时花掉了金币）或用户不存在，整个命令的写入回滚
+                        raise UserUpdateRejected(f"用户 {user.user_id} 不存在或金币不足")
+                for query, params in self._deferred:
+                    conn.execute(query, params)
+            for user, (_, _, values) in updates:
+                user.mark_saved()
+                self.db.notify_user_changed(user.user_id, values)
+            self._dirty_users.clear()
+            self._deferred.clear()
+            return True
+        except Exception as e:
+            print(f"写回命令上下文失败: {e}")
+            return False
@@ -171,13 +171,12 @@ class FishingDAO(BaseDAO):
             print(f"添加鱼到库存失败: {e}")
             return False
 
+    UPDATE_ROD_DURABILITY_SQL = "UPDATE user_rod_instances SET durability = ? WHERE id = ?"
+
     def update_rod_durability(self, rod_instance_id: int, durability: int) -> bool:
         """更新鱼竿耐久度"""
         try:
-            self.db.execute_query(
-                "UPDATE user_rod_instances SET durability = ? WHERE id = ?",
-                (durability, rod_instance_id)
-            )
+            self.db.execute_query(self.UPDATE_ROD_DURABILITY_SQL, (durability, rod_instance_id))
             return True
         except Exception as e:
             print(f"更新鱼竿耐久度失败: {e}")
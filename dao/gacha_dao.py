@@ -2,7 +2,7 @@
 抽奖数据访问对象
 """
 import time
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from ..models.database import DatabaseManager
 from .base_dao import BaseDAO
 
@@ -21,172 +21,141 @@ class GachaDAO(BaseDAO):
             (pool_id,)
         )
 
-    def get_gacha_pool_items(self, pool_id: int) -> List[Dict[str, Any]]:
-        """获取卡池中的物品"""
+    def get_gacha_pool_item_details(self, pool_id: int) -> List[Dict[str, Any]]:
+        """获取卡池中的物品及其名称、稀有度（一次查询关联三张模板表）"""
         return self.db.fetch_all(
-            "SELECT item_type, item_template_id FROM gacha_pool_items WHERE pool_id = ?",
-            (pool_id,)
+            """SELECT gpi.item_type, gpi.item_template_id, rt.name, rt.rarity
+               FROM gacha_pool_items gpi JOIN rod_templates rt ON gpi.item_template_id = rt.id
+               WHERE gpi.pool_id = ? AND gpi.item_type = 'rod'
+               UNION ALL
+               SELECT gpi.item_type, gpi.item_template_id, at.name, at.rarity
+               FROM gacha_pool_items gpi JOIN accessory_templates at ON gpi.item_template_id = at.id
+               WHERE gpi.pool_id = ? AND gpi.item_type = 'accessory'
+               UNION ALL
+               SELECT gpi.item_type, gpi.item_template_id, bt.name, bt.rarity
+               FROM gacha_pool_items gpi JOIN bait_templates bt ON gpi.item_template_id = bt.id
+               WHERE gpi.pool_id = ? AND gpi.item_type = 'bait'""",
+            (pool_id, pool_id, pool_id)
         )
 
-    def get_items_by_rarity(self, item_type: str, item_ids: List[int], rarity: int) -> List[Dict[str, Any]]:
-        """根据物品类型和稀有度获取物品"""
-        if not item_ids:
-            return []
-
-        if item_type == "rod":
-            query = "SELECT id FROM rod_templates WHERE id IN ({}) AND rarity = ?".format(
-                ','.join('?' * len(item_ids))
-            )
-            params = item_ids + [rarity]
-        elif item_type == "accessory":
-            query = "SELECT id FROM accessory_templates WHERE id IN ({}) AND rarity = ?".format(
-                ','.join('?' * len(item_ids))
-            )
-            params = item_ids + [rarity]
-        elif item_type == "bait":
-            query = "SELECT id FROM bait_templates WHERE id IN ({}) AND rarity = ?".format(
-                ','.join('?' * len(item_ids))
-            )
-            params = item_ids + [rarity]
-        else:
-            return []
-
-        return self.db.fetch_all(query, params)
-
-    def add_rod_to_user(self, user_id: str, rod_template_id: int) -> bool:
-        """添加鱼竿到用户背包"""
-        try:
-            now = int(time.time())
-            self.db.execute_query(
-                """INSERT INTO user_rod_instances
-                   (user_id, rod_template_id, level, exp, is_equipped, acquired_at, durability)
-                   VALUES (?, ?, 1, 0, FALSE, ?, 100)""",
-                (user_id, rod_template_id, now)
-            )
-            return True
-        except Exception as e:
-            print(f"添加鱼竿到用户背包时出错: {e}")
-            return False
-
-    def add_accessory_to_user(self, user_id: str, accessory_template_id: int) -> bool:
-        """添加饰品到用户背包"""
-        try:
-            now = int(time.time())
-            self.db.execute_query(
-                """INSERT INTO user_accessory_instances
-                   (user_id, accessory_template_id, is_equipped, acquired_at)
-                   VALUES (?, ?, FALSE, ?)""",
-                (user_id, accessory_template_id, now)
-            )
-            return True
-        except Exception as e:
-            print(f"添加饰品到用户背包时出错: {e}")
-            return False
+    def record_pulls(self, user_id: str, cost: int, items: List[Tuple[str, int, int]]) -> Optional[int]:
+        """
+        在一个事务中完成多次抽卡的结算：扣除金币、批量发放物品、批量写入抽卡日志
+
+        :param items: 抽到的物品列表，每项为 (物品类型, 模板ID, 稀有度)
+        :return: 扣费后的剩余金币，金币不足或出错时返回 None
+        """
+        now = int(time.time())
+        rods = [(user_id, template_id, now) for item_type, template_id, _ in items if item_type == "rod"]
+        accessories = [(user_id, template_id, now) for item_type, template_id, _ in items if item_type == "accessory"]
+        baits: Dict[int, int] = {}
+        for item_type, template_id, _ in items:
+            if item_type == "bait":
+                baits[template_id] = baits.get(template_id, 0) + 1
 
-    def add_bait_to_user(self, user_id: str, bait_template_id: int) -> bool:
-        """添加鱼饵到用户背包"""
         try:
-            # 检查用户是否已有该鱼饵
-            existing = self.db.fetch_one(
-                """SELECT id, quantity FROM user_bait_inventory
-                   WHERE user_id = ? AND bait_template_id = ?""",
-                (user_id, bait_template_id)
-            )
-
-            if existing:
-                # 增加现有鱼饵数量
-                self.db.execute_query(
-                    "UPDATE user_bait_inventory SET quantity = quantity + 1 WHERE id = ?",
-                    (existing['id'],)
-                )
-            else:
-                # 添加新鱼饵
-                self.db.execute_query(
-                    """INSERT INTO user_bait_inventory
-                       (user_id, bait_template_id, quantity)
-                       VALUES (?, ?, 1)""",
-                    (user_id, bait_template_id)
+            with self.db.transaction() as conn:
+                rows = conn.execute(
+                    "UPDATE users SET gold = gold - ? WHERE user_id = ? AND gold >= ? RETURNING gold",
+                    (cost, user_id, cost)
+                ).fetchall()
+                if not rows:
+                    return None
+
+                if rods:
+                    conn.executemany(
+                        """INSERT INTO user_rod_instances
+                           (user_id, rod_template_id, level, exp, is_equipped, acquired_at, durability)
+                           VALUES (?, ?, 1, 0, FALSE, ?, 100)""",
+                        rods
+                    )
+                if accessories:
+                    conn.executemany(
+                        """INSERT INTO user_accessory_instances
+                           (user_id, accessory_template_id, is_equipped, acquired_at)
+                           VALUES (?, ?, FALSE, ?)""",
+                        accessories
+                    )
+                if baits:
+                    # 没有该鱼饵时先建一个空堆，再统一累加到最早的那一堆上
+                    conn.executemany(
+                        """INSERT INTO user_bait_inventory (user_id, bait_template_id, quantity)
+                           SELECT ?1, ?2, 0
+                           WHERE NOT EXISTS (SELECT 1 FROM user_bait_inventory
+                                             WHERE user_id = ?1 AND bait_template_id = ?2)""",
+                        [(user_id, template_id) for template_id in baits]
+                    )
+                    conn.executemany(
+                        """UPDATE user_bait_inventory SET quantity = quantity + ?1
+                           WHERE id = (SELECT id FROM user_bait_inventory
+                                       WHERE user_id = ?2 AND bait_template_id = ?3
+                                       ORDER BY id LIMIT 1)""",
+                        [(quantity, user_id, template_id) for template_id, quantity in baits.items()]
+                    )
+
+                conn.executemany(
+                    """INSERT INTO gacha_logs
+                       (user_id, item_type, item_template_id, rarity, timestamp)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    [(user_id, item_type, template_id, rarity, now) for item_type, template_id, rarity in items]
                 )
-            return True
+                remaining_gold = rows[0]['gold']
         except Exception as e:
-            print(f"添加鱼饵到用户背包时出错: {e}")
-            return False
+            print(f"结算抽卡结果时出错: {e}")
+            return None
+
+        self.db.notify_user_changed(user_id, {'gold': remaining_gold})
+        return remaining_gold
 
     def get_user_gold(self, user_id: str) -> Optional[Dict[str, Any]]:
         """获取用户金币"""
         return self.db.fetch_one("SELECT gold FROM users WHERE user_id = ?", (user_id,))
 
-    def deduct_user_gold(self, user_id: str, amount: int) -> bool:
-        """扣除用户金币"""
-        try:
-            self.db.execute_query(
-                "UPDATE users SET gold = gold - ? WHERE user_id = ?",
-                (amount, user_id)
-            )
-            return True
-        except Exception as e:
-            print(f"扣除用户金币时出错: {e}")
-            return False
-
-    def add_gacha_log(self, user_id: str, item_type: str, item_template_id: int, rarity: int) -> bool:
-        """添加抽卡日志"""
-        try:
-            self.db.execute_query(
-                """INSERT INTO gacha_logs
-                   (user_id, item_type, item_template_id, rarity, timestamp)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (user_id, item_type, item_template_id, rarity, int(time.time()))
-            )
-            return True
-        except Exception as e:
-            print(f"添加抽卡日志时出错: {e}")
-            return False
-
-    def get_item_name(self, item_type: str, item_template_id: int) -> Optional[str]:
-        """获取物品名称"""
-        if item_type == "rod":
-            result = self.db.fetch_one("SELECT name FROM rod_templates WHERE id = ?", (item_template_id,))
-        elif item_type == "accessory":
-            result = self.db.fetch_one("SELECT name FROM accessory_templates WHERE id = ?", (item_template_id,))
-        elif item_type == "bait":
-            result = self.db.fetch_one("SELECT name FROM bait_templates WHERE id = ?", (item_template_id,))
-        else:
-            return None
-
-        return result['name'] if result else None
+    def get_gacha_history(self, user_id: str, limit: int = 20, before_id: Optional[int] = None,
+                          rarity: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取用户的抽卡记录，一次查询关联三张模板表带出物品名称和稀有度
+
+        按 (timestamp, id) 倒序排列，走 (user_id, timestamp DESC, id DESC) 索引；
+        传入 before_id 时返回该条记录之前（更早）的记录，用于翻页
+        """
+        conditions = ["gl.user_id = ?"]
+        params: list = [user_id]
+        if before_id is not None:
+            conditions.append("(gl.timestamp, gl.id) < (SELECT timestamp, id FROM gacha_logs WHERE id = ?)")
+            params.append(before_id)
+        if rarity is not None:
+            conditions.append("gl.rarity = ?")
+            params.append(rarity)
+        params.append(limit)
 
-    def get_gacha_logs(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """获取用户的抽卡记录"""
         return self.db.fetch_all(
-            """SELECT gl.*, rt.name as item_name, rt.rarity as item_rarity
-               FROM gacha_logs gl
-               LEFT JOIN rod_templates rt ON gl.item_template_id = rt.id AND gl.item_type = 'rod'
-               WHERE gl.user_id = ?
-               ORDER BY gl.timestamp DESC
-               LIMIT ?""",
-            (user_id, limit)
+            f"""SELECT gl.id, gl.item_type, gl.item_template_id, gl.rarity, gl.timestamp,
+                       COALESCE(rt.name, at.name, bt.name) AS item_name,
+                       COALESCE(rt.rarity, at.rarity, bt.rarity, gl.rarity) AS item_rarity
+                FROM gacha_logs gl
+                LEFT JOIN rod_templates rt ON gl.item_type = 'rod' AND gl.item_template_id = rt.id
+                LEFT JOIN accessory_templates at ON gl.item_type = 'accessory' AND gl.item_template_id = at.id
+                LEFT JOIN bait_templates bt ON gl.item_type = 'bait' AND gl.item_template_id = bt.id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY gl.timestamp DESC, gl.id DESC
+                LIMIT ?""",
+            tuple(params)
         )
 
-    def get_accessory_logs(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """获取用户的饰品抽卡记录"""
-        return self.db.fetch_all(
-            """SELECT gl.*, at.name as item_name, at.rarity as item_rarity
-               FROM gacha_logs gl
-               LEFT JOIN accessory_templates at ON gl.item_template_id = at.id AND gl.item_type = 'accessory'
-               WHERE gl.user_id = ? AND gl.item_type = 'accessory'
-               ORDER BY gl.timestamp DESC
-               LIMIT ?""",
-            (user_id, limit)
+    def get_gacha_rarity_counts(self, user_id: str) -> Dict[int, int]:
+        """统计用户各稀有度的抽卡次数"""
+        rows = self.db.fetch_all(
+            "SELECT rarity, COUNT(*) AS count FROM gacha_logs WHERE user_id = ? GROUP BY rarity",
+            (user_id,)
         )
-
-    def get_bait_logs(self, user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-        """获取用户的鱼饵抽卡记录"""
-        return self.db.fetch_all(
-            """SELECT gl.*, bt.name as item_name, bt.rarity as item_rarity
-               FROM gacha_logs gl
-               LEFT JOIN bait_templates bt ON gl.item_template_id = bt.id AND gl.item_type = 'bait'
-               WHERE gl.user_id = ? AND gl.item_type = 'bait'
-               ORDER BY gl.timestamp DESC
-               LIMIT ?""",
-            (user_id, limit)
-        )
\ No newline at end of file
+        return {row['rarity']: row['count'] for row in rows}
+
+    def count_gacha_logs_after(self, user_id: str, log_id: int) -> int:
+        """统计某条记录之后（更新）的抽卡次数"""
+        row = self.db.fetch_one(
+            """SELECT COUNT(*) AS count FROM gacha_logs
+               WHERE user_id = ? AND (timestamp, id) > (SELECT timestamp, id FROM gacha_logs WHERE id = ?)""",
+            (user_id, log_id)
+        )
+        return row['count'] if row else 0
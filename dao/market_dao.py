@@ -0,0 +1,295 @@
+"""
+市场数据访问对象
+"""
+import time
+from typing import List, Optional, Dict, Any
+from ..enums.constants import Constants
+from .base_dao import BaseDAO
+
+MARKET_ESCROW_USER_ID = Constants.MARKET_ESCROW_USER_ID
+
+# 各类商品对应的库存表
+ITEM_TABLES = {
+    'fish': 'user_fish_inventory',
+    'rod': 'user_rod_instances',
+    'accessory': 'user_accessory_instances',
+    'bait': 'user_bait_inventory',
+}
+
+# 各类商品库存表中的模板ID列
+TEMPLATE_COLUMNS = {
+    'fish': 'fish_template_id',
+    'rod': 'rod_template_id',
+    'accessory': 'accessory_template_id',
+    'bait': 'bait_template_id',
+}
+
+# 各类商品对应的模板表
+TEMPLATE_TABLES = {
+    'fish': 'fish_templates',
+    'rod': 'rod_templates',
+    'accessory': 'accessory_templates',
+    'bait': 'bait_templates',
+}
+
+# 市场浏览时各类商品额外查询的列（i 为库存表，t 为模板表）
+LISTING_COLUMNS = {
+    'fish': 'i.weight AS fish_weight, i.value AS fish_value',
+    'rod': 'i.level AS rod_level, i.exp AS rod_exp, t.quality_mod, t.quantity_mod, t.rare_mod',
+    'accessory': 't.quality_mod, t.quantity_mod, t.rare_mod, t.coin_mod',
+    'bait': 'i.quantity, t.effect_description',
+}
+
+# 市场浏览支持的排序方式
+LISTING_SORTS = {
+    'price': 'ml.price ASC, ml.id ASC',
+    'newest': 'ml.created_at DESC, ml.id DESC',
+}
+
+
+class PurchaseAborted(Exception):
+    """购买条件不满足，用于回滚购买事务"""
+
+
+class MarketDAO(BaseDAO):
+    """市场数据访问对象，封装所有市场相关的数据库操作"""
+
+    def list_item(self, user_id: str, item_type: str, item_id: int, price: int) -> bool:
+        """上架物品：在同一个事务中将物品转入市场托管并写入上架记录"""
+        table = ITEM_TABLES.get(item_type)
+        if not table:
+            return False
+
+        # 装备中的鱼竿和饰品不能上架
+        condition = " AND is_equipped = FALSE" if item_type in ('rod', 'accessory') else ""
+        if item_type == 'bait':
+            condition = " AND quantity > 0"
+
+        try:
+            now = int(time.time())
+            with self.db.transaction() as conn:
+                cursor = conn.execute(
+                    f"UPDATE {table} SET user_id = ? WHERE user_id = ? AND id = ?{condition}",
+                    (MARKET_ESCROW_USER_ID, user_id, item_id)
+                )
+                if cursor.rowcount <= 0:
+                    return False
+
+                conn.execute(
+                    """INSERT INTO market_listings
+                       (seller_user_id, item_type, item_id, price, created_at, expires_at)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (user_id, item_type, item_id, price, now, now + Constants.MARKET_LISTING_DURATION)
+                )
+            return True
+        except Exception as e:
+            print(f"上架市场物品失败: {e}")
+            return False
+
+    def buy_listing(self, buyer_user_id: str, listing_id: int, now: int) -> Optional[Dict[str, Any]]:
+        """
+        原子购买市场商品：删除上架、扣买家金币、加卖家金币、转移物品在同一个事务中完成，
+        全部使用条件语句，不做先读后写；任何一步不满足（包括托管物品不存在）时整个事务回滚
+
+        :return: 成交的上架信息，购买失败时返回 None
+        """
+        try:
+            with self.db.transaction() as conn:
+                rows = conn.execute(
+                    """DELETE FROM market_listings WHERE id = ? AND expires_at > ?
+                       RETURNING id, seller_user_id, item_type, item_id, price""",
+                    (listing_id, now)
+                ).fetchall()
+                if not rows:
+                    raise PurchaseAborted("商品不存在或已过期")
+
+                listing = rows[0]
+
+                price = listing['price']
+                cursor = conn.execute(
+                    "UPDATE users SET gold = gold - ? WHERE user_id = ? AND gold >= ?",
+                    (price, buyer_user_id, price)
+                )
+                if cursor.rowcount <= 0:
+                    raise PurchaseAborted("买家金币不足")
+
+                conn.execute(
+                    "UPDATE users SET gold = gold + ? WHERE user_id = ?",
+                    (price, listing['seller_user_id'])
+                )
+
+                item_type = listing['item_type']
+                if item_type == 'bait':
+                    template_id = self._move_escrowed_bait(conn, buyer_user_id, listing['item_id'])
+                else:
+                    moved = conn.execute(
+                        f"""UPDATE {ITEM_TABLES[item_type]} SET user_id = ? WHERE id = ? AND user_id = ?
+                            RETURNING {TEMPLATE_COLUMNS[item_type]} AS template_id""",
+                        (buyer_user_id, listing['item_id'], MARKET_ESCROW_USER_ID)
+                    ).fetchall()
+                    template_id = moved[0]['template_id'] if moved else None
+
+                if template_id is None:
+                    # 托管物品已不存在（如升级前上架时物品已被删除），不能只扣钱不交货
+                    raise PurchaseAborted("托管物品不存在")
+
+                self._record_trade(conn, listing, template_id, buyer_user_id, now)
+                purchase = dict(listing, template_id=template_id)
+        except PurchaseAborted:
+            return None
+        except Exception as e:
+            print(f"购买市场商品失败: {e}")
+            return None
+
+        self.db.notify_user_changed(buyer_user_id)
+        self.db.notify_user_changed(purchase['seller_user_id'])
+        return purchase
+
+    def _listing_from_clause(self, item_type: str, rarity: Optional[int]) -> tuple:
+        """拼接市场浏览查询的 FROM/WHERE 部分"""
+        clause = f"""FROM market_listings ml
+               JOIN users u ON ml.seller_user_id = u.user_id
+               JOIN {ITEM_TABLES[item_type]} i ON ml.item_id = i.id
+               JOIN {TEMPLATE_TABLES[item_type]} t ON i.{TEMPLATE_COLUMNS[item_type]} = t.id
+               WHERE ml.item_type = ? AND ml.expires_at > ?"""
+        if rarity is not None:
+            clause += " AND t.rarity = ?"
+        return clause
+
+    def get_listing_stats(self, item_type: str, now: int, rarity: Optional[int] = None) -> Dict[str, Any]:
+        """统计在售商品数量以及最早的过期时间"""
+        params = (item_type, now) + ((rarity,) if rarity is not None else ())
+        row = self.db.fetch_one(
+            f"SELECT COUNT(*) AS total, MIN(ml.expires_at) AS next_expires_at "
+            f"{self._listing_from_clause(item_type, rarity)}",
+            params
+        )
+        return {'total': row['total'], 'next_expires_at': row['next_expires_at']}
+
+    def get_listing_page(self, item_type: str, now: int, sort: str, offset: int, limit: int,
+                         rarity: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取一页在售商品，物品模板的名称和稀有度在同一个查询中带出
+
+        :param sort: 排序方式，见 LISTING_SORTS
+        """
+        params = (item_type, now) + ((rarity,) if rarity is not None else ()) + (limit, offset)
+        results = self.db.fetch_all(
+            f"""SELECT ml.id, ml.price, ml.created_at, ml.expires_at, u.nickname AS seller_nickname,
+                       t.name, t.rarity, {LISTING_COLUMNS[item_type]}
+                {self._listing_from_clause(item_type, rarity)}
+                ORDER BY {LISTING_SORTS[sort]}
+                LIMIT ? OFFSET ?""",
+            params
+        )
+        return [dict(row) for row in results]
+
+    def sweep_expired_batch(self, now: int, batch_size: int) -> int:
+        """
+        清理一批过期上架：在同一个事务中把托管物品退回卖家并删除上架记录
+
+        :param now: 判定过期的时间点
+        :param batch_size: 本批最多处理的上架数量
+        :return: 本批清理的上架数量
+        """
+        with self.db.transaction() as conn:
+            listings = conn.execute(
+                """SELECT id, seller_user_id, item_type, item_id FROM market_listings
+                   WHERE expires_at <= ?
+                   ORDER BY expires_at
+                   LIMIT ?""",
+                (now, batch_size)
+            ).fetchall()
+            if not listings:
+                return 0
+
+            # 鱼类、鱼竿、饰品直接改回卖家名下
+            returns: Dict[str, List[tuple]] = {}
+            for listing in listings:
+                if listing['item_type'] in ('fish', 'rod', 'accessory'):
+                    returns.setdefault(listing['item_type'], []).append(
+                        (listing['seller_user_id'], listing['item_id'], MARKET_ESCROW_USER_ID)
+                    )
+                elif listing['item_type'] == 'bait':
+                    self._move_escrowed_bait(conn, listing['seller_user_id'], listing['item_id'])
+
+            for item_type, params in returns.items():
+                conn.executemany(
+                    f"UPDATE {ITEM_TABLES[item_type]} SET user_id = ? WHERE id = ? AND user_id = ?",
+                    params
+                )
+
+            conn.executemany(
+                "DELETE FROM market_listings WHERE id = ?",
+                [(listing['id'],) for listing in listings]
+            )
+            return len(listings)
+
+    def _record_trade(self, conn, listing, template_id: int, buyer_user_id: str, now: int) -> None:
+        """追加成交记录，并增量更新当日价格汇总"""
+        price = listing['price']
+        conn.execute(
+            """INSERT INTO market_trades
+               (listing_id, item_type, template_id, seller_user_id, buyer_user_id, price, traded_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (listing['id'], listing['item_type'], template_id, listing['seller_user_id'], buyer_user_id, price, now)
+        )
+        conn.execute(
+            """INSERT INTO market_price_daily
+               (item_type, template_id, day, trade_count, min_price, max_price, total_price, last_price, last_traded_at)
+               VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+               ON CONFLICT (item_type, template_id, day) DO UPDATE SET
+                   trade_count = trade_count + 1,
+                   min_price = MIN(min_price, excluded.min_price),
+                   max_price = MAX(max_price, excluded.max_price),
+                   total_price = total_price + excluded.total_price,
+                   last_price = excluded.last_price,
+                   last_traded_at = excluded.last_traded_at""",
+            (listing['item_type'], template_id, time.strftime('%Y-%m-%d', time.localtime(now)),
+             price, price, price, price, now)
+        )
+
+    def find_templates_by_name(self, name: str) -> List[Dict[str, Any]]:
+        """按名称查找可交易物品的模板"""
+        results = []
+        for item_type, table in TEMPLATE_TABLES.items():
+            for row in self.db.fetch_all(f"SELECT id, name, rarity FROM {table} WHERE name = ?", (name,)):
+                results.append({'item_type': item_type, 'template_id': row['id'],
+                                'name': row['name'], 'rarity': row['rarity']})
+        return results
+
+    def get_price_rollups(self, item_type: str, template_id: int, since_day: str) -> List[Dict[str, Any]]:
+        """获取物品自指定日期起的每日价格汇总"""
+        return self.db.fetch_all(
+            """SELECT day, trade_count, min_price, max_price, total_price, last_price, last_traded_at
+               FROM market_price_daily
+               WHERE item_type = ? AND template_id = ? AND day >= ?
+               ORDER BY day""",
+            (item_type, template_id, since_day)
+        )
+
+    def _move_escrowed_bait(self, conn, to_user_id: str, bait_inventory_id: int) -> Optional[int]:
+        """将托管的鱼饵转给指定用户，对方已有同种鱼饵时合并数量，返回鱼饵模板ID"""
+        bait = conn.execute(
+            "SELECT bait_template_id, quantity FROM user_bait_inventory WHERE id = ? AND user_id = ?",
+            (bait_inventory_id, MARKET_ESCROW_USER_ID)
+        ).fetchone()
+        if not bait:
+            return None
+
+        existing = conn.execute(
+            "SELECT id FROM user_bait_inventory WHERE user_id = ? AND bait_template_id = ?",
+            (to_user_id, bait['bait_template_id'])
+        ).fetchone()
+        if existing:
+            conn.execute(
+                "UPDATE user_bait_inventory SET quantity = quantity + ? WHERE id = ?",
+                (bait['quantity'], existing['id'])
+            )
+            conn.execute("DELETE FROM user_bait_inventory WHERE id = ?", (bait_inventory_id,))
+        else:
+            conn.execute(
+                "UPDATE user_bait_inventory SET user_id = ? WHERE id = ?",
+                (to_user_id, bait_inventory_id)
+            )
+        return bait['bait_template_id']
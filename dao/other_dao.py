@@ -3,7 +3,7 @@
 """
 import time
 from typing import List, Optional, Dict, Any
-from ..models.database import DatabaseManager
+from ..models.database import DatabaseManager, LEADERBOARD_COLUMNS
 from ..models.user import User
 from .base_dao import BaseDAO
 
@@ -11,43 +11,140 @@ from .base_dao import BaseDAO
 class OtherDAO(BaseDAO):
     """其他服务数据访问对象，封装所有其他服务相关的数据库操作"""
 
+    # 排行榜展示用的用户信息：装备的鱼竿、饰品和当前称号
+    LEADERBOARD_DISPLAY_SQL = """
+            SELECT u.user_id, u.nickname, u.gold, u.fishing_count, u.total_income,
+                   u.total_fish_weight, u.rare_fish_count, u.level, u.{column} AS score,
+                   uri.rod_template_id, rt.name as rod_name,
+                   uai.accessory_template_id, at.name as accessory_name,
+                   t.name as title_name
+            FROM {source}
+            LEFT JOIN user_rod_instances uri ON u.user_id = uri.user_id AND uri.is_equipped = TRUE
+            LEFT JOIN rod_templates rt ON uri.rod_template_id = rt.id
+            LEFT JOIN user_accessory_instances uai ON u.user_id = uai.user_id AND uai.is_equipped = TRUE
+            LEFT JOIN accessory_templates at ON uai.accessory_template_id = at.id
+            LEFT JOIN user_titles ut ON u.user_id = ut.user_id AND ut.is_active = TRUE
+            LEFT JOIN titles t ON ut.title_id = t.id
+    """
+
+    def get_leaderboard(self, board: str, group_id: Optional[str], limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        获取排行榜（board 见 LEADERBOARD_COLUMNS），没有 group_id 时为全服排行
+
+        先取前 limit 名（全服按排行索引；按群经 user_groups 的群索引取群成员再排序），
+        再只为这些用户关联装备和称号
+        """
+        column = LEADERBOARD_COLUMNS[board]
+        if group_id:
+            top = f"""SELECT m.user_id, m.{column} AS score FROM user_groups g
+                      JOIN users m ON m.user_id = g.user_id
+                      WHERE g.group_id = ? ORDER BY m.{column} DESC LIMIT ?"""
+            params = (group_id, limit)
+        else:
+            top = f"SELECT user_id, {column} AS score FROM users ORDER BY {column} DESC LIMIT ?"
+            params = (limit,)
+        source = f"({top}) top JOIN users u ON u.user_id = top.user_id"
+        return self.db.fetch_all(
+            self.LEADERBOARD_DISPLAY_SQL.format(column=column, source=source) + "ORDER BY top.score DESC",
+            params
+        )
+
+    def get_leaderboard_users(self, board: str, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """按给定的用户ID（已排好名次）获取排行榜展示信息，结果按 user_ids 的顺序排列"""
+        if not user_ids:
+            return []
+        column = LEADERBOARD_COLUMNS[board]
+        rows = self.db.fetch_all(
+            self.LEADERBOARD_DISPLAY_SQL.format(column=column, source="users u")
+            + "WHERE u.user_id IN ({})".format(','.join('?' * len(user_ids))),
+            tuple(user_ids)
+        )
+        order = {user_id: i for i, user_id in enumerate(user_ids)}
+        return sorted(rows, key=lambda row: order[row['user_id']])
+
     def get_comprehensive_leaderboard(self, group_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """获取综合排行榜"""
-        # 如果没有提供group_id，则获取所有用户的排行榜
-        if not group_id:
-            return self.db.fetch_all("""
-                SELECT u.nickname, u.gold, u.fishing_count, u.total_income,
-                       uri.rod_template_id, rt.name as rod_name,
-                       uai.accessory_template_id, at.name as accessory_name,
-                       t.name as title_name
-                FROM users u
-                LEFT JOIN user_rod_instances uri ON u.user_id = uri.user_id AND uri.is_equipped = TRUE
-                LEFT JOIN rod_templates rt ON uri.rod_template_id = rt.id
-                LEFT JOIN user_accessory_instances uai ON u.user_id = uai.user_id AND uai.is_equipped = TRUE
-                LEFT JOIN accessory_templates at ON uai.accessory_template_id = at.id
-                LEFT JOIN user_titles ut ON u.user_id = ut.user_id AND ut.is_active = TRUE
-                LEFT JOIN titles t ON ut.title_id = t.id
-                ORDER BY (u.gold + u.fishing_count * 10 + u.total_income) DESC
-                LIMIT ?
-            """, (limit,))
+        return self.get_leaderboard('comprehensive', group_id, limit)
+
+    def get_user_rank(self, board: str, user_id: str, group_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取用户在排行榜上的分数、名次和总人数，没有 group_id 时为全服排行，用户不在该群时返回 None
+
+        名次 = 分数更高的人数 + 1；全服在排行索引上计数，只扫描排在前面的部分，按群只统计 user_groups 中的群成员
+        """
+        column = LEADERBOARD_COLUMNS[board]
+        if group_id:
+            return self.db.fetch_one(f"""
+                SELECT u.user_id, u.nickname, u.{column} AS score,
+                       (SELECT COUNT(*) FROM user_groups g JOIN users m ON m.user_id = g.user_id
+                        WHERE g.group_id = ug.group_id AND m.{column} > u.{column}) + 1 AS rank,
+                       (SELECT COUNT(*) FROM user_groups g JOIN users m ON m.user_id = g.user_id
+                        WHERE g.group_id = ug.group_id) AS total
+                FROM user_groups ug
+                JOIN users u ON u.user_id = ug.user_id
+                WHERE ug.user_id = ? AND ug.group_id = ?
+            """, (user_id, group_id))
+        return self.db.fetch_one(f"""
+            SELECT u.user_id, u.nickname, u.{column} AS score,
+                   (SELECT COUNT(*) FROM users WHERE {column} > u.{column}) + 1 AS rank,
+                   (SELECT COUNT(*) FROM users) AS total
+            FROM users u
+            WHERE u.user_id = ?
+        """, (user_id,))
+
+    def get_rank_neighbors(self, board: str, score, group_id: Optional[str] = None,
+                           limit: int = 1) -> List[Dict[str, Any]]:
+        """
+        获取分数紧挨着 score 的用户：更高的和更低的各 limit 个，分数相同的不算
+
+        结果按分数从高到低排列，above 列为 1 的是分数更高的用户
+        """
+        column = LEADERBOARD_COLUMNS[board]
+        if group_id:
+            source = "user_groups g JOIN users m ON m.user_id = g.user_id WHERE g.group_id = ? AND"
+            scope = (group_id,)
         else:
-            # 如果提供了group_id，则按group_id过滤
-            return self.db.fetch_all("""
-                SELECT u.nickname, u.gold, u.fishing_count, u.total_income,
-                       uri.rod_template_id, rt.name as rod_name,
-                       uai.accessory_template_id, at.name as accessory_name,
-                       t.name as title_name
-                FROM users u
-                LEFT JOIN user_rod_instances uri ON u.user_id = uri.user_id AND uri.is_equipped = TRUE
-                LEFT JOIN rod_templates rt ON uri.rod_template_id = rt.id
-                LEFT JOIN user_accessory_instances uai ON u.user_id = uai.user_id AND uai.is_equipped = TRUE
-                LEFT JOIN accessory_templates at ON uai.accessory_template_id = at.id
-                LEFT JOIN user_titles ut ON u.user_id = ut.user_id AND ut.is_active = TRUE
-                LEFT JOIN titles t ON ut.title_id = t.id
-                WHERE u.group_id = ?
-                ORDER BY (u.gold + u.fishing_count * 10 + u.total_income) DESC
-                LIMIT ?
-            """, (group_id, limit))
+            source = "users m WHERE"
+            scope = ()
+        return self.db.fetch_all(f"""
+            SELECT * FROM (
+                SELECT m.user_id, m.nickname, m.{column} AS score, 1 AS above FROM {source}
+                m.{column} > ? ORDER BY m.{column} ASC LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT m.user_id, m.nickname, m.{column} AS score, 0 AS above FROM {source}
+                m.{column} < ? ORDER BY m.{column} DESC LIMIT ?
+            )
+            ORDER BY score DESC
+        """, scope + (score, limit) + scope + (score, limit))
+
+    # 内存排行需要的用户字段
+    RANK_ROW_SQL = """SELECT user_id, nickname, gold, fishing_count, total_income,
+                             total_fish_weight, rare_fish_count, level
+                      FROM users"""
+
+    def get_rank_rows(self, user_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """获取内存排行需要的用户数据，不传 user_ids 时返回所有用户"""
+        if user_ids is None:
+            return self.db.fetch_all(self.RANK_ROW_SQL)
+        if not user_ids:
+            return []
+        return self.db.fetch_all(
+            self.RANK_ROW_SQL + " WHERE user_id IN ({})".format(','.join('?' * len(user_ids))),
+            tuple(user_ids)
+        )
+
+    def get_rank_groups(self, user_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """获取用户所在的群（user_id, group_id），不传 user_ids 时返回所有用户的"""
+        if user_ids is None:
+            return self.db.fetch_all("SELECT user_id, group_id FROM user_groups")
+        if not user_ids:
+            return []
+        return self.db.fetch_all(
+            "SELECT user_id, group_id FROM user_groups WHERE user_id IN ({})".format(','.join('?' * len(user_ids))),
+            tuple(user_ids)
+        )
 
     def get_user_current_title(self, user_id: str) -> Optional[Dict[str, Any]]:
         """获取用户当前称号"""
@@ -124,7 +124,10 @@ class ShopDAO(BaseDAO):
                 "UPDATE users SET gold = gold - ? WHERE user_id = ? AND gold >= ?",
                 (amount, user_id, amount)
             )
-            return result and result > 0
+            if result and result > 0:
+                self.db.notify_user_changed(user_id)
+                return True
+            return False
         except Exception as e:
             print(f"扣除用户金币失败: {e}")
             return False
\ No newline at end of file
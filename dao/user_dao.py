@@ -1,12 +1,17 @@
 """
 用户数据访问对象
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import time
 
 from astrbot import logger
 from ..models.user import User
 from ..models.database import DatabaseManager
+from ..enums.constants import Constants
+
+
+class UserUpdateRejected(Exception):
+    """用户写回的条件不满足（如金币会变为负数），用于回滚写回事务"""
 
 
 class UserDAO:
@@ -22,7 +27,7 @@ class UserDAO:
             (user_id,)
         )
         if result:
-            return User(
+            user = User(
                 user_id=result['user_id'],
                 platform=result['platform'],
                 group_id=result['group_id'] or "",
@@ -38,9 +43,14 @@ class UserDAO:
                 total_fishing_count=result['total_fishing_count'],
                 total_coins_earned=result['total_coins_earned'],
                 fish_pond_capacity=result['fish_pond_capacity'],
+                rare_fish_count=result['rare_fish_count'],
+                last_sign_in_date=result['last_sign_in_date'] or "",
+                sign_in_streak=result['sign_in_streak'] or 0,
                 created_at=result['created_at'],
                 updated_at=result['updated_at']
             )
+            user.mark_saved()
+            return user
         return None
 
     def get_user_basic_info(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -63,40 +73,67 @@ class UserDAO:
                     user.total_coins_earned, user.fish_pond_capacity, user.created_at, user.updated_at
                 )
             )
+            user.mark_saved()
+            self.db.notify_user_changed(user.user_id)
             return True
         except Exception as e:
             print(f"创建用户失败: {e}")
             return False
 
+    # 计数类字段：写回时按差值累加（gold = gold + ?），不会覆盖其他命令同时做的增减
+    DELTA_FIELDS = frozenset({
+        'gold', 'exp', 'fishing_count', 'total_fish_weight', 'total_income',
+        'total_fishing_count', 'total_coins_earned', 'fish_pond_capacity', 'rare_fish_count',
+    })
+
+    @classmethod
+    def build_update(cls, user: User) -> Optional[Tuple[str, tuple, Optional[dict]]]:
+        """
+        生成只更新修改过的字段的 UPDATE 语句，没有修改时返回 None
+
+        返回 (语句, 参数, 通知监听者的新值)。计数字段写的是差值，写入后数据库中的值不一定等于内存中的值，
+        这时通知值为 None，由监听者重新读取；不知道数据库中的值的用户整行写入。
+        金币减少时带上 gold + ? >= 0 条件：其他命令同时花掉了金币时不更新任何行（rowcount 为 0），视为写回失败
+        """
+        changed = user.changed_fields()
+        if not changed:
+            return None
+
+        assignments, params, values, conditions = [], [], {}, []
+        for name, saved in changed.items():
+            value = getattr(user, name)
+            if user.is_tracked and name in cls.DELTA_FIELDS:
+                delta = (value or 0) - (saved or 0)
+                assignments.append(f"{name} = {name} + ?")
+                params.append(delta)
+                values = None
+                if name == 'gold' and delta < 0:
+                    conditions.append(delta)
+            else:
+                assignments.append(f"{name} = ?")
+                params.append(value)
+                if values is not None:
+                    values[name] = value
+
+        user.updated_at = int(time.time())
+        query = f"UPDATE users SET {', '.join(assignments)}, updated_at = ? WHERE user_id = ?"
+        if conditions:
+            query += " AND gold + ? >= 0"
+        return query, (*params, user.updated_at, user.user_id, *conditions), values
+
     def update_user(self, user: User) -> bool:
-        """更新用户信息"""
+        """写回用户修改过的字段，没有更新到任何行（如金币不足）时返回 False，用户仍保持未写回状态"""
+        update = self.build_update(user)
+        if update is None:
+            return True
+
+        query, params, values = update
         try:
-            user.updated_at = int(time.time())
-            self.db.execute_query(
-                """UPDATE users
-                   SET platform=?,
-                       group_id=?,
-                       nickname=?,
-                       gold=?,
-                       exp=?,
-                       level=?,
-                       fishing_count=?,
-                       total_fish_weight=?,
-                       total_income=?,
-                       last_fishing_time=?,
-                       auto_fishing=?,
-                       total_fishing_count=?,
-                       total_coins_earned=?,
-                       fish_pond_capacity=?,
-                       updated_at=?
-                   WHERE user_id = ?""",
-                (
-                    user.platform, user.group_id, user.nickname, user.gold, user.exp, user.level, user.fishing_count,
-                    user.total_fish_weight, user.total_income, user.last_fishing_time,
-                    user.auto_fishing, user.total_fishing_count, user.total_coins_earned,
-                    user.fish_pond_capacity, user.updated_at, user.user_id
-                )
-            )
+            if self.db.execute_update(query, params) <= 0:
+                print(f"更新用户失败: 用户 {user.user_id} 不存在或金币不足")
+                return False
+            user.mark_saved()
+            self.db.notify_user_changed(user.user_id, values)
             return True
         except Exception as e:
             print(f"更新用户失败: {e}")
@@ -109,6 +146,7 @@ class UserDAO:
                 f"UPDATE users SET {field} = ? WHERE user_id = ?",
                 (value, user_id)
             )
+            self.db.notify_user_changed(user_id, {field: value})
             return True
         except Exception as e:
             print(f"更新用户字段 {field} 失败: {e}")
@@ -126,6 +164,7 @@ class UserDAO:
             query = f"UPDATE users SET {set_clause}, updated_at = ? WHERE user_id = ?"
             values = tuple(values)
             self.db.execute_query(query, values)
+            self.db.notify_user_changed(user_id, fields)
             return True
         except Exception as e:
             print(f"更新用户字段失败: {e}")
@@ -141,6 +180,7 @@ class UserDAO:
                 "UPDATE users SET gold = gold + ? WHERE user_id = ?",
                 (amount, user_id)
             )
+            self.db.notify_user_changed(user_id)
             return True
         except Exception as e:
             print(f"增加用户金币失败: {e}")
@@ -156,7 +196,10 @@ class UserDAO:
                 "UPDATE users SET gold = gold - ? WHERE user_id = ? AND gold >= ?",
                 (amount, user_id, amount)
             )
-            return result and result > 0
+            if result and result > 0:
+                self.db.notify_user_changed(user_id)
+                return True
+            return False
         except Exception as e:
             print(f"扣除用户金币失败: {e}")
             return False
@@ -168,6 +211,7 @@ class UserDAO:
                 "UPDATE users SET exp = ?, level = ? WHERE user_id = ?",
                 (exp, level, user_id)
             )
+            self.db.notify_user_changed(user_id, {'exp': exp, 'level': level})
             return True
         except Exception as e:
             print(f"更新用户经验值和等级失败: {e}")
@@ -186,11 +230,36 @@ class UserDAO:
                    WHERE user_id = ?""",
                 (fishing_count, last_fishing_time, total_fish_weight, total_income, user_id)
             )
+            self.db.notify_user_changed(user_id, {'fishing_count': fishing_count,
+                                                  'total_fish_weight': total_fish_weight,
+                                                  'total_income': total_income})
             return True
         except Exception as e:
             print(f"更新用户钓鱼统计数据失败: {e}")
             return False
 
+    def touch_group(self, user_id: str, group_id: str, last_seen: int) -> bool:
+        """
+        记录用户在群里活跃：不在该群时加入，已在时更新 last_seen；用户未注册时不写入
+
+        返回是否写入了记录
+        """
+        try:
+            rowcount = self.db.execute_update(
+                """INSERT INTO user_groups (user_id, group_id, last_seen)
+                   SELECT user_id, ?, ? FROM users WHERE user_id = ?
+                   ON CONFLICT (user_id, group_id) DO UPDATE SET last_seen = excluded.last_seen""",
+                (group_id, last_seen, user_id)
+            )
+            if rowcount and rowcount > 0:
+                # 所在的群可能有变化，排行等监听者重新读取
+                self.db.notify_user_changed(user_id)
+                return True
+            return False
+        except Exception as e:
+            print(f"记录用户所在群失败: {e}")
+            return False
+
     def set_auto_fishing(self, user_id: str, auto_fishing: bool) -> bool:
         """设置自动钓鱼状态"""
         try:
@@ -203,40 +272,47 @@ class UserDAO:
             print(f"设置自动钓鱼状态失败: {e}")
             return False
 
-    def check_sign_in(self, user_id: str, date: str) -> bool:
-        """检查用户是否已签到"""
-        try:
-            existing_record = self.db.fetch_one(
-                "SELECT * FROM sign_in_logs WHERE user_id = ? AND date = ?",
-                (user_id, date)
-            )
-            return existing_record
-        except Exception as e:
-            print(f"设置自动钓鱼状态失败: {e}")
-            return False
+    def sign_in(self, user_id: str, today: str, yesterday: str) -> Optional[Dict[str, Any]]:
+        """
+        签到：一条 UPDATE 完成连续天数、金币和经验的更新，返回更新后的 sign_in_streak、gold、exp、level
 
-    def yesterday_record(self, user_id: str, date: str) -> Optional[dict]:
-        """检查用户昨天是否签到"""
+        奖励与 calculate_sign_in_rewards 相同：基础值 + (连续天数 - 1) * 增量，昨天签到过时连续天数加一。
+        今天已签到或用户不存在时返回 None
+        """
         try:
-            yesterday_record = self.db.fetch_one(
-            "SELECT streak FROM sign_in_logs WHERE user_id = ? AND date = ?",
-            (user_id, date)
-        )
-            return yesterday_record
+            with self.db.transaction() as conn:
+                row = conn.execute(
+                    """UPDATE users SET
+                           sign_in_streak = CASE WHEN last_sign_in_date = ? THEN sign_in_streak + 1 ELSE 1 END,
+                           gold = gold + ? + CASE WHEN last_sign_in_date = ? THEN sign_in_streak * ? ELSE 0 END,
+                           exp = exp + ? + CASE WHEN last_sign_in_date = ? THEN sign_in_streak * ? ELSE 0 END,
+                           last_sign_in_date = ?,
+                           updated_at = ?
+                       WHERE user_id = ? AND last_sign_in_date IS NOT ?
+                       RETURNING sign_in_streak, gold, exp, level""",
+                    (yesterday,
+                     Constants.SIGN_IN_BASE_GOLD, yesterday, Constants.SIGN_IN_STREAK_GOLD_INCREMENT,
+                     Constants.SIGN_IN_BASE_EXP, yesterday, Constants.SIGN_IN_STREAK_EXP_INCREMENT,
+                     today, int(time.time()), user_id, today)
+                ).fetchone()
+            if row:
+                self.db.notify_user_changed(user_id)
+            return row
         except Exception as e:
-            print(f"检查用户昨天是否签到失败: {e}")
+            print(f"签到失败: {e}")
             return None
 
-    def record_sign_in(self, user_id: str, today: str, streak: int, reward_gold: int) -> bool:
-        """记录用户签到"""
+    def record_sign_ins(self, records: List[tuple]) -> bool:
+        """批量写入签到记录，records 为 (user_id, date, streak, reward_gold, timestamp)"""
         try:
-            self.db.execute_query(
-                """INSERT INTO sign_in_logs
-                       (user_id, date, streak, reward_gold, timestamp)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (user_id, today, streak, reward_gold, int(time.time()))
-            )
+            with self.db.transaction() as conn:
+                conn.executemany(
+                    """INSERT OR IGNORE INTO sign_in_logs
+                           (user_id, date, streak, reward_gold, timestamp)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    records
+                )
             return True
         except Exception as e:
-            print(f"记录用户签到失败: {e}")
+            print(f"写入签到记录失败: {e}")
             return False
@@ -0,0 +1,174 @@
+"""
+绘图资源缓存：字体、预处理后的图片和文字尺寸在每个进程中只加载/计算一次
+
+资源文件版本每个进程只计算一次，由渲染服务通过 set_asset_version 更新；版本变化时所有缓存一起清空
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from PIL import Image, ImageFont
+
+from ..utils.cache import LRUCache
+from . import imaging
+from ..utils.render_cache import directory_fingerprint
+
+RESOURCE_DIR = os.path.join(os.path.dirname(__file__), "resource")
+DEFAULT_FONT = "DouyinSansBold.otf"
+
+# 预热时加载的字体字号（各绘图模块用到的全部字号）
+WARM_UP_FONT_SIZES = (16, 18, 20, 22, 24, 28, 32, 36, 42)
+
+# 文字尺寸缓存的最大条目数
+TEXT_BBOX_CACHE_SIZE = 4096
+
+_lock = threading.RLock()  # 底图的绘制函数内部还会加载字体，需要可重入
+_fonts: Dict[Tuple[str, int], Any] = {}
+_images: Dict[Hashable, Image.Image] = {}
+_text_bboxes = LRUCache(TEXT_BBOX_CACHE_SIZE)
+_asset_version: Optional[str] = None
+_stats = {'font_loads': 0, 'font_hits': 0, 'image_loads': 0, 'image_hits': 0, 'bbox_hits': 0, 'bbox_misses': 0}
+
+
+def resource_path(name: str) -> str:
+    """资源文件的完整路径，传入绝对路径时原样返回"""
+    return name if os.path.isabs(name) else os.path.join(RESOURCE_DIR, name)
+
+
+def get_font(name: str = DEFAULT_FONT, size: int = 20):
+    """按 (路径, 字号) 缓存字体，加载失败时使用 Pillow 默认字体"""
+    key = (resource_path(name), size)
+    font = _fonts.get(key)
+    if font is not None:
+        _stats['font_hits'] += 1
+        return font
+
+    with _lock:
+        font = _fonts.get(key)
+        if font is None:
+            try:
+                font = ImageFont.truetype(key[0], size)
+            except Exception:
+                font = ImageFont.load_default()
+            _fonts[key] = font
+            _stats['font_loads'] += 1
+    return font
+
+
+def get_processed_image(key: Hashable, loader: Callable[[], Image.Image]) -> Image.Image:
+    """
+    按 key 缓存预处理后的图片，loader 只在首次使用时调用
+
+    返回的图片在多次绘制间共享，调用方只能读取（如作为 paste 的来源），不要修改
+    """
+    image = _images.get(key)
+    if image is not None:
+        _stats['image_hits'] += 1
+        return image
+
+    with _lock:
+        image = _images.get(key)
+        if image is None:
+            image = loader()
+            image.load()
+            _images[key] = image
+            _stats['image_loads'] += 1
+    return image
+
+
+def get_image(name: str, size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    """读取资源图片并按需缩放，结果缓存"""
+    def load():
+        image = Image.open(resource_path(name))
+        return image.resize(size) if size else image
+
+    return get_processed_image(("image", name, size), load)
+
+
+def asset_version() -> str:
+    """资源文件的版本；首次调用时扫描资源目录，之后由 set_asset_version 更新"""
+    global _asset_version
+    if _asset_version is None:
+        with _lock:
+            if _asset_version is None:
+                _asset_version = directory_fingerprint(RESOURCE_DIR)
+    return _asset_version
+
+
+def set_asset_version(version: str) -> None:
+    """设置资源文件的版本（由渲染服务传入），与当前版本不同时清空字体、图片、底图等全部缓存"""
+    global _asset_version
+    if version == _asset_version:
+        return
+    with _lock:
+        if version != _asset_version:
+            _clear_caches()
+            _asset_version = version
+
+
+def get_base_layer(name: str, builder: Callable[[], Image.Image]) -> Image.Image:
+    """
+    图片的静态底图（背景、卡片、固定文字），每个进程只绘制一次，资源文件版本变化后重新绘制
+
+    返回共享的图片，调用方需要 copy() 之后再在上面绘制动态内容
+    """
+    return get_processed_image(("base_layer", name), builder)
+
+
+def text_bbox(text: str, font) -> Tuple[int, int, int, int]:
+    """文字在 (0, 0) 处绘制时的边界框，与 ImageDraw.textbbox 在 RGB 画布上的结果一致"""
+    key = (font, text)
+    bbox = _text_bboxes.get(key)
+    if bbox is not None:
+        _stats['bbox_hits'] += 1
+        return bbox
+
+    _stats['bbox_misses'] += 1
+    bbox = font.getbbox(text, "L")
+    _text_bboxes.set(key, bbox)
+    return bbox
+
+
+def text_size(text: str, font) -> Tuple[int, int]:
+    """文字的宽和高"""
+    left, top, right, bottom = text_bbox(text, font)
+    return right - left, bottom - top
+
+
+def warm_up(font_sizes=WARM_UP_FONT_SIZES, images=(("gold.png", (40, 40)), ("silver.png", (35, 35)),
+                                                    ("bronze.png", (35, 35)))) -> dict:
+    """预先加载常用字体和图片，渲染进程启动时调用"""
+    for size in font_sizes:
+        get_font(DEFAULT_FONT, size)
+    for name, size in images:
+        try:
+            get_image(name, size)
+        except Exception as e:
+            print(f"预加载图片 {name} 失败: {e}")
+    return stats()
+
+
+def stats() -> dict:
+    """缓存统计"""
+    return dict(_stats, fonts=len(_fonts), images=len(_images), text_bboxes=len(_text_bboxes))
+
+
+def _clear_caches() -> None:
+    """清空字体、图片、文字尺寸以及 imaging 中按参数缓存的结果"""
+    with _lock:
+        _fonts.clear()
+        _images.clear()
+        _text_bboxes.clear()
+        imaging.vertical_gradient.cache_clear()
+        imaging.rounded_mask.cache_clear()
+        imaging.replace_near_white_file.cache_clear()
+
+
+def clear() -> None:
+    """清空所有缓存和统计，下次使用时重新读取资源文件版本"""
+    global _asset_version
+    with _lock:
+        _clear_caches()
+        _asset_version = None
+        for name in _stats:
+            _stats[name] = 0
@@ -1,38 +1,31 @@
 import math
-import os
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageDraw, ImageFilter
 
+from . import assets, imaging
 
-def draw_help_image():
+
+def draw_help_image() -> Image.Image:
+    """
+    返回帮助图片
+
+    帮助图片的内容完全固定，整张图作为静态底图每个进程只绘制一次，返回的是共享的图像，调用方不要修改
+    """
+    return assets.get_base_layer("help", _build_help_image)
+
+
+def _build_help_image() -> Image.Image:
+    """绘制帮助图片，返回 PIL 图像"""
     # 画布尺寸
     width, height = 800, 2800
 
     # 1. 创建渐变背景
-    def create_vertical_gradient(w, h, top_color, bottom_color):
-        base = Image.new('RGB', (w, h), top_color)
-        top_r, top_g, top_b = top_color
-        bot_r, bot_g, bot_b = bottom_color
-        draw = ImageDraw.Draw(base)
-        for y in range(h):
-            ratio = y / (h - 1)
-            r = int(top_r + (bot_r - top_r) * ratio)
-            g = int(top_g + (bot_g - top_g) * ratio)
-            b = int(top_b + (bot_b - top_b) * ratio)
-            draw.line([(0, y), (w, y)], fill=(r, g, b))
-        return base
-
     bg_top = (240, 248, 255)  # 浅蓝
     bg_bot = (255, 255, 255)  # 白
-    image = create_vertical_gradient(width, height, bg_top, bg_bot)
+    image = imaging.vertical_gradient((width, height), bg_top, bg_bot).copy()
     draw = ImageDraw.Draw(image)
 
     # 2. 加载字体
-    def load_font(name, size):
-        path = os.path.join(os.path.dirname(__file__), "resource", name)
-        try:
-            return ImageFont.truetype(path, size)
-        except:
-            return ImageFont.load_default()
+    load_font = assets.get_font
 
     title_font = load_font("DouyinSansBold.otf", 32)
     subtitle_font = load_font("DouyinSansBold.otf", 28)
@@ -48,53 +41,32 @@ def draw_help_image():
     shadow_color = (0, 0, 0, 80)
 
     # 4. 获取文本尺寸的辅助函数
-    def get_text_size(text, font):
-        bbox = draw.textbbox((0, 0), text, font=font)
-        return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-    # 5. 处理logo背景色的函数
-    def replace_white_background(img, new_bg_color=bg_top, threshold=240):
-        """将图片的白色背景替换为指定颜色"""
-        img = img.convert("RGBA")
-        data = img.getdata()
-        new_data = []
-
-        for item in data:
-            r, g, b = item[:3]
-            alpha = item[3] if len(item) > 3 else 255
-
-            # 如果像素接近白色，就替换为新背景色
-            if r >= threshold and g >= threshold and b >= threshold:
-                new_data.append((*new_bg_color, alpha))
-            else:
-                new_data.append(item)
-
-        img.putdata(new_data)
-        return img
-
-    # 6. 绘制 Logo 和 标题
+    get_text_size = assets.text_size
+
+    # 5. 绘制 Logo 和 标题
     logo_size = 160  # 增加logo尺寸
     logo_x = 30
     logo_y = 25
 
-    try:
-        logo = Image.open(os.path.join(os.path.dirname(__file__), "resource", "astrbot_logo.jpg"))
-
-        # 将白色背景替换为与画布背景一致的颜色
-        logo = replace_white_background(logo, bg_top)
+    def load_logo():
+        # 将白色背景替换为与画布背景一致的颜色（结果共享，复制后再缩放）
+        logo = imaging.replace_near_white_file(assets.resource_path("astrbot_logo.jpg"), bg_top).copy()
 
         # 保持纵横比调整大小
         logo.thumbnail((logo_size, logo_size), Image.Resampling.LANCZOS)
 
         # 创建圆角遮罩
-        mask = Image.new("L", logo.size, 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.rounded_rectangle([0, 0, logo.size[0], logo.size[1]], 20, fill=255)
+        mask = imaging.rounded_mask(logo.size, 20)
 
         # 应用圆角遮罩
         output = Image.new("RGBA", logo.size, (0, 0, 0, 0))
         output.paste(logo, (0, 0))
         output.putalpha(mask)
+        return output
+
+    try:
+        # 处理后的 logo 只和背景色、尺寸有关，每个进程只处理一次
+        output = assets.get_processed_image(("help_logo", bg_top, logo_size), load_logo)
 
         # 贴到主图上
         image.paste(output, (logo_x, logo_y), output)
@@ -111,7 +83,7 @@ def draw_help_image():
     title_y = logo_y + logo_size // 2
     draw.text((width // 2, title_y), "钓鱼游戏帮助", fill=title_color, font=title_font, anchor="mm")
 
-    # 7. 圆角矩形＋阴影 helper
+    # 6. 圆角矩形＋阴影 helper
     def draw_card(x0, y0, x1, y1, radius=12):
         # 简化阴影效果
         shadow_offset = 3
@@ -121,7 +93,7 @@ def draw_help_image():
         # 白色卡片
         draw.rounded_rectangle([x0, y0, x1, y1], radius, fill=card_bg, outline=line_color, width=1)
 
-    # 8. 绘制章节和命令
+    # 7. 绘制章节和命令
     def draw_section(title, cmds, y_start, cols=3):
         # 章节标题左对齐
         title_x = 50
@@ -161,7 +133,7 @@ def draw_help_image():
         rows = math.ceil(len(cmds) / cols)
         return y + rows * (card_h + pad) + 35
 
-    # 9. 各段命令数据
+    # 8. 各段命令数据
     basic = [
         ("注册", "注册用户"),
         ("钓鱼", "进行一次钓鱼"),
@@ -202,6 +174,7 @@ def draw_help_image():
     gacha = [
         ("抽卡 [卡池ID]", "抽卡游戏"),
         ("十连 [卡池ID]", "对1或2卡池\n进行十连抽卡"),
+        ("连抽 [卡池ID] [次数]", "一次进行\n多次抽卡"),
         ("查看卡池 [卡池ID]", "查看卡池"),
         ("抽卡记录", "查看抽卡记录"),
 
@@ -225,7 +198,7 @@ def draw_help_image():
         # ("关闭钓鱼后台管理", "关闭钓鱼后台管理")
     ]
 
-    # 10. 绘制各个部分 - 调整起始位置给logo留足空间
+    # 9. 绘制各个部分 - 调整起始位置给logo留足空间
     y0 = logo_y + logo_size + 30
     y0 = draw_section("🎣 基础与核心玩法", basic, y0, cols=3)
     y0 = draw_section("🎒 背包与资产管理", inventory, y0, cols=3)
@@ -239,12 +212,6 @@ def draw_help_image():
     draw.text((width // 2, footer_y), "💡 提示：命令中的 [ID] 表示必填参数，<> 表示可选参数",
               fill=(120, 120, 120), font=desc_font, anchor="mm")
 
-    # 11. 裁剪图像到实际内容高度并保存
+    # 10. 裁剪图像到实际内容高度
     final_height = footer_y + 30
-    image = image.crop((0, 0, width, min(final_height, height)))
-
-    output_path = "data/plugins/astrbot_plugin_gaismanor/cache/fishing_commands_beautiful.png"
-    # 确保缓存目录存在
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    image.save(output_path, quality=95)
-    return output_path
+    return image.crop((0, 0, width, min(final_height, height)))
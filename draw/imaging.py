@@ -0,0 +1,68 @@
+"""
+绘图用的图像工具：渐变背景、圆角遮罩和颜色替换
+
+用 Pillow 的整图操作代替逐行/逐像素的 Python 循环；渐变、遮罩和资源图片的颜色替换按参数缓存，
+返回的图片在多次绘制间共享，调用方只能读取或 copy() 之后再修改
+"""
+from functools import lru_cache
+from typing import Tuple
+
+from PIL import Image, ImageChops, ImageDraw
+
+Color = Tuple[int, int, int]
+
+
+@lru_cache(maxsize=32)
+def vertical_gradient(size: Tuple[int, int], top_color: Color, bottom_color: Color) -> Image.Image:
+    """
+    从上到下的线性渐变（RGB）
+
+    每行颜色为 int(top + (bottom - top) * y / (h - 1))，与逐行 draw.line 的结果逐像素一致：
+    先生成 1 像素宽的颜色列，再横向最近邻拉伸到整张图
+    """
+    w, h = size
+    span = max(h - 1, 1)
+    bands = [
+        Image.frombytes('L', (1, h), bytes(int(top + (bottom - top) * (y / span)) for y in range(h)))
+        for top, bottom in zip(top_color, bottom_color)
+    ]
+    return Image.merge('RGB', bands).resize((w, h), Image.Resampling.NEAREST)
+
+
+@lru_cache(maxsize=32)
+def rounded_mask(size: Tuple[int, int], radius: int, supersample: int = 1) -> Image.Image:
+    """
+    圆角矩形的 alpha 遮罩（L 模式）
+
+    supersample > 1 时先按倍数放大绘制再用 LANCZOS 缩小，得到抗锯齿的边缘
+    """
+    w, h = size
+    large_size = (w * supersample, h * supersample)
+    mask = Image.new('L', large_size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle([0, 0, large_size[0], large_size[1]],
+                                           radius=radius * supersample, fill=255)
+    if supersample > 1:
+        mask = mask.resize((w, h), Image.Resampling.LANCZOS)
+    return mask
+
+
+def replace_near_white(image: Image.Image, new_color: Color, threshold: int = 240) -> Image.Image:
+    """
+    把 R、G、B 都不低于 threshold 的像素替换为 new_color，保留原有透明度，返回 RGBA 新图
+
+    三个通道分别二值化后相乘得到替换区域，再整图合成
+    """
+    image = image.convert('RGBA')
+    r, g, b, alpha = image.split()
+    key = lambda v: 255 if v >= threshold else 0
+    mask = ImageChops.multiply(ImageChops.multiply(r.point(key), g.point(key)), b.point(key))
+    rgb = Image.composite(Image.new('RGB', image.size, new_color), image.convert('RGB'), mask)
+    rgb.putalpha(alpha)
+    return rgb
+
+
+@lru_cache(maxsize=32)
+def replace_near_white_file(path: str, new_color: Color, threshold: int = 240) -> Image.Image:
+    """读取图片文件并替换近白色像素（见 replace_near_white），按 (文件, 颜色, 阈值) 缓存"""
+    with Image.open(path) as image:
+        return replace_near_white(image, new_color, threshold)
@@ -1,8 +1,10 @@
 import os
 
-from PIL import Image, ImageDraw, ImageFont
-from typing import List, Dict
+from PIL import Image, ImageDraw
+from typing import List, Dict, Optional
 from astrbot.api import logger
+
+from . import assets
 # 图片基本设置
 IMG_WIDTH = 800
 IMG_HEIGHT = 1500  # 动态调整
@@ -54,7 +56,7 @@ def draw_rounded_rectangle(draw, xy, radius=10, fill=None, outline=None, width=1
 
 def get_text_metrics(text, font, draw):
     """获取文本指标，返回边界框和大小"""
-    bbox = draw.textbbox((0, 0), text, font=font)
+    bbox = assets.text_bbox(text, font)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
     return bbox, (text_width, text_height)
@@ -70,33 +72,23 @@ def format_large_number(number):
     else:
         return f"{number/1000000000:.1f}B".replace(".0B", "B")
 
-def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_ranking.png"):
+def draw_fishing_ranking(user_data: List[Dict], output_path: Optional[str] = None,
+                         title: str = "钓鱼排行榜 TOP10") -> Image.Image:
     """
     绘制钓鱼排行榜图片
 
     参数:
     user_data: 用户数据列表，每个用户是一个字典，包含昵称、称号、金币、钓鱼数量、鱼竿、饰品等信息
-    output_path: 输出图片路径
+    output_path: 输出图片路径，不传时只返回图像不保存
+    title: 图片标题
+    用户字典中有 highlight 时，在金币的位置显示该文字（用于按重量、稀有鱼、等级排行的榜单）
     """
-    # 准备字体
-    try:
-        font_title = ImageFont.truetype(FONT_PATH_BOLD, 42)  # 减小字体尺寸
-        ImageFont.truetype(FONT_PATH_REGULAR, 28)
-        font_rank = ImageFont.truetype(FONT_PATH_BOLD, 32)
-        ImageFont.truetype(FONT_PATH_BOLD, 36)
-        font_name = ImageFont.truetype(FONT_PATH_BOLD, 22)
-        font_regular = ImageFont.truetype(FONT_PATH_REGULAR, 18)
-        font_small = ImageFont.truetype(FONT_PATH_REGULAR, 16)
-    except IOError:
-        # 如果找不到指定字体，
-        logger.warning("指定的字体文件未找到，使用默认字体。")
-        font_title = ImageFont.load_default()
-        ImageFont.load_default()
-        font_rank = ImageFont.load_default()
-        ImageFont.load_default()
-        font_name = ImageFont.load_default()
-        font_regular = ImageFont.load_default()
-        font_small = ImageFont.load_default()
+    # 准备字体（按字号缓存，找不到字体文件时使用默认字体）
+    font_title = assets.get_font(FONT_PATH_BOLD, 42)  # 减小字体尺寸
+    font_rank = assets.get_font(FONT_PATH_BOLD, 32)
+    font_name = assets.get_font(FONT_PATH_BOLD, 22)
+    font_regular = assets.get_font(FONT_PATH_REGULAR, 18)
+    font_small = assets.get_font(FONT_PATH_REGULAR, 16)
     # 取前10名用户
     top_users = user_data[:10] if len(user_data) > 10 else user_data
 
@@ -112,7 +104,7 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_rank
                           radius=CORNER_RADIUS, fill=COLOR_HEADER_BG)
 
     # 绘制标题
-    title_text = "钓鱼排行榜 TOP10"
+    title_text = title
     _, (title_width, title_height) = get_text_metrics(title_text, font_title, draw)
     title_x = (IMG_WIDTH - title_width) // 2
     title_y = PADDING + (HEADER_HEIGHT - title_height) // 2
@@ -124,9 +116,9 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_rank
     # 奖杯符号
     trophy_symbols = []
     try:
-        gold_trophy = Image.open(os.path.join(os.path.dirname(__file__),"resource", "gold.png") ).resize((40, 40))  # 减小奖杯尺寸
-        silver_trophy = Image.open(os.path.join(os.path.dirname(__file__),"resource", "silver.png")).resize((35, 35))
-        bronze_trophy = Image.open(os.path.join(os.path.dirname(__file__),"resource", "bronze.png")).resize((35, 35))
+        gold_trophy = assets.get_image("gold.png", (40, 40))  # 减小奖杯尺寸
+        silver_trophy = assets.get_image("silver.png", (35, 35))
+        bronze_trophy = assets.get_image("bronze.png", (35, 35))
         trophy_symbols = [gold_trophy, silver_trophy, bronze_trophy]
     except Exception as e:
         logger.warning(f"加载奖杯图片失败: {e}")
@@ -196,7 +188,8 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_rank
 
         # 绘制金币（使用更深的金色） - 调整间距
         coins_x = name_x + 140  # 减小间距
-        draw.text((coins_x, fish_y), f"金币: {format_large_number(coins)}", font=font_regular, fill=COLOR_COINS)
+        coins_text = user.get("highlight") or f"金币: {format_large_number(coins)}"
+        draw.text((coins_x, fish_y), coins_text, font=font_regular, fill=COLOR_COINS)
 
         # 绘制装备 - 鱼竿放左侧固定位置
         equip_x = coins_x + 140  # 从金币位置算起
@@ -229,9 +222,11 @@ def draw_fishing_ranking(user_data: List[Dict], output_path: str = "fishing_rank
         current_y = card_y2 + USER_CARD_MARGIN
 
     # 保存图片
-    try:
-        img.save(output_path)
-        logger.info(f"排行榜图片已保存到 {output_path}")
-    except Exception as e:
-        logger.error(f"保存排行榜图片失败: {e}")
-        raise e
\ No newline at end of file
+    if output_path:
+        try:
+            img.save(output_path)
+            logger.info(f"排行榜图片已保存到 {output_path}")
+        except Exception as e:
+            logger.error(f"保存排行榜图片失败: {e}")
+            raise e
+    return img
\ No newline at end of file
@@ -1,18 +1,156 @@
-import os
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
-import requests
+from PIL import Image, ImageDraw, ImageFilter
 from io import BytesIO
-import time
+
+from . import assets, imaging
+from ..enums.constants import Constants
+
+# 画布尺寸
+WIDTH, HEIGHT = 620, 540
+
+# 背景渐变色
+BG_TOP = (174, 214, 241)  # 柔和天蓝色
+BG_BOT = (245, 251, 255)  # 温和淡蓝色
+
+# 颜色定义 - 温和协调的海洋主题配色
+# 主色调：柔和蓝系
+PRIMARY_DARK = (52, 73, 94)      # 温和深蓝 - 主标题
+PRIMARY_MEDIUM = (74, 105, 134)  # 柔和中蓝 - 副标题
+PRIMARY_LIGHT = (108, 142, 191)  # 淡雅蓝 - 强调色
+
+# 文本色：和谐灰蓝色系
+TEXT_PRIMARY = (55, 71, 79)      # 温和深灰 - 主要文本
+TEXT_SECONDARY = (120, 144, 156) # 柔和灰蓝 - 次要文本
+TEXT_MUTED = (176, 190, 197)     # 温和浅灰 - 弱化文本
+
+# 状态色：柔和自然色系
+SUCCESS_COLOR = (76, 175, 80)    # 温和绿 - 成功/积极状态
+WARNING_COLOR = (255, 183, 77)   # 柔和橙 - 警告/中性
+ERROR_COLOR = (229, 115, 115)    # 温和红 - 错误/消极状态
+
+# 背景色：更柔和的对比
+CARD_BG = (255, 255, 255, 240)   # 高透明度白色
+
+# 特殊色：温和特色
+GOLD_COLOR = (240, 173, 78)      # 温和金色 - 金币
+RARE_COLOR = (149, 117, 205)     # 柔和紫色 - 稀有物品
+
+# 布局
+TITLE_TEXT = "用户状态面板"
+TITLE_Y = 20
+CARD_MARGIN = 15
+CARD_HEIGHT = 85
+EQUIPMENT_CARD_HEIGHT = 130
+STATUS_CARD_HEIGHT = 120
+AVATAR_SIZE = Constants.AVATAR_SIZE
+
+
+def _fonts():
+    """状态图片使用的字体：标题、副标题、正文、小号、极小号"""
+    load_font = assets.get_font
+    return (load_font("DouyinSansBold.otf", 28), load_font("DouyinSansBold.otf", 24),
+            load_font("DouyinSansBold.otf", 20), load_font("DouyinSansBold.otf", 16),
+            load_font("DouyinSansBold.otf", 14))
+
+
+def _section_tops():
+    """各区域的纵坐标：用户信息卡片、装备卡片、状态卡片、底部信息"""
+    title_h = assets.text_size(TITLE_TEXT, _fonts()[0])[1]
+    user_card_y = TITLE_Y + title_h + 15
+    equipment_y = user_card_y + CARD_HEIGHT + 5 + 30
+    status_y = equipment_y + EQUIPMENT_CARD_HEIGHT + 5 + 30
+    footer_y = status_y + STATUS_CARD_HEIGHT + 15
+    return user_card_y, equipment_y, status_y, footer_y
+
+
+def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1):
+    """绘制圆角矩形"""
+    x1, y1, x2, y2 = bbox
+    # 绘制主体矩形
+    draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill, outline=outline, width=width)
+    draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill, outline=outline, width=width)
+    # 绘制圆角
+    draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill, outline=outline, width=width)
+    draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill, outline=outline, width=width)
+    draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill, outline=outline, width=width)
+    draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill, outline=outline, width=width)
+
+
+def _build_state_base() -> Image.Image:
+    """
+    绘制状态图片的静态底图：渐变背景、标题、卡片、固定的标签文字和装饰
+    """
+    width, height = WIDTH, HEIGHT
+
+    # 1. 创建渐变背景
+    image = imaging.vertical_gradient((width, height), BG_TOP, BG_BOT).copy()
+    draw = ImageDraw.Draw(image)
+    title_font, subtitle_font, content_font, small_font, tiny_font = _fonts()
+    user_card_y, equipment_y, status_y, _ = _section_tops()
+    card_margin = CARD_MARGIN
+
+    # 绘制标题
+    title_w = assets.text_size(TITLE_TEXT, title_font)[0]
+    draw.text(((width - title_w) // 2, TITLE_Y), TITLE_TEXT, font=title_font, fill=PRIMARY_DARK)
+
+    # 用户信息卡片
+    draw_rounded_rectangle(draw,
+                         (card_margin, user_card_y, width - card_margin, user_card_y + CARD_HEIGHT),
+                         10, fill=CARD_BG)
+
+    # 装备信息区域
+    draw.text((card_margin, equipment_y - 30), "当前装备", font=subtitle_font, fill=PRIMARY_MEDIUM)
+
+    # 装备卡片 - 两列等宽布局
+    card_width = (width - card_margin * 2 - 15) // 2
+    left_card_x = card_margin
+    right_card_x = left_card_x + card_width + 15
+    for card_x in (left_card_x, right_card_x):
+        draw_rounded_rectangle(draw,
+                             (card_x, equipment_y, card_x + card_width, equipment_y + EQUIPMENT_CARD_HEIGHT),
+                             8, fill=CARD_BG)
+
+    left_col_x = left_card_x + 12
+    right_col_x = right_card_x + 12
+    draw.text((left_col_x, equipment_y + 10), "鱼竿", font=small_font, fill=PRIMARY_LIGHT)
+    draw.text((left_col_x, equipment_y + 70), "饰品", font=small_font, fill=PRIMARY_LIGHT)
+    draw.text((right_col_x, equipment_y + 10), "鱼饵", font=small_font, fill=PRIMARY_LIGHT)
+    draw.text((right_col_x, equipment_y + 70), "钓鱼区域", font=small_font, fill=PRIMARY_LIGHT)
+
+    # 钓鱼区域内容（目前只有普通池）
+    draw.text((right_col_x, equipment_y + 90), "普通池", font=content_font, fill=TEXT_PRIMARY)
+    draw.text((right_col_x, equipment_y + 110), "基础钓鱼区域", font=tiny_font, fill=TEXT_MUTED)
+
+    # 状态信息区域
+    draw.text((card_margin, status_y - 30), "状态信息", font=subtitle_font, fill=PRIMARY_MEDIUM)
+    draw_rounded_rectangle(draw,
+                         (card_margin, status_y, width - card_margin, status_y + STATUS_CARD_HEIGHT),
+                         8, fill=CARD_BG)
+
+    # 添加装饰性元素 - 保持简洁
+    corner_size = 15  # 稍微减小装饰元素
+    corner_color = (255, 255, 255, 80)
+
+    # 四角装饰
+    draw.ellipse([8, 8, 8 + corner_size, 8 + corner_size], fill=corner_color)
+    draw.ellipse([width - 8 - corner_size, 8, width - 8, 8 + corner_size], fill=corner_color)
+    draw.ellipse([8, height - 8 - corner_size, 8 + corner_size, height - 8], fill=corner_color)
+    draw.ellipse([width - 8 - corner_size, height - 8 - corner_size, width - 8, height - 8], fill=corner_color)
+
+    return image
+
 
 def draw_state_image(user_data: Dict[str, Any]) -> Image.Image:
     """
     绘制用户状态图像
 
+    静态底图每个进程只绘制一次，每次只在底图的副本上绘制用户相关的内容
+
     Args:
         user_data: 包含用户状态信息的字典，包括以下字段：
             - user_id: 用户ID
+            - avatar: 处理好的头像（PNG 字节，由头像服务提供），没有时不显示头像
             - nickname: 用户昵称
             - coins: 金币数量
             - current_rod: 当前装备的鱼竿信息
@@ -25,124 +163,42 @@ def draw_state_image(user_data: Dict[str, Any]) -> Image.Image:
             - steal_total_value: 偷鱼总价值
             - signed_in_today: 今日是否签到
             - wipe_bomb_remaining: 擦弹剩余次数
+            - rank: 综合排行名次 {'group': 本群名次, 'global': 全服名次}，没有的名次为 None
+            - generated_at: 生成时间（精确到分钟，是缓存键的一部分），没有时使用当前时间
     Returns:
         PIL.Image.Image: 生成的状态图像
     """
-    # 画布尺寸
-    width, height = 620, 540
-
-    # 1. 创建渐变背景
-    def create_vertical_gradient(w, h, top_color, bottom_color):
-        base = Image.new('RGB', (w, h), top_color)
-        top_r, top_g, top_b = top_color
-        bot_r, bot_g, bot_b = bottom_color
-        draw = ImageDraw.Draw(base)
-        for y in range(h):
-            ratio = y / (h - 1)
-            r = int(top_r + (bot_r - top_r) * ratio)
-            g = int(top_g + (bot_g - top_g) * ratio)
-            b = int(top_b + (bot_b - top_b) * ratio)
-            draw.line([(0, y), (w, y)], fill=(r, g, b))
-        return base
-
-    bg_top = (174, 214, 241)  # 柔和天蓝色
-    bg_bot = (245, 251, 255)  # 温和淡蓝色
-    image = create_vertical_gradient(width, height, bg_top, bg_bot)
+    width = WIDTH
+    image = assets.get_base_layer("state", _build_state_base).copy()
     draw = ImageDraw.Draw(image)
 
-    # 2. 加载字体
-    def load_font(name, size):
-        path = os.path.join(os.path.dirname(__file__), "resource", name)
-        try:
-            return ImageFont.truetype(path, size)
-        except Exception as e:
-            return ImageFont.load_default()
-
-    title_font = load_font("DouyinSansBold.otf", 28)
-    subtitle_font = load_font("DouyinSansBold.otf", 24)
-    content_font = load_font("DouyinSansBold.otf", 20)
-    small_font = load_font("DouyinSansBold.otf", 16)
-    tiny_font = load_font("DouyinSansBold.otf", 14)
-
-    # 3. 颜色定义 - 温和协调的海洋主题配色
-    # 主色调：柔和蓝系
-    primary_dark = (52, 73, 94)      # 温和深蓝 - 主标题
-    primary_medium = (74, 105, 134)  # 柔和中蓝 - 副标题
-    primary_light = (108, 142, 191)  # 淡雅蓝 - 强调色
-
-    # 文本色：和谐灰蓝色系
-    text_primary = (55, 71, 79)      # 温和深灰 - 主要文本
-    text_secondary = (120, 144, 156) # 柔和灰蓝 - 次要文本
-    text_muted = (176, 190, 197)     # 温和浅灰 - 弱化文本
-
-    # 状态色：柔和自然色系
-    success_color = (76, 175, 80)    # 温和绿 - 成功/积极状态
-    warning_color = (255, 183, 77)   # 柔和橙 - 警告/中性
-    error_color = (229, 115, 115)    # 温和红 - 错误/消极状态
-
-    # 背景色：更柔和的对比
-    card_bg = (255, 255, 255, 240)   # 高透明度白色
-
-    # 特殊色：温和特色
-    gold_color = (240, 173, 78)      # 温和金色 - 金币
-    rare_color = (149, 117, 205)     # 柔和紫色 - 稀有物品
-
-    # 4. 获取文本尺寸的辅助函数
-    def get_text_size(text, font):
-        bbox = draw.textbbox((0, 0), text, font=font)
-        return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-    # 5. 绘制圆角矩形
-    def draw_rounded_rectangle(draw, bbox, radius, fill=None, outline=None, width=1):
-        x1, y1, x2, y2 = bbox
-        # 绘制主体矩形
-        draw.rectangle([x1 + radius, y1, x2 - radius, y2], fill=fill, outline=outline, width=width)
-        draw.rectangle([x1, y1 + radius, x2, y2 - radius], fill=fill, outline=outline, width=width)
-        # 绘制圆角
-        draw.ellipse([x1, y1, x1 + 2*radius, y1 + 2*radius], fill=fill, outline=outline, width=width)
-        draw.ellipse([x2 - 2*radius, y1, x2, y1 + 2*radius], fill=fill, outline=outline, width=width)
-        draw.ellipse([x1, y2 - 2*radius, x1 + 2*radius, y2], fill=fill, outline=outline, width=width)
-        draw.ellipse([x2 - 2*radius, y2 - 2*radius, x2, y2], fill=fill, outline=outline, width=width)
-
-    # 绘制标题
-    title_text = "用户状态面板"
-    title_w, title_h = get_text_size(title_text, title_font)
-    title_x = (width - title_w) // 2
-    title_y = 20
-    draw.text((title_x, title_y), title_text, font=title_font, fill=primary_dark)
-
-    # 用户基本信息卡片
-    current_y = title_y + title_h + 15
-    card_height = 85
-    card_margin = 15
-
-    # 用户信息卡片
-    draw_rounded_rectangle(draw,
-                         (card_margin, current_y, width - card_margin, current_y + card_height),
-                         10, fill=card_bg)
+    title_font, subtitle_font, content_font, small_font, tiny_font = _fonts()
+    get_text_size = assets.text_size
+    user_card_y, equipment_y, status_y, footer_y = _section_tops()
+    card_margin = CARD_MARGIN
 
     # 列位置
     col1_x_without_avatar = card_margin + 20  # 第一列
-    avatar_size = 60
+    avatar_size = AVATAR_SIZE
     col1_x_with_avatar = col1_x_without_avatar + avatar_size + 20  # 有头像时偏移
     col1_x = col1_x_without_avatar # 默认无头像
     col2_x = col1_x + 240 # 第二列位置
 
     # 行位置
-    row1_y = current_y + 12
-    row2_y = current_y + 52
+    row1_y = user_card_y + 12
+    row2_y = user_card_y + 52
 
     # 绘制用户头像 - 如有
-    if user_id := user_data.get('user_id'):
-        if avatar_image := get_user_avatar(user_id, avatar_size):
-            image.paste(avatar_image, (col1_x, row1_y), avatar_image)
-            col1_x = col1_x_with_avatar # 更新 col1_x 以适应头像位置
+    if avatar_data := user_data.get('avatar'):
+        avatar_image = Image.open(BytesIO(avatar_data))
+        image.paste(avatar_image, (col1_x, row1_y), avatar_image)
+        col1_x = col1_x_with_avatar # 更新 col1_x 以适应头像位置
 
 
     # 用户昵称
     nickname = user_data.get('nickname', '未知用户')
     nickname_text = f"{nickname}"
-    draw.text((col1_x, row1_y), nickname_text, font=subtitle_font, fill=primary_medium)
+    draw.text((col1_x, row1_y), nickname_text, font=subtitle_font, fill=PRIMARY_MEDIUM)
 
 
 
@@ -156,164 +212,129 @@ def draw_state_image(user_data: Dict[str, Any]) -> Image.Image:
         else:
             title_text = f"{current_title}"
 
-        draw.text((col1_x + nickname_width + 10, row1_y + height_offset), title_text, font=small_font, fill=rare_color)
+        draw.text((col1_x + nickname_width + 10, row1_y + height_offset), title_text, font=small_font, fill=RARE_COLOR)
     # else:
     #     title_text = "未装备
     #     draw.text((col1_x + nickname_width + 10, row1_y + height_offset), title_text, font=small_font, fill=text_color)
 
+    # 综合排行名次，右对齐在用户卡片第一行
+    rank = user_data.get('rank') or {}
+    rank_parts = []
+    if rank.get('group'):
+        rank_parts.append(f"本群 #{rank['group']:,}")
+    if rank.get('global'):
+        rank_parts.append(f"全服 #{rank['global']:,}")
+    if rank_parts:
+        rank_text = " · ".join(rank_parts)
+        rank_w = get_text_size(rank_text, small_font)[0]
+        draw.text((width - card_margin - 15 - rank_w, row1_y + height_offset), rank_text,
+                  font=small_font, fill=PRIMARY_LIGHT)
+
     # 金币
     coins = user_data.get('coins', 0)
     coins_text = f"金币: {coins:,}"
-    draw.text((col1_x, row2_y), coins_text, font=small_font, fill=gold_color)
+    draw.text((col1_x, row2_y), coins_text, font=small_font, fill=GOLD_COLOR)
 
     # 钓鱼次数 - 调整列位置以均分
     total_fishing = user_data.get('total_fishing_count', 0)
     fishing_text = f"钓鱼次数: {total_fishing:,}"
-    draw.text((col2_x, row2_y), fishing_text, font=small_font, fill=text_primary)
+    draw.text((col2_x, row2_y), fishing_text, font=small_font, fill=TEXT_PRIMARY)
 
     # 偷鱼总价值 - 调整列位置以均分 TODO
     # steal_total = user_data.get('steal_total_value', 0)
     # steal_text = f"偷鱼获金: {steal_total:,}"
     # col3_adjusted_x = card_margin + (width - card_margin * 2) * 2 // 3 + card_margin
-    # draw.text((col3_adjusted_x, row2_y), steal_text, font=small_font, fill=warning_color)
-
-    # 装备信息区域
-    current_y += card_height + 5
-    equipment_title = "当前装备"
-    draw.text((card_margin, current_y), equipment_title, font=subtitle_font, fill=primary_medium)
-    current_y += 30
+    # draw.text((col3_adjusted_x, row2_y), steal_text, font=small_font, fill=WARNING_COLOR)
 
     # 装备卡片 - 两列等宽布局
-    equipment_card_height = 130
     card_width = (width - card_margin * 2 - 15) // 2
 
     # 左列：鱼竿和饰品
     left_card_x = card_margin
-    draw_rounded_rectangle(draw,
-                         (left_card_x, current_y, left_card_x + card_width, current_y + equipment_card_height),
-                         8, fill=card_bg)
 
     # 定义左列的布局位置
     left_col_x = left_card_x + 12
-    equipment_row1_y = current_y + 10
-    equipment_row2_y = current_y + 30
-    equipment_row3_y = current_y + 50
-    equipment_row4_y = current_y + 70
-    equipment_row5_y = current_y + 90
-    equipment_row6_y = current_y + 110
-
-    # 鱼竿标题
-    draw.text((left_col_x, equipment_row1_y), "鱼竿", font=small_font, fill=primary_light)
+    equipment_row2_y = equipment_y + 30
+    equipment_row3_y = equipment_y + 50
+    equipment_row5_y = equipment_y + 90
+    equipment_row6_y = equipment_y + 110
 
     # 鱼竿内容
     current_rod = user_data.get('current_rod')
     if current_rod:
         rod_name = current_rod['name'][:15] + "..." if len(current_rod['name']) > 15 else current_rod['name']
-        draw.text((left_col_x, equipment_row2_y), rod_name, font=content_font, fill=text_primary)
+        draw.text((left_col_x, equipment_row2_y), rod_name, font=content_font, fill=TEXT_PRIMARY)
         # 根据稀有度选择颜色
         rarity = current_rod['rarity'] if 'rarity' in current_rod else 1
         refined_level = current_rod['refine_level'] if 'refine_level' in current_rod else 1
-        star_color = rare_color if (rarity > 4 and refined_level > 4) else warning_color if rarity > 3 else text_secondary
+        star_color = RARE_COLOR if (rarity > 4 and refined_level > 4) else WARNING_COLOR if rarity > 3 else TEXT_SECONDARY
         draw.text((left_col_x, equipment_row3_y), f"{'★' * min(rarity, 5)} Lv.{refined_level}", font=tiny_font, fill=star_color)
     else:
-        draw.text((left_col_x, equipment_row2_y), "未装备", font=content_font, fill=text_muted)
-
-    # 饰品标题
-    draw.text((left_col_x, equipment_row4_y), "饰品", font=small_font, fill=primary_light)
+        draw.text((left_col_x, equipment_row2_y), "未装备", font=content_font, fill=TEXT_MUTED)
 
     # 饰品内容
     current_accessory = user_data.get('current_accessory')
     if current_accessory:
         acc_name = current_accessory['name'][:15] + "..." if len(current_accessory['name']) > 15 else current_accessory['name']
-        draw.text((left_col_x, equipment_row5_y), acc_name, font=content_font, fill=text_primary)
+        draw.text((left_col_x, equipment_row5_y), acc_name, font=content_font, fill=TEXT_PRIMARY)
         rarity = current_accessory['rarity'] if 'rarity' in current_accessory else 1
-        star_color = rare_color if rarity > 4 else warning_color if rarity > 3 else text_secondary
+        star_color = RARE_COLOR if rarity > 4 else WARNING_COLOR if rarity > 3 else TEXT_SECONDARY
         draw.text((left_col_x, equipment_row6_y), f"{'★' * min(rarity, 5)}", font=tiny_font, fill=star_color)
     else:
-        draw.text((left_col_x, equipment_row5_y), "未装备", font=content_font, fill=text_muted)
+        draw.text((left_col_x, equipment_row5_y), "未装备", font=content_font, fill=TEXT_MUTED)
 
-    # 右列：鱼饵和区域
+    # 右列：鱼饵（钓鱼区域目前固定为普通池，已画在底图上）
     right_card_x = left_card_x + card_width + 15
-    draw_rounded_rectangle(draw,
-                         (right_card_x, current_y, right_card_x + card_width, current_y + equipment_card_height),
-                         8, fill=card_bg)
-
-    # 定义右列的布局位置
     right_col_x = right_card_x + 12
 
-    # 鱼饵标题
-    draw.text((right_col_x, equipment_row1_y), "鱼饵", font=small_font, fill=primary_light)
-
     # 鱼饵内容
     current_bait = user_data.get('current_bait')
     if current_bait:
         bait_name = current_bait['name'][:15] + "..." if len(current_bait['name']) > 15 else current_bait['name']
-        draw.text((right_col_x, equipment_row2_y), bait_name, font=content_font, fill=text_primary)
+        draw.text((right_col_x, equipment_row2_y), bait_name, font=content_font, fill=TEXT_PRIMARY)
         rarity = current_bait['rarity'] if 'rarity' in current_bait else 1
-        star_color = rare_color if rarity > 4 else warning_color if rarity >= 3 else text_secondary
+        star_color = RARE_COLOR if rarity > 4 else WARNING_COLOR if rarity >= 3 else TEXT_SECONDARY
         quantity = current_bait['quantity'] if 'quantity' in current_bait else 0
         bait_detail = f"{'★' * min(rarity, 5)} 剩余：{quantity}"
         draw.text((right_col_x, equipment_row3_y), bait_detail, font=tiny_font, fill=star_color)
     else:
-        draw.text((right_col_x, equipment_row2_y), "未使用", font=content_font, fill=text_muted)
-
-    # 钓鱼区域标题
-    draw.text((right_col_x, equipment_row4_y), "钓鱼区域", font=small_font, fill=primary_light)
-
-    # 钓鱼区域内容
-    zone_display = "普通池"
-    draw.text((right_col_x, equipment_row5_y), zone_display, font=content_font, fill=text_primary)
-    zone_detail = "基础钓鱼区域"
-    detail_color = text_muted
-    draw.text((right_col_x, equipment_row6_y), zone_detail, font=tiny_font, fill=detail_color)
-
-    # 状态信息区域 - 合并今日状态和钓鱼状态
-    current_y += equipment_card_height + 5
-    status_title = "状态信息"
-    draw.text((card_margin, current_y), status_title, font=subtitle_font, fill=primary_medium)
-    current_y += 30
-
-    # 状态卡片 - 扩展高度容纳更多信息
-    status_card_height = 120
-    draw_rounded_rectangle(draw,
-                         (card_margin, current_y, width - card_margin, current_y + status_card_height),
-                         8, fill=card_bg)
+        draw.text((right_col_x, equipment_row2_y), "未使用", font=content_font, fill=TEXT_MUTED)
 
     # 定义状态信息的网格位置 - 两列布局
     status_col1_x = card_margin + 15    # 左列
     status_col2_x = card_margin + 315   # 右列
-    status_row1_y = current_y + 12      # 第一行
-    status_row2_y = current_y + 35      # 第二行
-    status_row3_y = current_y + 81      # 鱼塘信息
+    status_row1_y = status_y + 12      # 第一行
+    status_row2_y = status_y + 35      # 第二行
+    status_row3_y = status_y + 81      # 鱼塘信息
 
     # 左列第一行：签到状态
     signed_today = user_data.get('signed_in_today', False)
     if signed_today:
         sign_text = "今日签到: 已签到"
-        sign_color = success_color
+        sign_color = SUCCESS_COLOR
     else:
         sign_text = "今日签到: 未签到"
-        sign_color = error_color
+        sign_color = ERROR_COLOR
     draw.text((status_col1_x, status_row1_y), sign_text, font=content_font, fill=sign_color)
 
     # 右列第一行：擦弹次数
     wipe_remaining = user_data.get('wipe_bomb_remaining', 0)
     if wipe_remaining > 0:
         wipe_text = f"擦弹次数: 剩余 {wipe_remaining} 次"
-        wipe_color = error_color
+        wipe_color = ERROR_COLOR
     else:
         wipe_text = "擦弹次数: 已用完"
-        wipe_color = text_muted
+        wipe_color = TEXT_MUTED
     draw.text((status_col2_x, status_row1_y), wipe_text, font=content_font, fill=wipe_color)
 
     # 左列第二行：自动钓鱼状态
     auto_fishing = user_data.get('auto_fishing_enabled', False)
     if auto_fishing:
         auto_text = "自动钓鱼: 已开启"
-        auto_color = success_color
+        auto_color = SUCCESS_COLOR
     else:
         auto_text = "自动钓鱼: 已关闭"
-        auto_color = error_color
+        auto_color = ERROR_COLOR
     draw.text((status_col1_x, status_row2_y), auto_text, font=content_font, fill=auto_color)
 
     # 右列第二行：偷鱼CD信息
@@ -325,10 +346,10 @@ def draw_state_image(user_data: Dict[str, Any]) -> Image.Image:
             cd_text = f"偷鱼冷却: {hours}小时{minutes}分钟"
         else:
             cd_text = f"偷鱼冷却: {minutes}分钟"
-        cd_color = text_muted
+        cd_color = TEXT_MUTED
     else:
         cd_text = "准备好偷鱼了！"
-        cd_color = error_color
+        cd_color = ERROR_COLOR
     draw.text((status_col2_x, status_row2_y), cd_text, font=content_font, fill=cd_color)
 
     # 第三行：鱼塘信息
@@ -339,33 +360,23 @@ def draw_state_image(user_data: Dict[str, Any]) -> Image.Image:
         if total_count > 0:
             # 左列：鱼塘鱼数
             pond_count_text = f"鱼塘数量: {total_count} 条， 价值: {total_value:,} 金币"
-            draw.text((status_col1_x, status_row3_y), pond_count_text, font=content_font, fill=text_primary)
+            draw.text((status_col1_x, status_row3_y), pond_count_text, font=content_font, fill=TEXT_PRIMARY)
         else:
             # 鱼塘为空时显示
             pond_empty_text = "鱼塘里什么都没有..."
-            draw.text((status_col1_x, status_row3_y), pond_empty_text, font=content_font, fill=text_muted)
+            draw.text((status_col1_x, status_row3_y), pond_empty_text, font=content_font, fill=TEXT_MUTED)
     else:
         # 鱼塘为空时显示
         pond_empty_text = "鱼塘里什么都没有..."
-        draw.text((status_col1_x, status_row3_y), pond_empty_text, font=content_font, fill=text_muted)
+        draw.text((status_col1_x, status_row3_y), pond_empty_text, font=content_font, fill=TEXT_MUTED)
 
 
     # 10. 底部信息 - 调整位置
-    current_y += status_card_height + 15
-    footer_text = f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    generated_at = user_data.get('generated_at') or datetime.now().strftime('%Y-%m-%d %H:%M')
+    footer_text = f"生成时间: {generated_at}"
     footer_w, footer_h = get_text_size(footer_text, small_font)
     footer_x = (width - footer_w) // 2
-    draw.text((footer_x, current_y), footer_text, font=small_font, fill=text_secondary)
-
-    # 12. 添加装饰性元素 - 保持简洁
-    corner_size = 15  # 稍微减小装饰元素
-    corner_color = (255, 255, 255, 80)
-
-    # 四角装饰
-    draw.ellipse([8, 8, 8 + corner_size, 8 + corner_size], fill=corner_color)
-    draw.ellipse([width - 8 - corner_size, 8, width - 8, 8 + corner_size], fill=corner_color)
-    draw.ellipse([8, height - 8 - corner_size, 8 + corner_size, height - 8], fill=corner_color)
-    draw.ellipse([width - 8 - corner_size, height - 8 - corner_size, width - 8, height - 8], fill=corner_color)
+    draw.text((footer_x, footer_y), footer_text, font=small_font, fill=TEXT_SECONDARY)
 
     return image
 
@@ -542,51 +553,6 @@ def get_user_state_data(user_repo, inventory_repo, item_template_repo, log_repo,
         'pond_info': pond_info
     }
 
-def get_user_avatar(user_id: str, avatar_size: int = 50) -> Optional[Image.Image]:
-    """
-    获取用户头像并处理为圆形
-
-    Args:
-        user_id: 用户ID
-        avatar_size: 头像尺寸
-
-    Returns:
-        处理后的头像图像，如果失败返回None
-    """
-    try:
-        # 创建头像缓存目录
-        cache_dir = os.path.join("data/plugin_data/astrbot_plugin_gaismanor", "avatar_cache")
-        os.makedirs(cache_dir, exist_ok=True)
-
-        avatar_cache_path = os.path.join(cache_dir, f"{user_id}_avatar.png")
-
-        # 检查是否有缓存的头像（24小时刷新）
-        avatar_image = None
-        if os.path.exists(avatar_cache_path):
-            try:
-                file_age = time.time() - os.path.getmtime(avatar_cache_path)
-                if file_age < 86400:  # 24小时
-                    avatar_image = Image.open(avatar_cache_path).convert('RGBA')
-            except:
-                pass
-
-        # 如果没有缓存或缓存过期，重新下载
-        if avatar_image is None:
-            avatar_url = f"https://q4.qlogo.cn/headimg_dl?dst_uin={user_id}&spec=640"
-            response = requests.get(avatar_url, timeout=2) # 2s超时
-            if response.status_code == 200:
-                avatar_image = Image.open(BytesIO(response.content)).convert('RGBA')
-                # 保存到缓存
-                avatar_image.save(avatar_cache_path, 'PNG')
-
-        if avatar_image:
-            return avatar_postprocess(avatar_image, avatar_size)
-
-    except Exception as e:
-        pass
-
-    return None
-
 def avatar_postprocess(avatar_image: Image.Image, size: int) -> Image.Image:
     """
     将头像处理为指定大小的圆角头像，抗锯齿效果
@@ -597,24 +563,8 @@ def avatar_postprocess(avatar_image: Image.Image, size: int) -> Image.Image:
     # 使用更合适的圆角半径
     corner_radius = size // 8  # 稍微减小圆角，看起来更自然
 
-    # 抗锯齿处理
-    scale_factor = 4
-    large_size = size * scale_factor
-    large_radius = corner_radius * scale_factor
-
-    # 创建高质量遮罩
-    large_mask = Image.new('L', (large_size, large_size), 0)
-    large_draw = ImageDraw.Draw(large_mask)
-
-    # 绘制圆角矩形
-    large_draw.rounded_rectangle(
-        [0, 0, large_size, large_size],
-        radius=large_radius,
-        fill=255
-    )
-
-    # 高质量缩放
-    mask = large_mask.resize((size, size), Image.Resampling.LANCZOS)
+    # 抗锯齿遮罩（4 倍超采样），按尺寸缓存
+    mask = imaging.rounded_mask((size, size), corner_radius, supersample=4)
     avatar_image.putalpha(mask)
 
     return avatar_image
\ No newline at end of file
@@ -13,12 +13,68 @@ class Constants:
     SIGN_IN_BASE_EXP = 10  # 签到基础经验奖励
     SIGN_IN_STREAK_GOLD_INCREMENT = 20  # 连续签到金币奖励增量
     SIGN_IN_STREAK_EXP_INCREMENT = 2  # 连续签到经验奖励增量
+    SIGN_IN_AUDIT_LOG = True  # 是否把签到写入 sign_in_logs 审计日志
+    SIGN_IN_LOG_FLUSH_INTERVAL = 5  # 签到记录批量写入的间隔（秒）
 
     # 装备相关常量
     STARTER_ROD_TEMPLATE_ID = 1  # 新手鱼竿模板ID
     STARTING_GOLD = 200  # 初始金币数量
 
     FISHING_COOLDOWN = 20  # 钓鱼冷却时间（秒）
+    RARE_FISH_RARITY = 4  # 计入稀有鱼排行榜的最低星级
+
+    # 排行榜相关常量
+    LEADERBOARD_SIZE = 10  # 排行榜显示的人数
+    RANK_RECONCILE_INTERVAL = 600  # 内存排行与数据库全量对账的间隔（秒）
+    RANK_SYNC_BATCH_SIZE = 500  # 查询前刷新待刷新用户时，每条 SQL 读取的用户数
+    GROUP_TOUCH_INTERVAL = 3600  # 同一用户在同一个群里活跃时，更新 user_groups 的最短间隔（秒）
+    GROUP_TOUCH_CACHE_SIZE = 100000  # 防抖记录的最大条目数，超出时清空
+
+    # 市场相关常量
+    MARKET_LISTING_DURATION = 86400 * 7  # 上架有效期（秒）
+    MARKET_ESCROW_USER_ID = "__market__"  # 上架期间物品的托管归属
+    MARKET_SWEEP_INTERVAL = 300  # 过期清理间隔（秒）
+    MARKET_SWEEP_BATCH_SIZE = 200  # 每批清理的上架数量
+    MARKET_SWEEP_MAX_BATCHES = 10  # 每轮最多清理的批次数
+    MARKET_PRICE_HISTORY_DAYS = 7  # 市场行情默认展示天数
+    MARKET_PAGE_SIZE = 10  # 市场浏览每页商品数
+    MARKET_PAGE_CACHE_SIZE = 256  # 市场浏览页缓存的最大条目数
+
+    # 抽卡相关常量
+    GACHA_SINGLE_COST = 100  # 单次抽卡消耗金币
+    GACHA_TEN_COST = 900  # 十连抽卡消耗金币
+    GACHA_MAX_PULLS = 100  # 单次连抽的最大次数（管理员）
+    GACHA_PLAYER_MAX_PULLS = 10  # 普通玩家单次连抽的最大次数
+    GACHA_LOG_PAGE_SIZE = 20  # 抽卡记录每页条数
+
+    # 命令线程池相关常量
+    DB_EXECUTOR_WORKERS = 8  # 数据库命令线程数
+    DB_EXECUTOR_QUEUE = 64  # 数据库命令最多排队数
+    DB_COMMAND_TIMEOUT = 10  # 数据库命令超时时间（秒）
+    RENDER_EXECUTOR_WORKERS = 2  # 图片渲染线程数
+    RENDER_EXECUTOR_QUEUE = 8  # 图片渲染最多排队数
+    RENDER_COMMAND_TIMEOUT = 30  # 图片渲染命令超时时间（秒）
+    RENDER_PROCESS_WORKERS = 2  # 图片渲染进程数，0 表示在线程中渲染
+    RENDER_ENCODING_PROFILE = "png_palette"  # 默认图片编码方案（见 render_service.ENCODING_PROFILES），可在插件配置中修改
+    RENDER_VERSION = 1  # 绘图代码版本，修改绘图代码后递增，使旧的渲染缓存失效
+    RENDER_CACHE_ENTRIES = 256  # 渲染缓存的最大条目数
+    RENDER_CACHE_MAX_BYTES = 32 * 1024 * 1024  # 渲染缓存占用的最大内存（字节）
+    RENDER_CACHE_SPILL_DIR = "data/plugin_data/astrbot_plugin_gaismanor/render_cache"  # 渲染缓存转存目录
+    RENDER_CACHE_SPILL_MAX_BYTES = 256 * 1024 * 1024  # 渲染缓存转存到磁盘的最大字节数，0 表示不转存
+
+    # 头像相关常量
+    AVATAR_URL = "https://q4.qlogo.cn/headimg_dl?dst_uin={user_id}&spec=640"  # 头像下载地址
+    AVATAR_SIZE = 60  # 状态图片中的头像尺寸
+    AVATAR_CACHE_DIR = "data/plugin_data/astrbot_plugin_gaismanor/avatar_cache"  # 头像原图缓存目录
+    AVATAR_DISK_TTL = 86400  # 磁盘上的头像原图有效期（秒），过期后重新下载，下载失败时仍使用旧图
+    AVATAR_MEMORY_ENTRIES = 512  # 内存中缓存的处理后头像数量
+    AVATAR_NEGATIVE_TTL = 600  # 头像获取失败后多久内不再重试（秒）
+    AVATAR_FETCH_CONCURRENCY = 4  # 同时下载头像的最大数量
+    AVATAR_FETCH_TIMEOUT = 5  # 单次头像下载超时时间（秒）
+    AVATAR_RENDER_BUDGET = 0.3  # 绘图前等待头像的最长时间（秒），超时不带头像绘制，头像在后台继续下载
+
+    # 启动相关常量
+    STARTUP_TIME_TARGET_MS = 300  # 插件加载耗时目标（毫秒），超过时输出启动耗时报告
 
     POND_BASE_CAPACITY = 50 # 鱼塘初始容量
     POND_UPGRADE_CONFIG = [
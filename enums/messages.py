@@ -10,6 +10,8 @@ class Messages(Enum):
     BALANCE_INFO = "当前金币余额"
     GOLD_UPDATE_FAILED = "金币更新失败，请稍后再试"
     SQL_FAILED = "数据库操作失败，请稍后再试"
+    COMMAND_BUSY = "当前请求太多，请稍后再试"
+    COMMAND_TIMEOUT = "处理超时，请稍后再试"
 
     # 签到
     ALREADY_SIGNED_IN = "您今天已经签到过了！"
@@ -133,6 +135,9 @@ class Messages(Enum):
     MARKET_LIST_BAIT_FAILED = "上架鱼饵失败"
     MARKET_BUY_SUCCESS = "购买成功！"
     MARKET_BUY_FAILED = "购买失败，请检查金币是否足够或商品是否存在"
+    MARKET_PRICE_NO_NAME = "请指定要查询的物品名称，例如：/市场行情 鲫鱼"
+    MARKET_PRICE_ITEM_NOT_FOUND = "未找到该物品，请检查名称是否正确"
+    MARKET_PRICE_NO_DATA = "近期市场上暂无该物品的成交记录"
 
     # 出售消息
     SELL_NO_FISH = "您的鱼塘是空的，没有鱼可以卖出！"
@@ -175,6 +180,10 @@ class Messages(Enum):
     GACHA_TEN_NOT_ENOUGH_GOLD = "金币不足！十连抽卡需要900金币。"
     GACHA_NO_RECORDS = "您还没有抽卡记录。"
     GACHA_TEN_SUCCESS = "🎊 十连抽卡结果"
+    GACHA_MULTI_INVALID_COUNT = "连抽次数需要在 1-{max_pulls} 之间"
+    GACHA_MULTI_ADMIN_ONLY = "超过{max_pulls}次的连抽仅限管理员使用"
+    GACHA_MULTI_NOT_ENOUGH_GOLD = "金币不足！{count}连抽卡需要{cost}金币。"
+    GACHA_MULTI_SUCCESS = "🎊 {count}连抽卡结果"
 
     # 成就消息
     ACHIEVEMENT_NO_DATA = "暂无成就数据！"
@@ -198,6 +207,11 @@ class Messages(Enum):
     LEADERBOARD_NO_DATA = "暂无排行榜数据！"
     LEADERBOARD_GENERATION_FAILED = "生成排行榜图片失败！"
     LEADERBOARD_IMAGE_ERROR = "生成排行榜图片时出错"
+    LEADERBOARD_UNKNOWN_BOARD = "未知的排行榜类型：{board_name}，可选：{boards}"
+    RANK_SELF = "你的排名：第 {rank} 名 / 共 {total} 人（{score}）"
+    RANK_ABOVE = "上一名：{nickname}，还差 {gap}"
+    RANK_BELOW = "下一名：{nickname}，领先 {gap}"
+    RANK_FIRST = "你已经是第一名了！"
 
     # 状态消息
     STATE_NOT_REGISTERED = "您还未注册，请先使用 /注册 命令注册账号"
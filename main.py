@@ -1,19 +1,17 @@
+from .utils.startup_profiler import startup_profiler
+
+# 从这里开始记录导入耗时，插件初始化结束时停止
+startup_profiler.start()
+
 from astrbot.api.event import filter, AstrMessageEvent
 from astrbot.api.star import Context, Star, register
 from astrbot.api import logger, AstrBotConfig
-from .draw.help import draw_help_image
+from .enums.constants import Constants
 from .models.database import DatabaseManager
-from .services.user_service import UserService
-from .services.inventory_service import InventoryService
-from .services.shop_service import ShopService
-from .services.market_service import MarketService
-from .services.sell_service import SellService
-from .services.gacha_service import GachaService
-from .services.other_service import OtherService
-from .services.fishing_service import FishingService
-from .services.equipment_service import EquipmentService
-from .services.achievement_service import AchievementService
-from .services.technology_service import TechnologyService
+from .services.container import ServiceContainer
+from .utils.executor import ExecutorBusyError, db_executor, render_executor
+from .enums.messages import Messages
+import asyncio
 import threading
 import time
 import os
@@ -24,39 +22,52 @@ class GaismanorPlugin(Star):
         super().__init__(context)
         self.context = context
         # 初始化数据库和服务
-        self.db_manager = DatabaseManager()
-        self.user_service = UserService(self.db_manager)
-        self.inventory_service = InventoryService(self.db_manager)
-        self.shop_service = ShopService(self.db_manager)
-        self.market_service = MarketService(self.db_manager)
-        self.sell_service = SellService(self.db_manager)
-        self.gacha_service = GachaService(self.db_manager)
-        self.other_service = OtherService(self.db_manager)
-        self.fishing_service = FishingService(self.db_manager)
-        self.equipment_service = EquipmentService(self.db_manager)
-        self.achievement_service = AchievementService(self.db_manager)
-        self.technology_service = TechnologyService(self.db_manager)
+        with startup_profiler.phase("database"):
+            self.db_manager = DatabaseManager()
+        with startup_profiler.phase("services"):
+            # 服务在首次使用时构造，每个服务只有一个实例
+            self.services = ServiceContainer(self.db_manager)
+            # 自动钓鱼、过期上架清理和内存排行加载依赖服务内的后台线程，启动时即构造
+            self.services.other_service
+            self.services.market_service
+            self.services.rank_service
+            # 图片编码方案（按图片类型、平台配置）
+            self.services.render_service.configure_profiles(config)
+            # 帮助图片内容固定，在后台预先渲染好
+            self.services.render_service.prerender_static()
 
         # 获取配置
         self.secret_key = config.get("secret_key", "SecretKey")
         self.port = config.get("port", 6200)
 
-        # 启动WebUI
-        self.start_webui()
+        # 启动WebUI（Flask 在后台线程中导入，不阻塞插件加载）
+        with startup_profiler.phase("webui"):
+            self.start_webui()
 
-        logger.info("庄园插件初始化完成")
+        total = startup_profiler.finish()
+        logger.info(f"庄园插件初始化完成，耗时 {total * 1000:.0f}ms")
+        if total * 1000 > Constants.STARTUP_TIME_TARGET_MS:
+            logger.warning(f"庄园插件加载耗时超过目标 {Constants.STARTUP_TIME_TARGET_MS}ms\n"
+                           f"{startup_profiler.report()}")
 
     def start_webui(self):
         """启动WebUI"""
+        webui_thread = threading.Thread(target=self._run_webui, daemon=True)
+        webui_thread.start()
+
+    def _run_webui(self):
+        """在后台线程中导入并运行WebUI，未安装 Flask 时跳过"""
         try:
             from .webui import start_webui, init_webui
-            # 初始化WebUI
-            init_webui(self.db_manager, self.secret_key)
+        except ImportError as e:
+            logger.warning(f"未安装WebUI依赖，跳过WebUI: {e}")
+            return
 
-            # 在单独的线程中启动Web服务器
-            webui_thread = threading.Thread(target=start_webui, args=(self.port,), daemon=True)
-            webui_thread.start()
+        try:
+            # 初始化WebUI
+            init_webui(self.db_manager, self.secret_key, self.services)
             logger.info(f"庄园插件WebUI已启动，访问地址: http://localhost:{self.port}")
+            start_webui(self.port)
         except Exception as e:
             logger.error(f"启动WebUI失败: {e}")
 
@@ -66,219 +77,265 @@ class GaismanorPlugin(Star):
 
     async def terminate(self):
         """插件销毁方法"""
+        db_executor.shutdown()
+        render_executor.shutdown()
+        if "user_service" in self.services.created_services():
+            # 写入还在缓冲中的签到记录
+            self.services.user_service.flush_sign_in_logs()
+        self.services.render_service.shutdown()
+        self.services.avatar_service.shutdown()
         logger.info("庄园插件已卸载")
 
+    # 记录玩家所在的群，按群排行从 user_groups 取群成员
+    @filter.event_message_type(filter.EventMessageType.GROUP_MESSAGE)
+    async def group_activity_listener(self, event: AstrMessageEvent):
+        """群消息监听：记录发送者在该群活跃（防抖，不是每条消息都写库），不产生回复"""
+        user_service = self.services.user_service
+        user_id, group_id = event.get_sender_id(), event.get_group_id()
+        if not user_service.group_touch_due(user_id, group_id):
+            return
+        try:
+            await db_executor.run(user_service.touch_group, user_id, group_id)
+        except (ExecutorBusyError, asyncio.TimeoutError):
+            # 下一个防抖周期会再次写入
+            pass
+
     # 🌟 全局基础命令
     @filter.command("注册")
     async def register_command(self, event: AstrMessageEvent):
-        async for result in self.user_service.register_command(event):
+        async for result in db_executor.run_command(self.services.user_service.register_command, event):
             yield result
 
     @filter.command("签到")
     async def sign_in_command(self, event: AstrMessageEvent):
-        async for result in self.user_service.sign_in_command(event):
+        async for result in db_executor.run_command(self.services.user_service.sign_in_command, event):
             yield result
 
     @filter.command("金币")
     async def gold_command(self, event: AstrMessageEvent):
-        async for result in self.user_service.gold_command(event):
+        async for result in db_executor.run_command(self.services.user_service.gold_command, event):
             yield result
 
     @filter.command("等级")
     async def level_command(self, event: AstrMessageEvent):
-        async for result in self.user_service.level_command(event):
+        async for result in db_executor.run_command(self.services.user_service.level_command, event):
             yield result
 
     # 钓鱼相关
     @filter.command("钓鱼")
     async def fish_command(self, event: AstrMessageEvent):
-        async for result in self.fishing_service.fish_command(event):
+        async for result in db_executor.run_command(self.services.fishing_service.fish_command, event):
             yield result
 
     @filter.command("自动钓鱼")
     async def auto_fishing_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.auto_fishing_command(event):
+        async for result in db_executor.run_command(self.services.other_service.auto_fishing_command, event):
             yield result
 
     @filter.command("钓鱼记录")
     async def fishing_log_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.fishing_log_command(event):
+        async for result in db_executor.run_command(self.services.other_service.fishing_log_command, event):
             yield result
 
 
     # 鱼塘相关
     @filter.command("鱼塘")
     async def fish_pond_command(self, event: AstrMessageEvent):
-        async for result in self.inventory_service.fish_pond_command(event):
+        async for result in db_executor.run_command(self.services.inventory_service.fish_pond_command, event):
             yield result
 
     @filter.command("升级鱼塘")
     async def upgrade_fish_pond_command(self, event: AstrMessageEvent):
-        async for result in self.inventory_service.upgrade_fish_pond_command(event):
+        async for result in db_executor.run_command(self.services.inventory_service.upgrade_fish_pond_command, event):
             yield result
 
     # 背包相关
     @filter.command("鱼饵")
     async def bait_command(self, event: AstrMessageEvent):
-        async for result in self.inventory_service.bait_command(event):
+        async for result in db_executor.run_command(self.services.inventory_service.bait_command, event):
             yield result
 
     @filter.command("鱼竿")
     async def rod_command(self, event: AstrMessageEvent):
-        async for result in self.equipment_service.rod_command(event):
+        async for result in db_executor.run_command(self.services.equipment_service.rod_command, event):
             yield result
 
     @filter.command("维修鱼竿")
     async def repair_rod_command(self, event: AstrMessageEvent, rod_id: int = None):
         """维修鱼竿命令"""
-        async for result in self.equipment_service.repair_rod_command(event, rod_id):
+        async for result in db_executor.run_command(self.services.equipment_service.repair_rod_command, event, rod_id):
             yield result
 
     # 🛒 商店与购买
     @filter.command("商店")
     async def shop_command(self, event: AstrMessageEvent):
-        async for result in self.shop_service.shop_command(event):
+        async for result in db_executor.run_command(self.services.shop_service.shop_command, event):
             yield result
 
     @filter.command("商店鱼竿")
     async def shop_rods_command(self, event: AstrMessageEvent):
-        async for result in self.shop_service.shop_rods_command(event):
+        async for result in db_executor.run_command(self.services.shop_service.shop_rods_command, event):
             yield result
 
     @filter.command("商店鱼饵")
     async def shop_bait_command(self, event: AstrMessageEvent):
-        async for result in self.shop_service.shop_bait_command(event):
+        async for result in db_executor.run_command(self.services.shop_service.shop_bait_command, event):
             yield result
 
     @filter.command("商店饰品")
     async def shop_accessory_command(self, event: AstrMessageEvent):
-        async for result in self.shop_service.shop_accessory_command(event):
+        async for result in db_executor.run_command(self.services.shop_service.shop_accessory_command, event):
             yield result
 
     @filter.command("购买鱼饵")
     async def buy_bait_command(self, event: AstrMessageEvent, bait_id: int, quantity: int = 1):
-        async for result in self.shop_service.buy_bait_command(event, bait_id, quantity):
+        async for result in db_executor.run_command(self.services.shop_service.buy_bait_command, event, bait_id, quantity):
             yield result
 
     @filter.command("购买鱼竿")
     async def buy_rod_command(self, event: AstrMessageEvent, rod_id: int):
-        async for result in self.shop_service.buy_rod_command(event, rod_id):
+        async for result in db_executor.run_command(self.services.shop_service.buy_rod_command, event, rod_id):
             yield result
 
     @filter.command("使用鱼饵")
     async def use_bait_command(self, event: AstrMessageEvent, bait_id: int):
-        async for result in self.shop_service.use_bait_command(event, bait_id):
+        async for result in db_executor.run_command(self.services.shop_service.use_bait_command, event, bait_id):
             yield result
 
     @filter.command("使用鱼竿")
     async def use_rod_command(self, event: AstrMessageEvent, rod_id: int):
-        async for result in self.equipment_service.use_rod_command(event, rod_id):
+        async for result in db_executor.run_command(self.services.equipment_service.use_rod_command, event, rod_id):
             yield result
 
     @filter.command("卸下鱼竿")
     async def unequip_rod_command(self, event: AstrMessageEvent):
-        async for result in self.equipment_service.unequip_rod_command(event):
+        async for result in db_executor.run_command(self.services.equipment_service.unequip_rod_command, event):
             yield result
 
     # 💰 出售鱼类
     @filter.command("出售所有鱼")
     async def sell_all_command(self, event: AstrMessageEvent):
-        async for result in self.sell_service.sell_all_command(event):
+        async for result in db_executor.run_command(self.services.sell_service.sell_all_command, event):
             yield result
 
 
     @filter.command("出售稀有度")
     async def sell_by_rarity_command(self, event: AstrMessageEvent, rarity: int):
-        async for result in self.sell_service.sell_by_rarity_command(event, rarity):
+        async for result in db_executor.run_command(self.services.sell_service.sell_by_rarity_command, event, rarity):
             yield result
 
     @filter.command("出售鱼竿")
     async def sell_rod_command(self, event: AstrMessageEvent, rod_id: int):
-        async for result in self.sell_service.sell_rod_command(event, rod_id):
+        async for result in db_executor.run_command(self.services.sell_service.sell_rod_command, event, rod_id):
             yield result
 
     @filter.command("出售所有鱼竿")
     async def sell_all_rods_command(self, event: AstrMessageEvent):
-        async for result in self.sell_service.sell_all_rods_command(event):
+        async for result in db_executor.run_command(self.services.sell_service.sell_all_rods_command, event):
             yield result
 
     @filter.command("出售鱼饵")
     async def sell_bait_command(self, event: AstrMessageEvent, bait_id: int):
-        async for result in self.sell_service.sell_bait_command(event, bait_id):
+        async for result in db_executor.run_command(self.services.sell_service.sell_bait_command, event, bait_id):
+            yield result
+
+    # 🏪 市场
+    @filter.command("市场")
+    async def market_command(self, event: AstrMessageEvent, category: str = "", page: int = 1,
+                             sort: str = "价格", rarity: int = 0):
+        async for result in db_executor.run_command(self.services.market_service.market_command, event, category, page, sort, rarity):
+            yield result
+
+    @filter.command("市场行情")
+    async def market_price_command(self, event: AstrMessageEvent, item_name: str):
+        async for result in db_executor.run_command(self.services.market_service.market_price_command, event, item_name):
             yield result
 
     # ✨ 抽卡系统
     @filter.command("抽卡")
     async def gacha_command(self, event: AstrMessageEvent, pool_id: int):
-        async for result in self.gacha_service.gacha_command(event, pool_id):
+        async for result in db_executor.run_command(self.services.gacha_service.gacha_command, event, pool_id):
             yield result
 
     @filter.command("十连")
     async def ten_gacha_command(self, event: AstrMessageEvent, pool_id: int):
-        async for result in self.gacha_service.ten_gacha_command(event, pool_id):
+        async for result in db_executor.run_command(self.services.gacha_service.ten_gacha_command, event, pool_id):
+            yield result
+
+    @filter.command("连抽")
+    async def multi_gacha_command(self, event: AstrMessageEvent, pool_id: int, count: int):
+        async for result in db_executor.run_command(self.services.gacha_service.multi_gacha_command, event, pool_id, count):
             yield result
 
     @filter.command("查看卡池")
     async def view_gacha_pool_command(self, event: AstrMessageEvent, pool_id: int):
-        async for result in self.gacha_service.view_gacha_pool_command(event, pool_id):
+        async for result in db_executor.run_command(self.services.gacha_service.view_gacha_pool_command, event, pool_id):
             yield result
 
     @filter.command("抽卡记录")
-    async def gacha_log_command(self, event: AstrMessageEvent):
-        async for result in self.gacha_service.gacha_log_command(event):
+    async def gacha_log_command(self, event: AstrMessageEvent, before_id: int = 0):
+        async for result in db_executor.run_command(self.services.gacha_service.gacha_log_command, event, before_id):
             yield result
 
     # ⚙️ 其他功能
     @filter.command("排行榜")
-    async def leaderboard_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.leaderboard_command(event):
+    async def leaderboard_command(self, event: AstrMessageEvent, board_name: str = ""):
+        async for result in render_executor.run_command(self.services.other_service.leaderboard_command, event, board_name):
             yield result
 
     @filter.command("鱼类图鉴")
     async def fish_gallery_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.fish_gallery_command(event):
+        async for result in db_executor.run_command(self.services.other_service.fish_gallery_command, event):
             yield result
 
     @filter.command("查看成就")
     async def view_achievements_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.view_achievements_command(event):
+        async for result in db_executor.run_command(self.services.other_service.view_achievements_command, event):
             yield result
 
     @filter.command("查看称号")
     async def view_titles_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.view_titles_command(event):
+        async for result in db_executor.run_command(self.services.other_service.view_titles_command, event):
             yield result
 
     @filter.command("状态")
     async def state_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.state_command(event):
+        async for result in render_executor.run_command(self.services.other_service.state_command, event):
             yield result
 
     # 帮助命令
     @filter.command("钓鱼帮助")
     async def help_command(self, event: AstrMessageEvent):
-        image = draw_help_image()
-        yield event.image_result(image)
+        render_service = self.services.render_service
+        try:
+            image_data = await render_executor.run(render_service.render, render_service.request('help', event=event))
+        except ExecutorBusyError:
+            yield event.plain_result(Messages.COMMAND_BUSY.value)
+            return
+        except asyncio.TimeoutError:
+            yield event.plain_result(Messages.COMMAND_TIMEOUT.value)
+            return
+        yield render_service.image_result(event, image_data)
 
     # 擦弹命令
     @filter.command("擦弹")
     async def wipe_bomb_command(self, event: AstrMessageEvent, amount: str):
-        async for result in self.other_service.wipe_bomb_command(event, amount):
+        async for result in db_executor.run_command(self.services.other_service.wipe_bomb_command, event, amount):
             yield result
 
     # 擦弹记录命令
     @filter.command("擦弹记录")
     async def wipe_bomb_log_command(self, event: AstrMessageEvent):
-        async for result in self.other_service.wipe_bomb_log_command(event):
+        async for result in db_executor.run_command(self.services.other_service.wipe_bomb_log_command, event):
             yield result
 
     # 科技树相关命令
     @filter.command("科技树")
     async def tech_tree_command(self, event: AstrMessageEvent):
-        async for result in self.technology_service.tech_tree_command(event):
+        async for result in db_executor.run_command(self.services.technology_service.tech_tree_command, event):
             yield result
 
     @filter.command("解锁科技")
     async def unlock_tech_command(self, event: AstrMessageEvent, tech_name: str):
-        async for result in self.technology_service.unlock_tech_command(event, tech_name):
+        async for result in db_executor.run_command(self.services.technology_service.unlock_tech_command, event, tech_name):
             yield result
\ No newline at end of file
@@ -1,17 +1,64 @@
 import sqlite3
 import os
 import time
-from typing import Optional
+from contextlib import contextmanager
+from typing import Callable, List, Optional
 from astrbot.api import logger
 from ..data.initial_data import FISH_DATA, BAIT_DATA, ROD_DATA, ACCESSORY_DATA
+from ..enums.constants import Constants
+
+# 表结构与初始数据的版本号，修改建表语句或初始数据后递增；
+# 数据库的 user_version 与之相同时，启动时跳过建表和初始数据检查
+SCHEMA_VERSION = 4
+
+# 排行榜：名称 → users 表中的排序列，每个排行榜有一个全服索引；按群排行经 user_groups 取群成员
+LEADERBOARD_COLUMNS = {
+    'comprehensive': 'leaderboard_score',  # 综合分：金币 + 钓鱼次数 * 10 + 总收益
+    'weight': 'total_fish_weight',
+    'rare': 'rare_fish_count',
+    'level': 'level',
+}
+
+# 建表之后新增的列：表名 → [(列名, 列定义)]，旧数据库启动时补上
+ADDED_COLUMNS = {
+    'users': [
+        ('rare_fish_count', 'INTEGER DEFAULT 0'),
+        # 综合排行分数由 SQLite 自动计算（虚拟生成列），任何修改金币、钓鱼次数、收益的语句都不需要额外维护
+        ('leaderboard_score',
+         'INTEGER GENERATED ALWAYS AS (gold + fishing_count * 10 + total_income) VIRTUAL'),
+        # 签到状态记在用户行上，签到只需一条 UPDATE
+        ('last_sign_in_date', "TEXT DEFAULT ''"),  # YYYY-MM-DD
+        ('sign_in_streak', 'INTEGER DEFAULT 0'),
+    ],
+}
+
+
+def leaderboard_score(gold, fishing_count, total_income) -> int:
+    """综合排行分数，与 leaderboard_score 生成列的表达式保持一致"""
+    return (gold or 0) + (fishing_count or 0) * 10 + (total_income or 0)
 
 class DatabaseManager:
     def __init__(self, db_path: str = "data/gaismanor.db"):
         # 确保data目录存在
         os.makedirs(os.path.dirname(db_path) if os.path.dirname(db_path) else ".", exist_ok=True)
         self.db_path = db_path
+        # 用户行修改的监听者（如内存排行），以 (用户ID, 修改后的字段值或 None) 调用，见 notify_user_changed
+        self.user_listeners: List[Callable[[str, Optional[dict]], None]] = []
         self.init_database()
 
+    def notify_user_changed(self, user_id: str, values: Optional[dict] = None) -> None:
+        """
+        通知监听者用户行已修改，在写入成功后调用
+
+        values 为修改后的字段值（可以只含部分字段）；只知道有修改、不知道新值（如金币增减）时传 None，
+        由监听者自行重新读取。监听者不能保留 values 的引用
+        """
+        for listener in self.user_listeners:
+            try:
+                listener(user_id, values)
+            except Exception as e:
+                logger.error(f"用户修改监听者出错: {e}")
+
     def get_connection(self):
         """获取数据库连接"""
         conn = sqlite3.connect(self.db_path)
@@ -23,6 +70,14 @@ class DatabaseManager:
         conn = self.get_connection()
         cursor = conn.cursor()
 
+        # 表结构已是最新版本时直接返回
+        if cursor.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION:
+            conn.close()
+            return
+
+        # WAL 模式下读写互不阻塞，降低并发写入时的锁竞争
+        cursor.execute("PRAGMA journal_mode=WAL")
+
         # 用户表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -46,6 +101,38 @@ class DatabaseManager:
                 updated_at INTEGER NOT NULL
             )
         ''')
+        added_user_columns = self._add_missing_columns(cursor, 'users')
+
+        # 全服排行取前 N 名走索引，不需要扫描和排序整个用户表
+        for board, column in LEADERBOARD_COLUMNS.items():
+            cursor.execute(f'''
+                CREATE INDEX IF NOT EXISTS idx_users_{board}
+                ON users ({column} DESC)
+            ''')
+            # 按群排行改为经 user_groups 取群成员，旧的 (group_id, 排序列) 索引不再使用
+            cursor.execute(f"DROP INDEX IF EXISTS idx_users_group_{board}")
+
+        # 用户所在的群：一个用户可以在多个群里玩，last_seen 为最近一次在该群使用命令的时间
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_groups (
+                user_id TEXT NOT NULL,
+                group_id TEXT NOT NULL,
+                last_seen INTEGER NOT NULL,
+                PRIMARY KEY (user_id, group_id),
+                FOREIGN KEY (user_id) REFERENCES users (user_id)
+            ) WITHOUT ROWID
+        ''')
+        # 按群取成员（群排行、群内名次）
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_user_groups_group
+            ON user_groups (group_id, user_id)
+        ''')
+        # 旧数据库：把注册时记录的群作为用户所在的群
+        cursor.execute('''
+            INSERT OR IGNORE INTO user_groups (user_id, group_id, last_seen)
+            SELECT user_id, group_id, updated_at FROM users
+            WHERE group_id IS NOT NULL AND group_id != ''
+        ''')
 
         # 鱼类模板表
         cursor.execute('''
@@ -189,6 +276,24 @@ class DatabaseManager:
                 FOREIGN KEY (bait_id) REFERENCES user_bait_inventory (id)
             )
         ''')
+        # 旧数据库新增稀有鱼数量列时，按钓鱼记录补上每个用户已钓到的稀有鱼数量
+        if 'rare_fish_count' in added_user_columns:
+            cursor.execute('''
+                CREATE TEMP TABLE rare_fish_counts (user_id TEXT PRIMARY KEY, count INTEGER NOT NULL)
+            ''')
+            cursor.execute('''
+                INSERT INTO rare_fish_counts (user_id, count)
+                SELECT l.user_id, COUNT(*) FROM fishing_logs l
+                JOIN fish_templates f ON f.id = l.fish_template_id
+                WHERE l.success AND f.rarity >= ?
+                GROUP BY l.user_id
+            ''', (Constants.RARE_FISH_RARITY,))
+            cursor.execute('''
+                UPDATE users
+                SET rare_fish_count = (SELECT count FROM rare_fish_counts r WHERE r.user_id = users.user_id)
+                WHERE user_id IN (SELECT user_id FROM rare_fish_counts)
+            ''')
+            cursor.execute("DROP TABLE rare_fish_counts")
 
         # 抽卡日志表
         cursor.execute('''
@@ -203,6 +308,12 @@ class DatabaseManager:
             )
         ''')
 
+        # 抽卡记录按用户和时间倒序查询、翻页走索引
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_gacha_logs_user_time
+            ON gacha_logs (user_id, timestamp DESC, id DESC)
+        ''')
+
         # 市场表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS market_listings (
@@ -217,6 +328,48 @@ class DatabaseManager:
             )
         ''')
 
+        # 市场过期清理按过期时间走索引
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_market_listings_expires_at
+            ON market_listings (expires_at)
+        ''')
+
+        # 市场浏览按类型和价格排序走索引
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_market_listings_type_price
+            ON market_listings (item_type, price)
+        ''')
+
+        # 市场成交记录表（只追加）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS market_trades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                listing_id INTEGER NOT NULL,
+                item_type TEXT NOT NULL,  -- 'fish', 'rod', 'accessory', 'bait'
+                template_id INTEGER NOT NULL,
+                seller_user_id TEXT NOT NULL,
+                buyer_user_id TEXT NOT NULL,
+                price INTEGER NOT NULL,
+                traded_at INTEGER NOT NULL
+            )
+        ''')
+
+        # 市场每日价格汇总表，按成交增量维护
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS market_price_daily (
+                item_type TEXT NOT NULL,
+                template_id INTEGER NOT NULL,
+                day TEXT NOT NULL,  -- YYYY-MM-DD
+                trade_count INTEGER NOT NULL DEFAULT 0,
+                min_price INTEGER NOT NULL,
+                max_price INTEGER NOT NULL,
+                total_price INTEGER NOT NULL DEFAULT 0,
+                last_price INTEGER NOT NULL,
+                last_traded_at INTEGER NOT NULL,
+                PRIMARY KEY (item_type, template_id, day)
+            )
+        ''')
+
         # 成就表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS achievements (
@@ -279,7 +432,7 @@ class DatabaseManager:
             )
         ''')
 
-        # 签到记录表
+        # 签到记录表（只追加的审计日志，批量写入）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS sign_in_logs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -292,6 +445,16 @@ class DatabaseManager:
                 FOREIGN KEY (user_id) REFERENCES users (user_id)
             )
         ''')
+        # 旧数据库：用最近一次签到记录补上用户行中的签到状态
+        cursor.execute('''
+            UPDATE users
+            SET (last_sign_in_date, sign_in_streak) = (
+                SELECT date, streak FROM sign_in_logs l
+                WHERE l.user_id = users.user_id ORDER BY date DESC LIMIT 1
+            )
+            WHERE last_sign_in_date = ''
+              AND EXISTS (SELECT 1 FROM sign_in_logs l WHERE l.user_id = users.user_id)
+        ''')
 
         # 擦弹记录表
         cursor.execute('''
@@ -427,8 +590,21 @@ class DatabaseManager:
 
         # 初始化基础数据
         self._init_base_data()
+        self.execute_query(f"PRAGMA user_version = {SCHEMA_VERSION}")
         logger.info("数据库初始化完成")
 
+    @staticmethod
+    def _add_missing_columns(cursor, table: str) -> set:
+        """按 ADDED_COLUMNS 给表补上新增的列，返回本次新增的列名；用 table_xinfo 读取现有列，生成列也在其中"""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_xinfo({table})")}
+        added = set()
+        for column, definition in ADDED_COLUMNS.get(table, []):
+            if column not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                logger.info(f"数据表 {table} 新增列 {column}")
+                added.add(column)
+        return added
+
     def _init_achievements_and_titles(self):
         """初始化成就和称号数据"""
         from ..data.initial_data import ACHIEVEMENT_DATA, TITLE_DATA
@@ -654,6 +830,22 @@ class DatabaseManager:
         conn.close()
         return results
 
+    @contextmanager
+    def transaction(self, immediate: bool = True):
+        """在同一个连接上执行事务，正常结束时提交，出现异常时回滚"""
+        conn = self.get_connection()
+        conn.isolation_level = None  # 手动控制事务边界
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
     def execute_update(self, query: str, params: tuple = ()):
         """执行更新操作（INSERT/UPDATE/DELETE）"""
         conn = self.get_connection()
@@ -1,10 +1,14 @@
-from dataclasses import dataclass, field
-from typing import Optional, List
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, Optional, List
 import time
 
 @dataclass
 class User:
-    """用户实体类"""
+    """
+    用户实体类
+
+    记录从数据库读取（或写回）时各字段的值，写回时只更新修改过的字段，见 UserDAO.build_update
+    """
     user_id: str
     platform: str = "unknown"  # 平台 (qq, dingtalk, feishu等)
     group_id: str = ""  # 群组ID
@@ -20,8 +24,36 @@ class User:
     total_fishing_count: int = 0  # 总钓鱼次数
     total_coins_earned: int = 0  # 累计获得的金币数
     fish_pond_capacity: int = 50  # 鱼塘容量，默认50
+    rare_fish_count: int = 0  # 钓到的稀有鱼数量
+    last_sign_in_date: str = ""  # 最近一次签到的日期（YYYY-MM-DD）
+    sign_in_streak: int = 0  # 连续签到天数
     created_at: int = field(default_factory=lambda: int(time.time()))
     updated_at: int = field(default_factory=lambda: int(time.time()))
+    # 字段名 → 数据库中的值；为空表示不知道数据库中的值，写回时整行更新
+    _saved: Dict[str, Any] = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def mark_saved(self, *names: str) -> None:
+        """记录字段的当前值与数据库一致，不传字段名时为所有可修改的字段"""
+        if names and not self._saved:
+            return  # 其余字段仍不知道数据库中的值，继续整行更新
+        for name in names or USER_TRACKED_FIELDS:
+            self._saved[name] = getattr(self, name)
+
+    @property
+    def is_tracked(self) -> bool:
+        """是否知道数据库中的值（从数据库读取或写回过）"""
+        return bool(self._saved)
+
+    def changed_fields(self) -> Dict[str, Any]:
+        """修改过的字段：字段名 → 数据库中的值；不知道数据库中的值时所有字段都算修改过（值为 None）"""
+        if not self._saved:
+            return dict.fromkeys(USER_TRACKED_FIELDS)
+        return {name: saved for name, saved in self._saved.items() if getattr(self, name) != saved}
+
+
+# 写回时比较的字段（用户ID、创建和更新时间除外）
+USER_TRACKED_FIELDS = tuple(f.name for f in fields(User)
+                            if f.init and f.name not in ('user_id', 'created_at', 'updated_at'))
 
 @dataclass
 class FishInventory:
@@ -59,4 +91,21 @@ class BaitInventory:
     id: int
     user_id: str
     bait_template_id: int
-    quantity: int
\ No newline at end of file
+    quantity: int
+@dataclass
+class RankEntry:
+    """排行榜上的一名用户"""
+    user_id: str
+    nickname: str
+    score: float
+
+@dataclass
+class RankInfo:
+    """用户在某个排行榜上的名次"""
+    board: str  # 排行榜，见 LEADERBOARD_COLUMNS
+    group_id: str  # 为空时是全服排行
+    rank: int  # 名次，分数相同的用户名次相同
+    total: int  # 排行榜总人数
+    score: float
+    above: List[RankEntry] = field(default_factory=list)  # 分数紧挨着的更高的用户，从高到低
+    below: List[RankEntry] = field(default_factory=list)  # 分数紧挨着的更低的用户，从高到低
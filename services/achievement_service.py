@@ -1,4 +1,4 @@
-from typing import List, Set
+from typing import List, Optional
 from ..achievements.base import BaseAchievement, UserContext
 from ..achievements.fishing_achievements import (
     FirstFishCaught, TotalFishCount100, TotalFishCount1000, TenThousandFishCaught,
@@ -12,14 +12,17 @@ from ..achievements.economic_achievements import (
     TotalCoinsEarned1M, WipeBomb10xMultiplier
 )
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..models.user import User
 from ..dao.achievement_dao import AchievementDAO
+from ..dao.command_context import CommandContext
 import time
 
 
 class AchievementService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "achievement_service", db_manager, services)
         self.achievement_dao = AchievementDAO(db_manager)
         # 初始化所有成就
         self.achievements = [
@@ -48,14 +51,8 @@ class AchievementService:
         """为用户构建成就检查上下文"""
         user_id = user.user_id
 
-        # 获取用户收集的不同鱼种数量
-        unique_fish_count = self.achievement_dao.get_unique_fish_count(user_id)
-
-        # 获取用户钓到的垃圾数量
-        garbage_count = self.achievement_dao.get_garbage_count(user_id)
-
-        # 获取用户获得的最大擦弹倍率
-        max_wipe_bomb_multiplier = self.achievement_dao.get_max_wipe_multiplier(user_id)
+        # 一次扫描钓鱼日志：鱼种数、垃圾数、最大擦弹倍率、是否钓到过重鱼 (超过100kg)
+        log_stats = self.achievement_dao.get_fishing_log_stats(user_id)
 
         # 获取用户拥有的鱼竿稀有度
         owned_rod_rarities = self.achievement_dao.get_owned_rod_rarities(user_id)
@@ -63,57 +60,63 @@ class AchievementService:
         # 获取用户拥有的饰品稀有度
         owned_accessory_rarities = self.achievement_dao.get_owned_accessory_rarities(user_id)
 
-        # 检查用户是否钓到过重鱼 (超过100kg)
-        has_heavy_fish = self.achievement_dao.has_heavy_fish(user_id)
-
         return UserContext(
             user=user,
-            unique_fish_count=unique_fish_count,
-            garbage_count=garbage_count,
-            max_wipe_bomb_multiplier=max_wipe_bomb_multiplier,
+            unique_fish_count=log_stats['unique_fish_count'],
+            garbage_count=log_stats['garbage_count'],
+            max_wipe_bomb_multiplier=log_stats['max_wipe_multiplier'],
             owned_rod_rarities=owned_rod_rarities,
             owned_accessory_rarities=owned_accessory_rarities,
-            has_heavy_fish=has_heavy_fish
+            has_heavy_fish=log_stats['has_heavy_fish']
         )
 
-    def check_achievements(self, user: User) -> List[BaseAchievement]:
-        """检查用户解锁了哪些成就，返回新解锁的成就列表"""
-        context = self._get_user_context(user)
-        newly_unlocked = []
+    def check_achievements(self, user: User, ctx: Optional[CommandContext] = None) -> List[BaseAchievement]:
+        """
+        检查用户解锁了哪些成就，返回新解锁的成就列表
 
-        for achievement in self.achievements:
-            # 检查用户是否已经解锁了这个成就
-            existing_record = self.db.fetch_one(
-                "SELECT completed FROM user_achievements WHERE user_id = ? AND achievement_id = ?",
-                (user.user_id, achievement.id)
-            )
+        传入 ctx 时已完成成就从 ctx 读取，金币奖励记到内存中的用户上由 ctx 写回
+        """
+        if ctx is None:
+            completed_ids = self.achievement_dao.get_completed_achievement_ids(user.user_id)
+        else:
+            completed_ids = ctx.get_completed_achievement_ids(user.user_id)
+
+        pending = [achievement for achievement in self.achievements if achievement.id not in completed_ids]
+        if not pending:
+            return []
 
-            # 如果成就已经完成，跳过检查
-            if existing_record and existing_record['completed']:
-                continue
+        context = self._get_user_context(user)
+        newly_unlocked = []
 
+        for achievement in pending:
             # 检查成就条件
             if achievement.check(context):
                 # 记录成就完成
                 progress = achievement.get_progress(context)
                 if self.achievement_dao.update_achievement_progress(user.user_id, achievement.id, progress, True):
                     newly_unlocked.append(achievement)
+                    completed_ids.add(achievement.id)
 
                     # 发放奖励
-                    self._grant_reward(user, achievement.reward)
+                    self._grant_reward(user, achievement.reward, ctx)
 
         return newly_unlocked
 
-    def _grant_reward(self, user: User, reward: tuple):
+    def _grant_reward(self, user: User, reward: tuple, ctx: Optional[CommandContext] = None):
         """发放成就奖励"""
         reward_type, reward_value, quantity = reward
 
-        if reward_type == "coins":
+        if reward_type == "coins" and ctx is not None:
+            # 用户数据由 ctx 统一写回，直接改库会被覆盖
+            user.gold += reward_value * quantity
+            ctx.mark_dirty(user)
+        elif reward_type == "coins":
             # 增加金币
             self.db.execute_query(
                 "UPDATE users SET gold = gold + ? WHERE user_id = ?",
                 (reward_value * quantity, user.user_id)
             )
+            self.db.notify_user_changed(user.user_id)
         elif reward_type == "title":
             # 授予称号
             title_id = reward_value
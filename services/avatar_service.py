@@ -0,0 +1,223 @@
+"""
+头像服务：在后台事件循环中异步下载头像，缓存处理好的头像，绘图时不等待网络
+"""
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Iterable, Optional, Tuple
+
+from astrbot.api import logger
+from ..enums.constants import Constants
+from ..models.database import DatabaseManager
+from ..utils.cache import LRUCache
+from ..utils.metrics import metrics
+from .container import ServiceContainer
+
+
+def process_avatar(raw: bytes, size: int) -> bytes:
+    """把原始头像处理为指定尺寸的圆角头像，返回 PNG 字节"""
+    from PIL import Image
+    from ..draw.state import avatar_postprocess
+
+    avatar = avatar_postprocess(Image.open(io.BytesIO(raw)).convert('RGBA'), size)
+    buffer = io.BytesIO()
+    avatar.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class AvatarService:
+    """
+    头像服务
+
+    下载在服务自己的后台事件循环中进行，所有下载共用一个 HTTP 会话（连接复用），
+    同时下载的数量受信号量限制；处理后的头像（缩放、圆角）按 (用户ID, 尺寸) 缓存在内存，
+    原图保存在磁盘；获取失败的用户在一段时间内直接返回空，不再重复请求。
+    调用方最多等待 budget 秒，超时后不带头像继续，下载在后台完成后供下次使用
+    """
+
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
+        self.db = db_manager
+        self.services = ServiceContainer.attach(self, "avatar_service", db_manager, services)
+        self.cache_dir = Constants.AVATAR_CACHE_DIR
+        self._memory = LRUCache(Constants.AVATAR_MEMORY_ENTRIES)
+        # 获取失败的用户 → 可以再次尝试的时间
+        self._negative = LRUCache(Constants.AVATAR_MEMORY_ENTRIES)
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session = None
+
+    # ==================后台事件循环==================
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """后台事件循环在首次获取头像时启动"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="gaismanor-avatar", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def _get_session(self):
+        """共用的 HTTP 会话，在后台事件循环中创建"""
+        if self._session is None:
+            import aiohttp  # 只有需要下载头像时才导入
+            self._semaphore = asyncio.Semaphore(Constants.AVATAR_FETCH_CONCURRENCY)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=Constants.AVATAR_FETCH_CONCURRENCY),
+                timeout=aiohttp.ClientTimeout(total=Constants.AVATAR_FETCH_TIMEOUT)
+            )
+        return self._session
+
+    # ==================磁盘==================
+    def _disk_path(self, user_id: str) -> str:
+        return os.path.join(self.cache_dir, f"{user_id}_avatar.png")
+
+    def _read_disk(self, user_id: str, allow_stale: bool = False) -> Optional[bytes]:
+        """读取磁盘上的头像原图，过期的原图只在 allow_stale 时返回"""
+        path = self._disk_path(user_id)
+        try:
+            if not allow_stale and time.time() - os.path.getmtime(path) >= Constants.AVATAR_DISK_TTL:
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, user_id: str, raw: bytes) -> None:
+        """保存头像原图"""
+        path = self._disk_path(user_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"保存头像失败: {e}")
+
+    # ==================获取==================
+    async def _download(self, user_id: str) -> Optional[bytes]:
+        """下载头像原图，失败时返回 None"""
+        session = self._get_session()
+        async with self._semaphore:
+            try:
+                async with session.get(Constants.AVATAR_URL.format(user_id=user_id)) as response:
+                    if response.status != 200:
+                        return None
+                    return await response.read()
+            except Exception as e:
+                logger.debug(f"下载头像失败 {user_id}: {e}")
+                return None
+
+    async def _fetch(self, user_id: str, size: int) -> Optional[bytes]:
+        """依次尝试磁盘缓存、网络下载和过期的磁盘缓存，处理后放入内存缓存"""
+        loop = asyncio.get_running_loop()
+        raw = await loop.run_in_executor(None, self._read_disk, user_id)
+        if raw is not None:
+            metrics.incr("avatar.disk_hits")
+        else:
+            raw = await self._download(user_id)
+            if raw is not None:
+                metrics.incr("avatar.downloads")
+                await loop.run_in_executor(None, self._write_disk, user_id, raw)
+            else:
+                raw = await loop.run_in_executor(None, self._read_disk, user_id, True)
+
+        avatar = None
+        if raw is not None:
+            try:
+                avatar = await loop.run_in_executor(None, process_avatar, raw, size)
+            except Exception as e:
+                logger.debug(f"处理头像失败 {user_id}: {e}")
+
+        if avatar is None:
+            metrics.incr("avatar.failures")
+            self._negative.set(user_id, time.monotonic() + Constants.AVATAR_NEGATIVE_TTL)
+        else:
+            self._memory.set((user_id, size), avatar)
+        return avatar
+
+    def _submit(self, user_id: str, size: int) -> Future:
+        """提交获取任务，同一个头像同时只获取一次"""
+        key = (user_id, size)
+        loop = self._get_loop()
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = asyncio.run_coroutine_threadsafe(self._fetch(user_id, size), loop)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._finish(key))
+        return future
+
+    def _finish(self, key: Tuple[str, int]) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _cached(self, user_id: str, size: int) -> Tuple[bool, Optional[bytes]]:
+        """查内存缓存和失败记录，返回 (是否已有结论, 头像)"""
+        avatar = self._memory.get((user_id, size))
+        if avatar is not None:
+            metrics.incr("avatar.memory_hits")
+            return True, avatar
+
+        retry_at = self._negative.get(user_id)
+        if retry_at is not None:
+            if time.monotonic() < retry_at:
+                metrics.incr("avatar.negative_hits")
+                return True, None
+            self._negative.pop(user_id)
+        return False, None
+
+    def get_avatar(self, user_id: str, size: int = Constants.AVATAR_SIZE,
+                   budget: Optional[float] = None) -> Optional[bytes]:
+        """
+        获取处理好的头像（PNG 字节），在命令线程中调用
+
+        最多等待 budget 秒（默认 Constants.AVATAR_RENDER_BUDGET），超时或获取失败时返回 None
+        """
+        if not user_id:
+            return None
+        done, avatar = self._cached(user_id, size)
+        if done:
+            return avatar
+
+        budget = Constants.AVATAR_RENDER_BUDGET if budget is None else budget
+        try:
+            return self._submit(user_id, size).result(budget)
+        except FutureTimeoutError:
+            metrics.incr("avatar.budget_exceeded")
+            return None
+        except Exception as e:
+            logger.debug(f"获取头像失败 {user_id}: {e}")
+            return None
+
+    def prefetch(self, user_ids: Iterable[str], size: int = Constants.AVATAR_SIZE) -> int:
+        """在后台批量获取头像（如排行榜上的用户），不等待结果，返回提交的数量"""
+        submitted = 0
+        for user_id in dict.fromkeys(user_ids):
+            if user_id and not self._cached(user_id, size)[0]:
+                self._submit(user_id, size)
+                submitted += 1
+        return submitted
+
+    def shutdown(self) -> None:
+        """关闭 HTTP 会话并停止后台事件循环"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def close():
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(close(), loop).result(5)
+        except Exception as e:
+            logger.error(f"关闭头像下载会话失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,91 @@
+"""
+服务容器：每个服务只构造一个实例，首次使用时才创建
+"""
+import importlib
+import threading
+from typing import Any, Dict, Optional
+
+from ..models.database import DatabaseManager
+
+
+class _LazyService:
+    """容器上的服务属性：首次访问时导入服务模块并构造实例"""
+
+    def __init__(self, module: str, class_name: str):
+        self.module = module
+        self.class_name = class_name
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, container: "ServiceContainer", owner=None):
+        if container is None:
+            return self
+        return container.get(self.name, self._load_class)
+
+    def _load_class(self):
+        return getattr(importlib.import_module(f".{self.module}", __package__), self.class_name)
+
+
+class ServiceContainer:
+    """
+    服务容器
+
+    服务之间的依赖都从容器取，保证同一个插件内每个服务只有一份实例和一份缓存；
+    服务在构造函数里不要直接访问其他服务，应在用到时再通过 self.services 获取，
+    这样既能延迟构造，也允许服务之间互相依赖
+    """
+
+    user_service = _LazyService("user_service", "UserService")
+    inventory_service = _LazyService("inventory_service", "InventoryService")
+    shop_service = _LazyService("shop_service", "ShopService")
+    market_service = _LazyService("market_service", "MarketService")
+    sell_service = _LazyService("sell_service", "SellService")
+    gacha_service = _LazyService("gacha_service", "GachaService")
+    other_service = _LazyService("other_service", "OtherService")
+    fishing_service = _LazyService("fishing_service", "FishingService")
+    equipment_service = _LazyService("equipment_service", "EquipmentService")
+    achievement_service = _LazyService("achievement_service", "AchievementService")
+    technology_service = _LazyService("technology_service", "TechnologyService")
+    render_service = _LazyService("render_service", "RenderService")
+    avatar_service = _LazyService("avatar_service", "AvatarService")
+    rank_service = _LazyService("rank_service", "RankService")
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+        self._instances: Dict[str, Any] = {}
+        # 构造服务时可能嵌套取其他服务，使用可重入锁
+        self._lock = threading.RLock()
+
+    @classmethod
+    def attach(cls, instance: Any, name: str, db_manager: DatabaseManager,
+               services: Optional["ServiceContainer"] = None) -> "ServiceContainer":
+        """
+        服务构造时调用，返回服务使用的容器
+
+        由容器构造时直接返回该容器；脱离容器单独创建（脚本、WebUI）时新建一个容器并登记自身
+        """
+        if services is None:
+            services = cls(db_manager)
+            services.register(name, instance)
+        return services
+
+    def get(self, name: str, load_class) -> Any:
+        """获取服务实例，不存在时构造"""
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = load_class()(self.db, self)
+                    self._instances[name] = instance
+        return instance
+
+    def register(self, name: str, instance: Any) -> None:
+        """登记一个已构造的服务实例（服务脱离容器单独创建时使用）"""
+        with self._lock:
+            self._instances.setdefault(name, instance)
+
+    def created_services(self) -> list:
+        """已构造的服务名称"""
+        return list(self._instances)
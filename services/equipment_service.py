@@ -3,6 +3,7 @@ from astrbot.api.event import AstrMessageEvent
 from ..models.user import User
 from ..models.equipment import Rod, Accessory, Bait
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..dao.equipment_dao import EquipmentDAO
 from ..enums.messages import Messages
 import time
@@ -11,8 +12,9 @@ import logging
 logger = logging.getLogger(__name__)
 
 class EquipmentService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "equipment_service", db_manager, services)
         self.equipment_dao = EquipmentDAO(db_manager)
 
     def get_user_rods(self, user_id: str) -> List[Rod]:
@@ -210,8 +212,7 @@ class EquipmentService:
             return
 
         # 获取用户信息
-        from ..services.user_service import UserService
-        user_service = UserService(self.db)
+        user_service = self.services.user_service
         user = user_service.get_user(user_id)
 
         if not user:
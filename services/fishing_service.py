@@ -1,13 +1,12 @@
 from typing import Optional, List, Tuple
 import math
 
-from discord.ext.commands import cooldown
-
 from astrbot import logger
 from ..models.user import User, FishInventory
 from ..models.fishing import FishTemplate, RodTemplate, AccessoryTemplate, BaitTemplate, FishingResult
 from ..models.database import DatabaseManager
-from .achievement_service import AchievementService
+from .container import ServiceContainer
+from ..dao.command_context import CommandContext
 from ..dao.fishing_dao import FishingDAO
 from ..enums.messages import Messages
 from ..utils.fishing_utils import (calculate_exp_gain, select_fish_by_rarity,
@@ -20,11 +19,19 @@ import time
 FISHING_COOLDOWN = Constants.FISHING_COOLDOWN
 
 class FishingService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
-        self.achievement_service = AchievementService(db_manager)
+        self.services = ServiceContainer.attach(self, "fishing_service", db_manager, services)
         self.fishing_dao = FishingDAO(db_manager)
 
+    @property
+    def achievement_service(self):
+        return self.services.achievement_service
+
+    @property
+    def user_service(self):
+        return self.services.user_service
+
     def get_fish_templates(self) -> List[FishTemplate]:
         """获取所有鱼类模板"""
         return self.fishing_dao.get_fish_templates()
@@ -41,14 +48,16 @@ class FishingService:
         """获取所有鱼饵模板"""
         return self.fishing_dao.get_bait_templates()
 
-    def can_fish(self, user: User) -> Tuple[bool, str]:
+    def can_fish(self, user: User, ctx: Optional[CommandContext] = None) -> Tuple[bool, str]:
         """检查用户是否可以钓鱼"""
+        ctx = ctx or CommandContext(self.db)
+
         # 检查冷却时间 (默认3分钟)
         current_time = int(time.time())
         cooldown = FISHING_COOLDOWN  # 3分钟冷却时间
 
         # 获取用户装备的鱼竿，用于计算冷却时间减成
-        equipped_rod = self._get_equipped_rod(user.user_id)
+        equipped_rod = ctx.get_equipped_rod(user.user_id)
 
         # 如果装备了"冷静之竿"，减少10%冷却时间
         if equipped_rod and equipped_rod.name == "冷静之竿":
@@ -64,22 +73,38 @@ class FishingService:
 
         return True, Messages.CAN_FISH.value
 
-    def fish(self, user: User) -> FishingResult:
-        """执行钓鱼操作"""
+    def fish(self, user: User, ctx: Optional[CommandContext] = None) -> FishingResult:
+        """
+        执行钓鱼操作
+
+        传入 ctx 时由调用方负责 flush；未传入时在本次钓鱼结束后自行写回
+        """
+        if ctx is not None:
+            return self._fish(user, ctx)
+
+        ctx = CommandContext(self.db)
+        result = self._fish(user, ctx)
+        ctx.flush()
+        return result
+
+    def _fish(self, user: User, ctx: CommandContext) -> FishingResult:
+        """钓鱼主流程，所有读取经过 ctx，用户数据的修改由 ctx 统一写回"""
+        ctx.add_user(user)
+
         # 检查是否可以钓鱼
-        can_fish, message = self.can_fish(user)
+        can_fish, message = self.can_fish(user, ctx)
         if not can_fish:
             return FishingResult(success=False, message=message)
 
         # 获取用户装备的鱼竿
-        equipped_rod = self._get_equipped_rod(user.user_id)
+        equipped_rod = ctx.get_equipped_rod(user.user_id)
 
         # 检查是否装备了鱼竿
         if not equipped_rod:
             return FishingResult(success=False, message=Messages.NO_ROD_EQUIPPED.value)
 
         # 获取用户装备的饰品
-        equipped_accessory = self._get_equipped_accessory(user.user_id)
+        equipped_accessory = ctx.get_equipped_accessory(user.user_id)
 
         # 计算钓鱼成功率加成
         catch_rate_bonus = 1.0
@@ -99,15 +124,7 @@ class FishingService:
             user.fishing_count += 1
             user.last_fishing_time = int(time.time())
 
-            # 更新用户数据到数据库
-            from ..dao.user_dao import UserDAO
-            user_dao = UserDAO(self.db)
-            user_dao.update_user_fields(user.user_id, {
-                'gold': user.gold,
-                'fishing_count': user.fishing_count,
-                'last_fishing_time': user.last_fishing_time
-            })
-
+            ctx.mark_dirty(user)
             return FishingResult(success=False, message=Messages.FISHING_FAILURE.value)
 
         # 钓鱼成功扣除费用并更新冷却时间
@@ -116,7 +133,7 @@ class FishingService:
         user.last_fishing_time = int(time.time())
 
         # 获取用户装备的鱼竿
-        equipped_rod_instance = self._get_equipped_rod_instance(user.user_id)
+        equipped_rod_instance = ctx.get_equipped_rod_instance(user.user_id)
 
         # 检查鱼竿耐久度
         if equipped_rod_instance and equipped_rod_instance['durability'] is not None:
@@ -148,7 +165,8 @@ class FishingService:
                 new_durability = max(0, equipped_rod_instance['durability'] - durability_cost)
 
                 # 更新鱼竿耐久度
-                self.fishing_dao.update_rod_durability(equipped_rod_instance['id'], new_durability)
+                equipped_rod_instance['durability'] = new_durability
+                ctx.defer(FishingDAO.UPDATE_ROD_DURABILITY_SQL, (new_durability, equipped_rod_instance['id']))
 
                 # 如果鱼竿损坏，添加提示信息
                 if new_durability <= 0:
@@ -165,21 +183,18 @@ class FishingService:
         # 更新用户统计数据（不再直接增加金币）
         user.total_fish_weight += final_weight
         user.total_income += final_value
+        if caught_fish.rarity >= Constants.RARE_FISH_RARITY:
+            user.rare_fish_count += 1
 
         # 增加经验（根据鱼的稀有度和价值）
         exp_gained = self._calculate_exp_gain(caught_fish, final_weight, final_value, user.level)
 
-        # 获取用户装备的鱼竿，用于计算经验加成
-        equipped_rod = self._get_equipped_rod(user.user_id)
-
         # 如果装备了"长者之竿"，增加5%经验
-        if equipped_rod and equipped_rod.name == "长者之竿":
+        if equipped_rod.name == "长者之竿":
             exp_gained = int(exp_gained * 1.05)  # 增加5%经验
 
         # 使用UserService的handle_user_exp_gain函数处理经验值增加
-        from ..services.user_service import UserService
-        user_service = UserService(self.db)
-        exp_result = user_service.handle_user_exp_gain(user, exp_gained)
+        exp_result = self.user_service.handle_user_exp_gain(user, exp_gained, ctx)
 
         # 提取处理结果
         leveled_up = exp_result['leveled_up']
@@ -187,7 +202,6 @@ class FishingService:
         new_level = exp_result['new_level']
         level_up_reward = exp_result['level_up_reward']
         unlocked_techs = exp_result['unlocked_techs']
-        newly_achievements = exp_result['newly_achievements']
 
         # 如果升级了，添加升级信息
         level_up_message = ""
@@ -212,21 +226,11 @@ class FishingService:
         # 记录钓鱼日志
         self.fishing_dao.add_fishing_log(user.user_id, caught_fish.id, final_weight, final_value, True)
 
-        # 更新用户数据到数据库
-        from ..dao.user_dao import UserDAO
-        user_dao = UserDAO(self.db)
-        user_dao.update_user_fields(user.user_id, {
-            'gold': user.gold,
-            'fishing_count': user.fishing_count,
-            'last_fishing_time': user.last_fishing_time,
-            'total_fish_weight': user.total_fish_weight,
-            'total_income': user.total_income,
-            'exp': user.exp,
-            'level': user.level
-        })
+        # 用户数据在命令结束时由 ctx 写回
+        ctx.mark_dirty(user)
 
         # 检查成就
-        newly_unlocked = self.achievement_service.check_achievements(user)
+        newly_unlocked = self.achievement_service.check_achievements(user, ctx)
 
         # 构造返回消息，包含成就解锁信息
         # 如果鱼竿已损坏，在消息前添加损坏信息
@@ -286,17 +290,17 @@ class FishingService:
         username = event.get_sender_name()
 
         # 从数据库获取用户（需要先注册）
-        from ..services.user_service import UserService
-        user_service = UserService(self.db)
-        user = user_service.get_user(user_id)
+        ctx = CommandContext(self.db)
+        user = ctx.get_user(user_id)
 
         # 如果用户不存在，提示需要先注册
         if not user:
             yield event.plain_result(Messages.NOT_REGISTERED.value)
             return
 
-        # 执行钓鱼操作
-        result = self.fish(user)
+        # 执行钓鱼操作，结束后一次性写回
+        result = self.fish(user, ctx)
+        ctx.flush()
 
         # 返回结果
         yield event.plain_result(result.message)
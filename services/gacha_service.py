@@ -1,23 +1,30 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from astrbot.api.event import AstrMessageEvent
 from ..models.user import User
 from ..models.fishing import FishTemplate
 from ..models.equipment import Rod, Accessory, Bait
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..dao.gacha_dao import GachaDAO
 from ..enums.messages import Messages
-import random
+from ..enums.constants import Constants
+from ..utils.gacha_utils import CompiledGachaPool, GachaItem, get_gacha_pool_version
+import threading
 import time
 
 class GachaService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "gacha_service", db_manager, services)
         self.gacha_dao = GachaDAO(db_manager)
-        # 从数据库加载卡池数据
-        self.gacha_pools = self._load_gacha_pools()
-
-    def _load_gacha_pools(self):
-        """从数据库加载卡池数据"""
+        # 编译后的卡池及其对应的配置版本号
+        self.gacha_pools: Dict[int, CompiledGachaPool] = {}
+        self._pools_version = None
+        self._compile_lock = threading.Lock()
+        self.get_gacha_pools()
+
+    def _load_gacha_pools(self) -> Dict[int, CompiledGachaPool]:
+        """从数据库加载并编译卡池数据"""
         pools = {}
 
         # 获取所有卡池
@@ -32,132 +39,112 @@ class GachaService:
             for weight in weights:
                 rarity_weights[weight['rarity']] = weight['weight']
 
-            # 获取卡池中的物品
-            items = self.gacha_dao.get_gacha_pool_items(pool_id)
-
-            # 按类型分组物品ID
-            items_dict = {"rod": [], "accessory": [], "bait": []}
-            for item in items:
-                item_type = item['item_type']
-                if item_type in items_dict:
-                    items_dict[item_type].append(item['item_template_id'])
+            # 获取卡池中的物品，名称和稀有度一并带出
+            items = [
+                GachaItem(item['item_type'], item['item_template_id'], item['name'], item['rarity'])
+                for item in self.gacha_dao.get_gacha_pool_item_details(pool_id)
+            ]
 
-            pools[pool_id] = {
-                "name": pool_record['name'],
-                "description": pool_record['description'],
-                "items": items_dict,
-                "rarity_weights": rarity_weights
-            }
+            pools[pool_id] = CompiledGachaPool(
+                pool_id, pool_record['name'], pool_record['description'], rarity_weights, items
+            )
 
         return pools
 
-    def get_rarity(self, pool_id: int) -> int:
-        """根据权重随机获取稀有度"""
-        if pool_id not in self.gacha_pools:
-            # 如果卡池不存在，使用默认权重
-            rarity_weights = {
-                1: 50,  # 50% 概率获得1星物品
-                2: 30,  # 30% 概率获得2星物品
-                3: 15,  # 15% 概率获得3星物品
-                4: 4,   # 4% 概率获得4星物品
-                5: 1    # 1% 概率获得5星物品
-            }
-        else:
-            rarity_weights = self.gacha_pools[pool_id]["rarity_weights"]
+    def get_gacha_pools(self) -> Dict[int, CompiledGachaPool]:
+        """
+        获取编译后的卡池
+
+        配置版本号变化时整体重新编译并替换，版本号未变时不访问数据库
+        """
+        version = get_gacha_pool_version()
+        if version != self._pools_version:
+            with self._compile_lock:
+                if version != self._pools_version:
+                    self.gacha_pools = self._load_gacha_pools()
+                    self._pools_version = version
+        return self.gacha_pools
+
+    def draw_item(self, pool_id: int) -> Optional[GachaItem]:
+        """从指定卡池抽取一件物品，只读取内存中的编译结果"""
+        pool = self.get_gacha_pools().get(pool_id)
+        if not pool:
+            return None
+        return pool.draw()
 
-        rarities = list(rarity_weights.keys())
-        weights = list(rarity_weights.values())
-        return random.choices(rarities, weights=weights)[0]
+    def get_pull_cost(self, count: int) -> int:
+        """连抽价格：每十抽按十连价格计算，零头按单抽价格计算"""
+        return count // 10 * Constants.GACHA_TEN_COST + count % 10 * Constants.GACHA_SINGLE_COST
 
-    def get_random_item(self, pool_id: int, item_type: str, rarity: int) -> Optional[int]:
-        """从指定卡池中随机获取指定类型和稀有度的物品"""
-        if pool_id not in self.gacha_pools:
-            return None
+    def pull(self, user_id: str, pool: CompiledGachaPool, count: int,
+             cost: int) -> Optional[Tuple[List[GachaItem], int]]:
+        """
+        执行 count 次抽卡：先在内存中抽出全部结果，再在一个事务中扣费、发放物品并写日志
 
-        pool = self.gacha_pools[pool_id]
-        if item_type not in pool["items"]:
+        :return: (抽到的物品, 剩余金币)，卡池为空、金币不足或结算失败时返回 None
+        """
+        items = [pool.draw() for _ in range(count)]
+        if not items or None in items:
             return None
 
-        # 获取指定稀有度的物品ID列表
-        item_ids = pool["items"][item_type]
+        remaining_gold = self.gacha_dao.record_pulls(
+            user_id, cost, [(item.item_type, item.template_id, item.rarity) for item in items]
+        )
+        if remaining_gold is None:
+            return None
+        return items, remaining_gold
 
-        # 从数据库中获取对应稀有度的物品
-        items = self.gacha_dao.get_items_by_rarity(item_type, item_ids, rarity)
+    def _format_pull_results(self, title: str, items: List[GachaItem], remaining_gold: int) -> str:
+        """按稀有度分组生成连抽结果，同名物品合并显示"""
+        result_msg = f"{title}\n"
+        result_msg += "=" * 30 + "\n"
 
-        if not items:
-            return None
+        for rarity in range(5, 0, -1):  # 从5星到1星
+            rarity_results = [item for item in items if item.rarity == rarity]
+            if rarity_results:
+                rarity_stars = "★" * rarity
+                result_msg += f"{rarity_stars} ({rarity}星): {len(rarity_results)}个\n"
+                counts: Dict[GachaItem, int] = {}
+                for item in rarity_results:
+                    counts[item] = counts.get(item, 0) + 1
+                for item, count in counts.items():
+                    suffix = f" ×{count}" if count > 1 else ""
+                    result_msg += f"  · {item.name} ({item.item_type}){suffix}\n"
 
-        # 随机选择一个物品
-        return random.choice(items)['id']
-
-    def add_item_to_user(self, user_id: str, item_type: str, item_template_id: int) -> bool:
-        """将抽到的物品添加到用户背包"""
-        if item_type == "rod":
-            return self.gacha_dao.add_rod_to_user(user_id, item_template_id)
-        elif item_type == "accessory":
-            return self.gacha_dao.add_accessory_to_user(user_id, item_template_id)
-        elif item_type == "bait":
-            return self.gacha_dao.add_bait_to_user(user_id, item_template_id)
-        else:
-            return False
+        result_msg += "=" * 30 + "\n"
+        result_msg += f"剩余金币: {remaining_gold}枚"
+        return result_msg
 
     async def gacha_command(self, event: AstrMessageEvent, pool_id: int):
         """单次抽卡命令"""
         user_id = event.get_sender_id()
 
         # 检查卡池是否存在
-        if pool_id not in self.gacha_pools:
+        pool = self.get_gacha_pools().get(pool_id)
+        if not pool:
             yield event.plain_result(Messages.GACHA_INVALID_POOL.value)
             return
 
-        # 检查用户金币 (假设单次抽卡消耗100金币)
+        # 检查用户金币 (单次抽卡消耗100金币)
         user = self.gacha_dao.get_user_gold(user_id)
-        if not user or user['gold'] < 100:
+        if not user or user['gold'] < Constants.GACHA_SINGLE_COST:
             yield event.plain_result(Messages.GACHA_NOT_ENOUGH_GOLD.value)
             return
 
-        # 扣除金币
-        if not self.gacha_dao.deduct_user_gold(user_id, 100):
-            yield event.plain_result(Messages.GACHA_DEDUCT_GOLD_FAILED.value)
-            return
-
-        # 执行抽卡
-        pool = self.gacha_pools[pool_id]
-        rarity = self.get_rarity(pool_id)
-
-        # 随机选择物品类型
-        item_types = ["rod", "accessory", "bait"]
-        item_type = random.choice(item_types)
-
-        # 获取物品
-        item_template_id = self.get_random_item(pool_id, item_type, rarity)
-        if not item_template_id:
-            yield event.plain_result(Messages.GACHA_FAILED.value)
-            return
-
-        # 获取物品名称
-        item_name = self.gacha_dao.get_item_name(item_type, item_template_id)
-        if not item_name:
+        # 抽卡并结算
+        result = self.pull(user_id, pool, 1, Constants.GACHA_SINGLE_COST)
+        if not result:
             yield event.plain_result(Messages.GACHA_FAILED.value)
             return
-
-        # 添加物品到用户背包
-        if not self.add_item_to_user(user_id, item_type, item_template_id):
-            yield event.plain_result(Messages.GACHA_ADD_ITEM_FAILED.value)
-            return
-
-        # 记录抽卡日志
-        if not self.gacha_dao.add_gacha_log(user_id, item_type, item_template_id, rarity):
-            yield event.plain_result(Messages.GACHA_LOG_FAILED.value)
-            return
+        (item,), remaining_gold = result
 
         # 构造返回消息
-        rarity_stars = "★" * rarity
+        rarity_stars = "★" * item.rarity
         result_msg = f"{Messages.GACHA_SUCCESS.value}\n"
-        result_msg += f"卡池: {pool['name']}\n"
-        result_msg += f"获得物品: {item_name}\n"
-        result_msg += f"稀有度: {rarity_stars} ({rarity}星)\n"
-        result_msg += f"剩余金币: {user['gold'] - 100}枚"
+        result_msg += f"卡池: {pool.name}\n"
+        result_msg += f"获得物品: {item.name}\n"
+        result_msg += f"稀有度: {rarity_stars} ({item.rarity}星)\n"
+        result_msg += f"剩余金币: {remaining_gold}枚"
 
         yield event.plain_result(result_msg)
 
@@ -166,189 +153,139 @@ class GachaService:
         user_id = event.get_sender_id()
 
         # 检查卡池是否存在
-        if pool_id not in self.gacha_pools:
+        pool = self.get_gacha_pools().get(pool_id)
+        if not pool:
             yield event.plain_result(Messages.GACHA_INVALID_POOL.value)
             return
 
         # 检查用户金币 (十连抽卡消耗900金币，相当于9折)
         user = self.gacha_dao.get_user_gold(user_id)
-        if not user or user['gold'] < 900:
+        if not user or user['gold'] < Constants.GACHA_TEN_COST:
             yield event.plain_result(Messages.GACHA_TEN_NOT_ENOUGH_GOLD.value)
             return
 
-        # 扣除金币
-        if not self.gacha_dao.deduct_user_gold(user_id, 900):
-            yield event.plain_result(Messages.GACHA_DEDUCT_GOLD_FAILED.value)
+        # 抽卡并结算
+        result = self.pull(user_id, pool, 10, Constants.GACHA_TEN_COST)
+        if not result:
+            yield event.plain_result(Messages.GACHA_FAILED.value)
             return
+        items, remaining_gold = result
 
-        # 执行十连抽卡
-        pool = self.gacha_pools[pool_id]
-        results = []
-
-        for i in range(10):
-            rarity = self.get_rarity(pool_id)
-
-            # 随机选择物品类型
-            item_types = ["rod", "accessory", "bait"]
-            item_type = random.choice(item_types)
-
-            # 获取物品
-            item_template_id = self.get_random_item(pool_id, item_type, rarity)
-            if not item_template_id:
-                continue
-
-            # 获取物品名称
-            item_name = self.gacha_dao.get_item_name(item_type, item_template_id)
-            if not item_name:
-                continue
+        title = f"{Messages.GACHA_TEN_SUCCESS.value} (卡池: {pool.name})"
+        yield event.plain_result(self._format_pull_results(title, items, remaining_gold))
 
-            # 添加物品到用户背包
-            if not self.add_item_to_user(user_id, item_type, item_template_id):
-                continue
-
-            # 记录抽卡日志
-            if not self.gacha_dao.add_gacha_log(user_id, item_type, item_template_id, rarity):
-                continue
+    async def multi_gacha_command(self, event: AstrMessageEvent, pool_id: int, count: int):
+        """任意次数连抽命令"""
+        user_id = event.get_sender_id()
 
-            results.append({
-                "name": item_name,
-                "rarity": rarity,
-                "type": item_type
-            })
+        if count < 1 or count > Constants.GACHA_MAX_PULLS:
+            yield event.plain_result(Messages.GACHA_MULTI_INVALID_COUNT.value.format(max_pulls=Constants.GACHA_MAX_PULLS))
+            return
+        # 大批量连抽（如测试用的百连）仅限管理员
+        if count > Constants.GACHA_PLAYER_MAX_PULLS and not event.is_admin():
+            yield event.plain_result(Messages.GACHA_MULTI_ADMIN_ONLY.value.format(max_pulls=Constants.GACHA_PLAYER_MAX_PULLS))
+            return
 
-        # 构造返回消息
-        result_msg = f"{Messages.GACHA_TEN_SUCCESS.value} (卡池: {pool['name']})\n"
-        result_msg += "=" * 30 + "\n"
+        # 检查卡池是否存在
+        pool = self.get_gacha_pools().get(pool_id)
+        if not pool:
+            yield event.plain_result(Messages.GACHA_INVALID_POOL.value)
+            return
 
-        # 按稀有度分组显示
-        for rarity in range(5, 0, -1):  # 从5星到1星
-            rarity_results = [r for r in results if r["rarity"] == rarity]
-            if rarity_results:
-                rarity_stars = "★" * rarity
-                result_msg += f"{rarity_stars} ({rarity}星): {len(rarity_results)}个\n"
-                for item in rarity_results:
-                    result_msg += f"  · {item['name']} ({item['type']})\n"
+        # 检查用户金币
+        cost = self.get_pull_cost(count)
+        user = self.gacha_dao.get_user_gold(user_id)
+        if not user or user['gold'] < cost:
+            yield event.plain_result(Messages.GACHA_MULTI_NOT_ENOUGH_GOLD.value.format(count=count, cost=cost))
+            return
 
-        result_msg += "=" * 30 + "\n"
-        result_msg += f"剩余金币: {user['gold'] - 900}枚"
+        # 抽卡并结算
+        result = self.pull(user_id, pool, count, cost)
+        if not result:
+            yield event.plain_result(Messages.GACHA_FAILED.value)
+            return
+        items, remaining_gold = result
 
-        yield event.plain_result(result_msg)
+        title = f"{Messages.GACHA_MULTI_SUCCESS.value.format(count=count)} (卡池: {pool.name})"
+        yield event.plain_result(self._format_pull_results(title, items, remaining_gold))
 
     async def view_gacha_pool_command(self, event: AstrMessageEvent, pool_id: int):
         """查看卡池命令"""
-        if pool_id not in self.gacha_pools:
+        pool = self.get_gacha_pools().get(pool_id)
+        if not pool:
             yield event.plain_result(Messages.GACHA_INVALID_POOL.value)
             return
 
-        pool = self.gacha_pools[pool_id]
-
         # 构造卡池信息
-        pool_info = f"=== {pool['name']} ===\n\n"
-        pool_info += f"{pool['description']}\n\n\n"
+        pool_info = f"=== {pool.name} ===\n\n"
+        pool_info += f"{pool.description}\n\n\n"
 
         pool_info += "\n\n包含物品:\n\n"
 
-        # 显示鱼竿
-        pool_info += "鱼竿:\n\n"
-        for rod_id in pool["items"]["rod"]:
-            rod_name = self.gacha_dao.get_item_name("rod", rod_id)
-            # 由于GachaDAO中没有直接获取物品稀有度的方法，我们仍然需要查询数据库
-            rod = self.db.fetch_one("SELECT name, rarity FROM rod_templates WHERE id = ?", (rod_id,))
-            if rod and rod_name:
-                stars = "★" * rod['rarity']
-                pool_info += f"  · {rod_name} ({stars})\n\n"
-
-        # 显示饰品
-        pool_info += "饰品:\n\n"
-        for accessory_id in pool["items"]["accessory"]:
-            accessory_name = self.gacha_dao.get_item_name("accessory", accessory_id)
-            # 由于GachaDAO中没有直接获取物品稀有度的方法，我们仍然需要查询数据库
-            accessory = self.db.fetch_one("SELECT name, rarity FROM accessory_templates WHERE id = ?", (accessory_id,))
-            if accessory and accessory_name:
-                stars = "★" * accessory['rarity']
-                pool_info += f"  · {accessory_name} ({stars})\n\n"
-
-        # 显示鱼饵
-        pool_info += "鱼饵:\n\n"
-        for bait_id in pool["items"]["bait"]:
-            bait_name = self.gacha_dao.get_item_name("bait", bait_id)
-            # 由于GachaDAO中没有直接获取物品稀有度的方法，我们仍然需要查询数据库
-            bait = self.db.fetch_one("SELECT name, rarity FROM bait_templates WHERE id = ?", (bait_id,))
-            if bait and bait_name:
-                stars = "★" * bait['rarity']
-                pool_info += f"  · {bait_name} ({stars})\n\n"
+        # 按鱼竿、饰品、鱼饵分类显示，名称和稀有度已在编译卡池时带出
+        for item_type, type_name in (("rod", "鱼竿"), ("accessory", "饰品"), ("bait", "鱼饵")):
+            pool_info += f"{type_name}:\n\n"
+            for item in pool.items_of_type(item_type):
+                stars = "★" * item.rarity
+                pool_info += f"  · {item.name} ({stars})\n\n"
 
         yield event.plain_result(pool_info)
 
-    async def gacha_log_command(self, event: AstrMessageEvent):
-        """查看抽卡记录命令"""
+    async def gacha_log_command(self, event: AstrMessageEvent, before_id: int = 0):
+        """查看抽卡记录命令，传入记录ID时查看该记录之前的更早记录"""
         user_id = event.get_sender_id()
+        page_size = Constants.GACHA_LOG_PAGE_SIZE
 
-        # 获取用户的抽卡记录
-        logs = self.gacha_dao.get_gacha_logs(user_id, 20)
+        # 一次查询取出本页记录及物品名称、稀有度
+        logs = self.gacha_dao.get_gacha_history(user_id, page_size, before_id or None)
 
         # 如果没有抽卡记录
         if not logs:
             yield event.plain_result(Messages.GACHA_NO_RECORDS.value)
             return
 
-        # 获取其他类型的物品名称
-        accessory_logs = self.gacha_dao.get_accessory_logs(user_id, 20)
-
-        bait_logs = self.gacha_dao.get_bait_logs(user_id, 20)
-
-        # 合并所有记录并按时间排序
-        all_logs = list(logs) + list(accessory_logs) + list(bait_logs)
-        all_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-        all_logs = all_logs[:20]  # 只取最新的20条记录
+        # 物品类型中文
+        type_map = {
+            'rod': '鱼竿',
+            'accessory': '饰品',
+            'bait': '鱼饵'
+        }
 
-        if not all_logs:
-            yield event.plain_result(Messages.GACHA_NO_RECORDS.value)
-            return
+        if before_id:
+            result_msg = f"=== 抽卡记录 (#{before_id} 之前{len(logs)}条) ===\n\n"
+        else:
+            result_msg = f"=== 抽卡记录 (最近{len(logs)}条) ===\n\n"
+            result_msg += self._format_gacha_summary(user_id, type_map)
 
-        # 构造返回消息
-        result_msg = "=== 抽卡记录 (最近20条) ===\n\n"
-
-        for log in all_logs:
-            # 获取物品名称和稀有度
-            item_name = log['item_name']
-            item_rarity = log['item_rarity']
-
-            if not item_name or item_rarity is None:
-                # 如果物品信息缺失，尝试从对应的表中获取
-                if log['item_type'] == 'rod':
-                    item = self.db.fetch_one("SELECT name, rarity FROM rod_templates WHERE id = ?", (log['item_template_id'],))
-                elif log['item_type'] == 'accessory':
-                    item = self.db.fetch_one("SELECT name, rarity FROM accessory_templates WHERE id = ?", (log['item_template_id'],))
-                elif log['item_type'] == 'bait':
-                    item = self.db.fetch_one("SELECT name, rarity FROM bait_templates WHERE id = ?", (log['item_template_id'],))
-                else:
-                    item = None
-
-                if item:
-                    item_name = item['name']
-                    item_rarity = item['rarity']
-                else:
-                    item_name = "未知物品"
-                    item_rarity = 1
-
-            # 格式化时间
-            import datetime
-            timestamp = datetime.datetime.fromtimestamp(log['timestamp'])
-            time_str = timestamp.strftime("%m-%d %H:%M")
-
-            # 物品类型中文
-            type_map = {
-                'rod': '鱼竿',
-                'accessory': '饰品',
-                'bait': '鱼饵'
-            }
+        for log in logs:
+            item_name = log['item_name'] or "未知物品"
+            time_str = time.strftime("%m-%d %H:%M", time.localtime(log['timestamp']))
             item_type = type_map.get(log['item_type'], log['item_type'])
-
-            # 稀有度星星
-            rarity_stars = "★" * item_rarity
+            rarity_stars = "★" * log['item_rarity']
 
             result_msg += f"{time_str} 抽到 {item_type} {rarity_stars}\n"
             result_msg += f"  · {item_name}\n\n"
 
-        yield event.plain_result(result_msg)
\ No newline at end of file
+        if len(logs) == page_size:
+            result_msg += f"查看更早记录: /抽卡记录 {logs[-1]['id']}"
+
+        yield event.plain_result(result_msg.rstrip())
+
+    def _format_gacha_summary(self, user_id: str, type_map: Dict[str, str]) -> str:
+        """生成抽卡统计：各稀有度次数、最近一次5星及其后已抽次数"""
+        rarity_counts = self.gacha_dao.get_gacha_rarity_counts(user_id)
+        total = sum(rarity_counts.values())
+        summary = f"累计抽卡: {total}次\n"
+        summary += "  ".join(f"{rarity}★ {rarity_counts.get(rarity, 0)}" for rarity in range(5, 0, -1)) + "\n"
+
+        last_five_star = self.gacha_dao.get_gacha_history(user_id, 1, rarity=5)
+        if last_five_star:
+            log = last_five_star[0]
+            since = self.gacha_dao.count_gacha_logs_after(user_id, log['id'])
+            time_str = time.strftime("%m-%d %H:%M", time.localtime(log['timestamp']))
+            summary += f"最近5★: {log['item_name'] or '未知物品'} ({type_map.get(log['item_type'], log['item_type'])}) " \
+                       f"于 {time_str}，此后已抽 {since} 次\n"
+        else:
+            summary += "尚未抽到5★物品\n"
+
+        return summary + "\n"
@@ -5,6 +5,7 @@ from ..enums.constants import Constants
 from ..models.user import User, FishInventory
 from ..models.fishing import FishTemplate, RodTemplate, AccessoryTemplate, BaitTemplate
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..dao.inventory_dao import InventoryDAO
 from ..dao.user_dao import UserDAO
 from ..enums.messages import Messages
@@ -14,8 +15,9 @@ POND_UPGRADE_CONFIG = Constants.POND_UPGRADE_CONFIG
 POND_BASE_CAPACITY = Constants.POND_BASE_CAPACITY
 
 class InventoryService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "inventory_service", db_manager, services)
         self.inventory_dao = InventoryDAO(db_manager)
         self.user_dao = UserDAO(db_manager)
 
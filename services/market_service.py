@@ -5,15 +5,51 @@ from ..models.user import User
 from ..models.equipment import Rod, Accessory, Bait
 from ..models.fishing import FishTemplate
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
+from ..dao.market_dao import MarketDAO
 from ..enums.messages import Messages
+from ..enums.constants import Constants
+from ..utils.metrics import metrics
+from ..utils.cache import LRUCache
+from astrbot.api import logger
+import threading
 import time
 
+# 市场分类名称与商品类型的对应关系
+MARKET_CATEGORIES = {'鱼类': 'fish', '鱼竿': 'rod', '饰品': 'accessory', '鱼饵': 'bait'}
+
+# 市场排序名称与排序方式的对应关系
+MARKET_SORTS = {'价格': 'price', '最新': 'newest'}
+
+# 各类商品无在售时的提示
+MARKET_EMPTY_MESSAGES = {
+    'fish': Messages.MARKET_NO_FISH_ITEMS,
+    'rod': Messages.MARKET_NO_ROD_ITEMS,
+    'accessory': Messages.MARKET_NO_ACCESSORY_ITEMS,
+    'bait': Messages.MARKET_NO_BAIT_ITEMS,
+}
+
 class MarketService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "market_service", db_manager, services)
+        self.market_dao = MarketDAO(db_manager)
+        # 市场版本号：上架、成交后递增，浏览页缓存以版本号为键的一部分
+        self._market_version = 0
+        self._version_lock = threading.Lock()
+        self._page_cache = LRUCache(Constants.MARKET_PAGE_CACHE_SIZE)
+        # 启动过期上架清理线程
+        self.expiry_sweep_thread = threading.Thread(target=self._expiry_sweep_loop, daemon=True)
+        self.expiry_sweep_thread.start()
+
+    async def market_command(self, event: AstrMessageEvent, category: str = "", page: int = 1,
+                             sort: str = "价格", rarity: int = 0):
+        """市场主命令，带分类参数时直接浏览对应分类"""
+        if category in MARKET_CATEGORIES:
+            yield event.plain_result(self.browse_market(MARKET_CATEGORIES[category], page,
+                                                        MARKET_SORTS.get(sort, 'price'), rarity or None))
+            return
 
-    async def market_command(self, event: AstrMessageEvent):
-        """市场主命令"""
         market_info = """=== 庄园市场 ===
 欢迎来到庄园市场！您可以在这里购买其他玩家上架的商品。
 
@@ -22,107 +58,31 @@ class MarketService:
 /市场 鱼竿  - 查看市场上架的鱼竿
 /市场 饰品  - 查看市场上架的饰品
 /市场 鱼饵  - 查看市场上架的鱼饵
+/市场 <分类> <页码> <价格|最新> <星级>  - 翻页、排序并按星级筛选
 /上架鱼类 <ID> <价格>  - 将指定ID的鱼类上架到市场
 /上架鱼竿 <ID> <价格>  - 将指定ID的鱼竿上架到市场
 /上架饰品 <ID> <价格>  - 将指定ID的饰品上架到市场
 /上架鱼饵 <ID> <价格>  - 将指定ID的鱼饵上架到市场
 /购买 <商品ID>  - 购买指定ID的商品
+/市场行情 <名称>  - 查看物品近期成交价格
 """
         yield event.plain_result(market_info)
 
-    async def market_fish_command(self, event: AstrMessageEvent):
+    async def market_fish_command(self, event: AstrMessageEvent, page: int = 1, sort: str = 'price'):
         """查看市场上架的鱼类"""
-        fish_listings = self.get_market_fish_listings()
-
-        if not fish_listings:
-            yield event.plain_result(Messages.MARKET_NO_FISH_ITEMS.value)
-            return
-
-        fish_info = "=== 市场鱼类商品 ===\n"
-        for listing in fish_listings:
-            fish_template = self.db.fetch_one(
-                "SELECT name, rarity, base_value FROM fish_templates WHERE id = ?",
-                (listing['fish_template_id'],)
-            )
-            if fish_template:
-                rarity_stars = "★" * fish_template['rarity'] + "☆" * (5 - fish_template['rarity'])
-                fish_info += f"商品ID: {listing['id']} - {fish_template['name']} {rarity_stars}\n"
-                fish_info += f"  重量: {listing['fish_weight']:.2f}kg  价值: {listing['fish_value']}金币\n"
-                fish_info += f"  售价: {listing['price']}金币  卖家: {listing['seller_nickname']}\n"
-                fish_info += f"  上架时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(listing['created_at']))}\n\n"
-
-        yield event.plain_result(fish_info)
+        yield event.plain_result(self.browse_market('fish', page, sort))
 
-    async def market_rod_command(self, event: AstrMessageEvent):
+    async def market_rod_command(self, event: AstrMessageEvent, page: int = 1, sort: str = 'price'):
         """查看市场上架的鱼竿"""
-        rod_listings = self.get_market_rod_listings()
-
-        if not rod_listings:
-            yield event.plain_result(Messages.MARKET_NO_ROD_ITEMS.value)
-            return
-
-        rod_info = "=== 市场鱼竿商品 ===\n"
-        for listing in rod_listings:
-            rod_template = self.db.fetch_one(
-                "SELECT name, rarity, purchase_cost FROM rod_templates WHERE id = ?",
-                (listing['rod_template_id'],)
-            )
-            if rod_template:
-                rarity_stars = "★" * rod_template['rarity'] + "☆" * (5 - rod_template['rarity'])
-                rod_info += f"商品ID: {listing['id']} - {rod_template['name']} {rarity_stars}\n"
-                rod_info += f"  等级: {listing['rod_level']}  经验: {listing['rod_exp']}\n"
-                rod_info += f"  品质加成: +{listing['quality_mod']}  数量加成: +{listing['quantity_mod']}\n"
-                rod_info += f"  售价: {listing['price']}金币  卖家: {listing['seller_nickname']}\n"
-                rod_info += f"  上架时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(listing['created_at']))}\n\n"
-
-        yield event.plain_result(rod_info)
+        yield event.plain_result(self.browse_market('rod', page, sort))
 
-    async def market_accessory_command(self, event: AstrMessageEvent):
+    async def market_accessory_command(self, event: AstrMessageEvent, page: int = 1, sort: str = 'price'):
         """查看市场上架的饰品"""
-        accessory_listings = self.get_market_accessory_listings()
+        yield event.plain_result(self.browse_market('accessory', page, sort))
 
-        if not accessory_listings:
-            yield event.plain_result(Messages.MARKET_NO_ACCESSORY_ITEMS.value)
-            return
-
-        accessory_info = "=== 市场饰品商品 ===\n"
-        for listing in accessory_listings:
-            accessory_template = self.db.fetch_one(
-                "SELECT name, rarity FROM accessory_templates WHERE id = ?",
-                (listing['accessory_template_id'],)
-            )
-            if accessory_template:
-                rarity_stars = "★" * accessory_template['rarity'] + "☆" * (5 - accessory_template['rarity'])
-                accessory_info += f"商品ID: {listing['id']} - {accessory_template['name']} {rarity_stars}\n"
-                accessory_info += f"  品质加成: +{listing['quality_mod']}  数量加成: +{listing['quantity_mod']}\n"
-                accessory_info += f"  稀有度加成: +{listing['rare_mod']}  金币加成: +{listing['coin_mod']}\n"
-                accessory_info += f"  售价: {listing['price']}金币  卖家: {listing['seller_nickname']}\n"
-                accessory_info += f"  上架时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(listing['created_at']))}\n\n"
-
-        yield event.plain_result(accessory_info)
-
-    async def market_bait_command(self, event: AstrMessageEvent):
+    async def market_bait_command(self, event: AstrMessageEvent, page: int = 1, sort: str = 'price'):
         """查看市场上架的鱼饵"""
-        bait_listings = self.get_market_bait_listings()
-
-        if not bait_listings:
-            yield event.plain_result(Messages.MARKET_NO_BAIT_ITEMS.value)
-            return
-
-        bait_info = "=== 市场鱼饵商品 ===\n"
-        for listing in bait_listings:
-            bait_template = self.db.fetch_one(
-                "SELECT name, rarity, cost FROM bait_templates WHERE id = ?",
-                (listing['bait_template_id'],)
-            )
-            if bait_template:
-                rarity_stars = "★" * bait_template['rarity'] + "☆" * (5 - bait_template['rarity'])
-                bait_info += f"商品ID: {listing['id']} - {bait_template['name']} {rarity_stars}\n"
-                bait_info += f"  数量: {listing['quantity']}  效果: {listing['effect_description']}\n"
-                bait_info += f"  售价: {listing['price']}金币  卖家: {listing['seller_nickname']}\n"
-                bait_info += f"  上架时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(listing['created_at']))}\n\n"
-
-        yield event.plain_result(bait_info)
+        yield event.plain_result(self.browse_market('bait', page, sort))
 
     async def list_fish_command(self, event: AstrMessageEvent, fish_id: int, price: int):
         """上架鱼类命令"""
@@ -290,6 +250,42 @@ class MarketService:
         else:
             yield event.plain_result(Messages.MARKET_BUY_FAILED.value)
 
+    async def market_price_command(self, event: AstrMessageEvent, item_name: str = ""):
+        """市场行情命令：只读取每日价格汇总，查询耗时与成交量无关"""
+        item_name = item_name.strip()
+        if not item_name:
+            yield event.plain_result(Messages.MARKET_PRICE_NO_NAME.value)
+            return
+
+        templates = self.market_dao.find_templates_by_name(item_name)
+        if not templates:
+            yield event.plain_result(Messages.MARKET_PRICE_ITEM_NOT_FOUND.value)
+            return
+
+        type_names = {'fish': '鱼类', 'rod': '鱼竿', 'accessory': '饰品', 'bait': '鱼饵'}
+        days = Constants.MARKET_PRICE_HISTORY_DAYS
+        sections = []
+        for template in templates:
+            history = self.get_price_history(template['item_type'], template['template_id'], days)
+            if not history['days']:
+                continue
+
+            summary = history['summary']
+            section = f"【{template['name']}】{type_names[template['item_type']]} {'★' * template['rarity']}\n"
+            section += f"近{days}天成交: {summary['trade_count']}笔\n"
+            section += f"最低: {summary['min_price']}金币  最高: {summary['max_price']}金币\n"
+            section += f"均价: {summary['avg_price']:.0f}金币  最新成交: {summary['last_price']}金币\n"
+            for day in history['days']:
+                section += f"  {day['day']}: {day['trade_count']}笔 均价{day['avg_price']:.0f} " \
+                           f"({day['min_price']}~{day['max_price']})\n"
+            sections.append(section)
+
+        if not sections:
+            yield event.plain_result(Messages.MARKET_PRICE_NO_DATA.value)
+            return
+
+        yield event.plain_result("=== 市场行情 ===\n" + "\n".join(sections))
+
     def get_market_fish_listings(self) -> List[dict]:
         """获取市场上架的鱼类"""
         results = self.db.fetch_all(
@@ -348,252 +344,167 @@ class MarketService:
         )
         return [dict(row) for row in results]
 
+    def browse_market(self, item_type: str, page: int = 1, sort: str = 'price',
+                      rarity: Optional[int] = None) -> str:
+        """
+        获取市场浏览页文本，优先读取缓存
+
+        缓存键包含市场版本号，上架或成交后旧条目自然失效；
+        条目同时记录本分类最早的过期时间，到期后也不再命中
+        """
+        page = max(1, page)
+        now = int(time.time())
+        key = (self._market_version, item_type, sort, page, rarity)
+        cached = self._page_cache.get(key)
+        if cached and (cached['valid_until'] is None or now < cached['valid_until']):
+            metrics.incr("market.cache.hits")
+            return cached['text']
+
+        metrics.incr("market.cache.misses")
+        with metrics.timer("market.browse.render"):
+            text, valid_until = self._render_market_page(item_type, page, sort, rarity, now)
+        self._page_cache.set(key, {'text': text, 'valid_until': valid_until})
+        return text
+
+    def _render_market_page(self, item_type: str, page: int, sort: str, rarity: Optional[int],
+                            now: int) -> tuple:
+        """查询并生成一页市场浏览文本，返回 (文本, 缓存有效期截止时间)"""
+        stats = self.market_dao.get_listing_stats(item_type, now, rarity)
+        if not stats['total']:
+            return MARKET_EMPTY_MESSAGES[item_type].value, None
+
+        page_size = Constants.MARKET_PAGE_SIZE
+        total_pages = (stats['total'] + page_size - 1) // page_size
+        page = min(page, total_pages)
+        listings = self.market_dao.get_listing_page(item_type, now, sort, (page - 1) * page_size,
+                                                    page_size, rarity)
+
+        category = next(name for name, value in MARKET_CATEGORIES.items() if value == item_type)
+        info = f"=== 市场{category}商品 ===\n"
+        for listing in listings:
+            rarity_stars = "★" * listing['rarity'] + "☆" * (5 - listing['rarity'])
+            info += f"商品ID: {listing['id']} - {listing['name']} {rarity_stars}\n"
+            if item_type == 'fish':
+                info += f"  重量: {listing['fish_weight']:.2f}kg  价值: {listing['fish_value']}金币\n"
+            elif item_type == 'rod':
+                info += f"  等级: {listing['rod_level']}  经验: {listing['rod_exp']}\n"
+                info += f"  品质加成: +{listing['quality_mod']}  数量加成: +{listing['quantity_mod']}\n"
+            elif item_type == 'accessory':
+                info += f"  品质加成: +{listing['quality_mod']}  数量加成: +{listing['quantity_mod']}\n"
+                info += f"  稀有度加成: +{listing['rare_mod']}  金币加成: +{listing['coin_mod']}\n"
+            elif item_type == 'bait':
+                info += f"  数量: {listing['quantity']}  效果: {listing['effect_description']}\n"
+            info += f"  售价: {listing['price']}金币  卖家: {listing['seller_nickname']}\n"
+            info += f"  上架时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(listing['created_at']))}\n\n"
+
+        info += f"第 {page}/{total_pages} 页，共 {stats['total']} 件商品"
+        return info, stats['next_expires_at']
+
+    def bump_market_version(self) -> int:
+        """市场在售商品发生变化时递增版本号，使浏览页缓存失效"""
+        with self._version_lock:
+            self._market_version += 1
+            return self._market_version
+
+    def get_cache_stats(self) -> dict:
+        """获取市场浏览页缓存的命中情况"""
+        hits = metrics.get_counter("market.cache.hits")
+        misses = metrics.get_counter("market.cache.misses")
+        return {
+            'version': self._market_version,
+            'entries': len(self._page_cache),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+        }
+
     def list_fish(self, user_id: str, fish_id: int, price: int) -> bool:
         """上架鱼类到市场"""
-        # 检查鱼类是否存在且属于用户
-        fish_inventory = self.db.fetch_one(
-            "SELECT * FROM user_fish_inventory WHERE user_id = ? AND id = ?",
-            (user_id, fish_id)
-        )
-        if not fish_inventory:
-            return False
-
-        # 添加到市场
-        self.db.execute_query(
-            """INSERT INTO market_listings
-               (seller_user_id, item_type, item_id, price, created_at, expires_at)
-               VALUES (?, 'fish', ?, ?, ?, ?)""",
-            (user_id, fish_id, price, int(time.time()), int(time.time()) + 86400 * 7)  # 7天有效期
-        )
-
-        # 从用户鱼类库存中移除
-        self.db.execute_query(
-            "DELETE FROM user_fish_inventory WHERE user_id = ? AND id = ?",
-            (user_id, fish_id)
-        )
-
-        return True
+        return self._list_item(user_id, 'fish', fish_id, price)
 
     def list_rod(self, user_id: str, rod_id: int, price: int) -> bool:
         """上架鱼竿到市场"""
-        # 检查鱼竿是否存在且属于用户
-        rod_instance = self.db.fetch_one(
-            "SELECT * FROM user_rod_instances WHERE user_id = ? AND id = ?",
-            (user_id, rod_id)
-        )
-        if not rod_instance:
-            return False
-
-        # 检查是否是装备中的鱼竿
-        if rod_instance['is_equipped']:
-            return False
-
-        # 添加到市场
-        self.db.execute_query(
-            """INSERT INTO market_listings
-               (seller_user_id, item_type, item_id, price, created_at, expires_at)
-               VALUES (?, 'rod', ?, ?, ?, ?)""",
-            (user_id, rod_id, price, int(time.time()), int(time.time()) + 86400 * 7)  # 7天有效期
-        )
-
-        # 从用户鱼竿库存中移除
-        self.db.execute_query(
-            "DELETE FROM user_rod_instances WHERE user_id = ? AND id = ?",
-            (user_id, rod_id)
-        )
-
-        return True
+        return self._list_item(user_id, 'rod', rod_id, price)
 
     def list_accessory(self, user_id: str, accessory_id: int, price: int) -> bool:
         """上架饰品到市场"""
-        # 检查饰品是否存在且属于用户
-        accessory_instance = self.db.fetch_one(
-            "SELECT * FROM user_accessory_instances WHERE user_id = ? AND id = ?",
-            (user_id, accessory_id)
-        )
-        if not accessory_instance:
-            return False
-
-        # 检查是否是装备中的饰品
-        if accessory_instance['is_equipped']:
-            return False
-
-        # 添加到市场
-        self.db.execute_query(
-            """INSERT INTO market_listings
-               (seller_user_id, item_type, item_id, price, created_at, expires_at)
-               VALUES (?, 'accessory', ?, ?, ?, ?)""",
-            (user_id, accessory_id, price, int(time.time()), int(time.time()) + 86400 * 7)  # 7天有效期
-        )
-
-        # 从用户饰品库存中移除
-        self.db.execute_query(
-            "DELETE FROM user_accessory_instances WHERE user_id = ? AND id = ?",
-            (user_id, accessory_id)
-        )
-
-        return True
+        return self._list_item(user_id, 'accessory', accessory_id, price)
 
     def list_bait(self, user_id: str, bait_id: int, price: int) -> bool:
         """上架鱼饵到市场"""
-        # 检查鱼饵是否存在且属于用户
-        bait_inventory = self.db.fetch_one(
-            "SELECT * FROM user_bait_inventory WHERE user_id = ? AND id = ? AND quantity > 0",
-            (user_id, bait_id)
-        )
-        if not bait_inventory:
-            return False
-
-        # 添加到市场
-        self.db.execute_query(
-            """INSERT INTO market_listings
-               (seller_user_id, item_type, item_id, price, created_at, expires_at)
-               VALUES (?, 'bait', ?, ?, ?, ?)""",
-            (user_id, bait_id, price, int(time.time()), int(time.time()) + 86400 * 7)  # 7天有效期
-        )
-
-        # 从用户鱼饵库存中移除
-        self.db.execute_query(
-            "DELETE FROM user_bait_inventory WHERE user_id = ? AND id = ?",
-            (user_id, bait_id)
-        )
+        return self._list_item(user_id, 'bait', bait_id, price)
 
-        return True
+    def _list_item(self, user_id: str, item_type: str, item_id: int, price: int) -> bool:
+        """上架物品，成功后递增市场版本号"""
+        success = self.market_dao.list_item(user_id, item_type, item_id, price)
+        if success:
+            self.bump_market_version()
+        return success
+
+    def sweep_expired_listings(self, batch_size: int = Constants.MARKET_SWEEP_BATCH_SIZE,
+                               max_batches: int = Constants.MARKET_SWEEP_MAX_BATCHES) -> int:
+        """清理过期上架并退回物品，每轮最多处理 batch_size * max_batches 条"""
+        now = int(time.time())
+        swept = 0
+        with metrics.timer("market.sweep.duration"):
+            for _ in range(max_batches):
+                count = self.market_dao.sweep_expired_batch(now, batch_size)
+                swept += count
+                if count < batch_size:
+                    break
+
+        metrics.incr("market.sweep.runs")
+        metrics.incr("market.sweep.listings", swept)
+        if swept:
+            logger.info(f"市场过期清理完成，退回 {swept} 件商品")
+        return swept
+
+    def _expiry_sweep_loop(self):
+        """过期上架清理循环"""
+        while True:
+            try:
+                self.sweep_expired_listings()
+            except Exception as e:
+                metrics.incr("market.sweep.errors")
+                logger.error(f"市场过期清理出错: {e}")
+            time.sleep(Constants.MARKET_SWEEP_INTERVAL)
 
     def buy_item(self, user_id: str, item_id: int) -> bool:
         """购买商品"""
-        # 获取商品信息
-        market_item = self.db.fetch_one(
-            """SELECT ml.*, u.gold as seller_gold FROM market_listings ml
-               JOIN users u ON ml.seller_user_id = u.user_id
-               WHERE ml.id = ? AND ml.expires_at > ?""",
-            (item_id, int(time.time()))
-        )
-        if not market_item:
+        listing = self.market_dao.buy_listing(user_id, item_id, int(time.time()))
+        if not listing:
+            metrics.incr("market.buy.failed")
             return False
 
-        # 检查买家金币是否足够
-        buyer = self.get_user(user_id)
-        if not buyer or buyer.gold < market_item['price']:
-            return False
-
-        # 扣除买家金币
-        self.db.execute_query(
-            "UPDATE users SET gold = gold - ? WHERE user_id = ?",
-            (market_item['price'], user_id)
-        )
-
-        # 添加卖家金币
-        self.db.execute_query(
-            "UPDATE users SET gold = gold + ? WHERE user_id = ?",
-            (market_item['price'], market_item['seller_user_id'])
-        )
-
-        # 根据商品类型处理转移
-        item_type = market_item['item_type']
-        original_item_id = market_item['item_id']
-
-        if item_type == "fish":
-            # 购买鱼类
-            fish_inventory = self.db.fetch_one(
-                "SELECT * FROM user_fish_inventory WHERE id = ?",
-                (original_item_id,)
-            )
-            if fish_inventory:
-                # 转移到买家库存
-                self.db.execute_query(
-                    """INSERT INTO user_fish_inventory
-                       (user_id, fish_template_id, weight, value, caught_at)
-                       VALUES (?, ?, ?, ?, ?)""",
-                    (user_id, fish_inventory['fish_template_id'], fish_inventory['weight'], fish_inventory['value'], fish_inventory['caught_at'])
-                )
-
-                # 从原库存删除
-                self.db.execute_query(
-                    "DELETE FROM user_fish_inventory WHERE id = ?",
-                    (original_item_id,)
-                )
-        elif item_type == "rod":
-            # 购买鱼竿
-            rod_instance = self.db.fetch_one(
-                "SELECT * FROM user_rod_instances WHERE id = ?",
-                (original_item_id,)
-            )
-            if rod_instance:
-                # 转移到买家库存
-                self.db.execute_query(
-                    """INSERT INTO user_rod_instances
-                       (user_id, rod_template_id, level, exp, is_equipped, acquired_at, durability)
-                       VALUES (?, ?, ?, ?, FALSE, ?, ?)""",
-                    (user_id, rod_instance['rod_template_id'], rod_instance['level'], rod_instance['exp'], rod_instance['acquired_at'], rod_instance['durability'])
-                )
-
-                # 从原库存删除
-                self.db.execute_query(
-                    "DELETE FROM user_rod_instances WHERE id = ?",
-                    (original_item_id,)
-                )
-        elif item_type == "accessory":
-            # 购买饰品
-            accessory_instance = self.db.fetch_one(
-                "SELECT * FROM user_accessory_instances WHERE id = ?",
-                (original_item_id,)
-            )
-            if accessory_instance:
-                # 转移到买家库存
-                self.db.execute_query(
-                    """INSERT INTO user_accessory_instances
-                       (user_id, accessory_template_id, is_equipped, acquired_at)
-                       VALUES (?, ?, FALSE, ?)""",
-                    (user_id, accessory_instance['accessory_template_id'], accessory_instance['acquired_at'])
-                )
-
-                # 从原库存删除
-                self.db.execute_query(
-                    "DELETE FROM user_accessory_instances WHERE id = ?",
-                    (original_item_id,)
-                )
-        elif item_type == "bait":
-            # 购买鱼饵
-            bait_inventory = self.db.fetch_one(
-                "SELECT * FROM user_bait_inventory WHERE id = ?",
-                (original_item_id,)
-            )
-            if bait_inventory:
-                # 检查买家是否已有该鱼饵
-                existing_bait = self.db.fetch_one(
-                    "SELECT id, quantity FROM user_bait_inventory WHERE user_id = ? AND bait_template_id = ?",
-                    (user_id, bait_inventory['bait_template_id'])
-                )
-                if existing_bait:
-                    # 增加数量
-                    self.db.execute_query(
-                        "UPDATE user_bait_inventory SET quantity = quantity + ? WHERE id = ?",
-                        (bait_inventory['quantity'], existing_bait['id'])
-                    )
-                else:
-                    # 添加新的鱼饵库存
-                    self.db.execute_query(
-                        """INSERT INTO user_bait_inventory
-                           (user_id, bait_template_id, quantity)
-                           VALUES (?, ?, ?)""",
-                        (user_id, bait_inventory['bait_template_id'], bait_inventory['quantity'])
-                    )
-
-                # 从原库存删除
-                self.db.execute_query(
-                    "DELETE FROM user_bait_inventory WHERE id = ?",
-                    (original_item_id,)
-                )
-
-        # 删除市场商品
-        self.db.execute_query(
-            "DELETE FROM market_listings WHERE id = ?",
-            (item_id,)
-        )
-
+        self.bump_market_version()
+        metrics.incr("market.buy.success")
         return True
 
+    def get_price_history(self, item_type: str, template_id: int,
+                          days: int = Constants.MARKET_PRICE_HISTORY_DAYS) -> dict:
+        """获取物品最近若干天的每日行情及区间汇总"""
+        since_day = time.strftime('%Y-%m-%d', time.localtime(time.time() - (days - 1) * 86400))
+        rollups = self.market_dao.get_price_rollups(item_type, template_id, since_day)
+
+        history = []
+        for rollup in rollups:
+            history.append(dict(rollup, avg_price=rollup['total_price'] / rollup['trade_count']))
+
+        summary = None
+        if history:
+            trade_count = sum(day['trade_count'] for day in history)
+            latest = max(history, key=lambda day: day['last_traded_at'])
+            summary = {
+                'trade_count': trade_count,
+                'min_price': min(day['min_price'] for day in history),
+                'max_price': max(day['max_price'] for day in history),
+                'avg_price': sum(day['total_price'] for day in history) / trade_count,
+                'last_price': latest['last_price'],
+                'last_traded_at': latest['last_traded_at'],
+            }
+
+        return {'days': history, 'summary': summary}
+
     def get_user(self, user_id: str) -> Optional[User]:
         """获取用户信息"""
         result = self.db.fetch_one(
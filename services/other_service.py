@@ -1,32 +1,65 @@
 from typing import List, Optional
 from astrbot.api.event import AstrMessageEvent
+from ..dao.command_context import CommandContext
 from ..dao.fishing_dao import FishingDAO
 from ..dao.user_dao import UserDAO
 from ..models.user import User
 from ..models.fishing import FishTemplate
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..dao.other_dao import OtherDAO
-from .fishing_service import FishingService
-from .achievement_service import AchievementService
-from .technology_service import TechnologyService
+from ..enums.constants import Constants
 from ..enums.messages import Messages
 import time
 import threading
 from datetime import datetime
 
+# 排行榜名称与排行榜的对应关系
+LEADERBOARD_BOARDS = {'综合': 'comprehensive', '重量': 'weight', '稀有': 'rare', '等级': 'level'}
+
+# 各排行榜图片的标题
+LEADERBOARD_TITLES = {
+    'comprehensive': "钓鱼排行榜",
+    'weight': "渔获重量排行榜",
+    'rare': "稀有鱼排行榜",
+    'level': "等级排行榜",
+}
+
+
+def _leaderboard_highlight(board: str, row) -> Optional[str]:
+    """排行榜上代替金币显示的排行数据，综合榜仍显示金币"""
+    if board == 'weight':
+        return f"重量: {row['total_fish_weight'] or 0:.1f}kg"
+    if board == 'rare':
+        return f"稀有鱼: {row['rare_fish_count'] or 0}条"
+    if board == 'level':
+        return f"等级: Lv.{row['level'] or 1}"
+    return None
+
+
 class OtherService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "other_service", db_manager, services)
         self.user_dao = UserDAO(db_manager)
         self.fishing_dao = FishingDAO(db_manager)
         self.other_dao = OtherDAO(db_manager)
-        self.fishing_service = FishingService(db_manager)
-        self.achievement_service = AchievementService(db_manager)
-        self.technology_service = TechnologyService(db_manager)
         # 启动自动钓鱼检查线程
         self.auto_fishing_thread = threading.Thread(target=self._auto_fishing_loop, daemon=True)
         self.auto_fishing_thread.start()
 
+    @property
+    def fishing_service(self):
+        return self.services.fishing_service
+
+    @property
+    def achievement_service(self):
+        return self.services.achievement_service
+
+    @property
+    def technology_service(self):
+        return self.services.technology_service
+
     async def auto_fishing_command(self, event: AstrMessageEvent):
         """自动钓鱼命令"""
         user_id = event.get_sender_id()
@@ -63,31 +96,18 @@ class OtherService:
                 auto_fishing_users = self.fishing_dao.get_auto_fishing_users()
 
                 for user_data in auto_fishing_users:
-                    # 创建 User 对象
-                    user = User(
-                        user_id=user_data['user_id'],
-                        platform=user_data['platform'],
-                        nickname=user_data['nickname'],
-                        gold=user_data['gold'],
-                        exp=user_data['exp'],
-                        level=user_data['level'],
-                        fishing_count=user_data['fishing_count'],
-                        total_fish_weight=user_data['total_fish_weight'],
-                        total_income=user_data['total_income'],
-                        last_fishing_time=user_data['last_fishing_time'],
-                        auto_fishing=user_data['auto_fishing'],
-                        created_at=user_data['created_at'],
-                        updated_at=user_data['updated_at']
-                    )
+                    # 每个用户一次钓鱼共用一个命令上下文，结束后一次性写回
+                    ctx = CommandContext(self.db)
+                    user = ctx.get_user(user_data['user_id'])
+                    if not user:
+                        continue
 
                     # 检查是否可以钓鱼
-                    can_fish, _ = self.fishing_service.can_fish(user)
+                    can_fish, _ = self.fishing_service.can_fish(user, ctx)
                     if can_fish:
                         # 执行钓鱼
-                        result = self.fishing_service.fish(user)
-
-                        # 更新用户数据
-                        self.user_dao.update_user(user)
+                        result = self.fishing_service.fish(user, ctx)
+                        ctx.flush()
 
                 # 每15秒检查一次
                 time.sleep(10)
@@ -95,46 +115,56 @@ class OtherService:
                 print(f"自动钓鱼循环出错: {e}")
                 time.sleep(10)
 
-    async def leaderboard_command(self, event: AstrMessageEvent):
-        """排行榜命令"""
-        from ..draw.rank import draw_fishing_ranking
-        import os
+    async def leaderboard_command(self, event: AstrMessageEvent, board_name: str = ""):
+        """排行榜命令，可选排行榜类型：综合（默认）、重量、稀有、等级"""
+        board = LEADERBOARD_BOARDS.get(board_name or '综合')
+        if board is None:
+            yield event.plain_result(Messages.LEADERBOARD_UNKNOWN_BOARD.value.format(
+                board_name=board_name, boards="、".join(LEADERBOARD_BOARDS)))
+            return
 
-        # 获取当前群聊ID
+        # 获取当前群聊ID，按群排行；私聊时为全服排行
         group_id = event.get_group_id()
+        leaderboard = self.services.rank_service.get_leaderboard(board, group_id, Constants.LEADERBOARD_SIZE)
 
-        # 获取综合排行榜 (前10名) - 综合考虑金币、钓鱼次数和总收益
-        # 根据群聊ID进行排行
-        comprehensive_leaderboard = self.other_dao.get_comprehensive_leaderboard(group_id, 10)
-
-        if not comprehensive_leaderboard:
+        if not leaderboard:
             yield event.plain_result(Messages.LEADERBOARD_NO_DATA.value)
             return
 
-        # 转换为绘图函数需要的格式
+        # 上榜用户的头像在后台预先获取，之后查看状态时不用等待下载
+        self.services.avatar_service.prefetch(user['user_id'] for user in leaderboard)
+
+        # 转换为绘图函数需要的格式（只含基本类型，可以发送到渲染进程）
         user_data = []
-        for user in comprehensive_leaderboard:
+        for user in leaderboard:
             user_data.append({
                 "nickname": user['nickname'] or "未知用户",
                 "title": user['title_name'] or "无称号",
                 "coins": user['gold'] or 0,
                 "fish_count": user['fishing_count'] or 0,
                 "fishing_rod": user['rod_name'] or "无鱼竿",
-                "accessory": user['accessory_name'] or "无饰品"
+                "accessory": user['accessory_name'] or "无饰品",
+                "highlight": _leaderboard_highlight(board, user)
             })
+        ranking = {
+            "title": f"{LEADERBOARD_TITLES[board]} TOP{Constants.LEADERBOARD_SIZE}",
+            "users": user_data,
+        }
 
         # 生成排行榜图片
-        output_path = "data/plugins/astrbot_plugin_gaismanor/cache/fishing_ranking.png"
-        # 确保缓存目录存在
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
         try:
-            draw_fishing_ranking(user_data, output_path)
-            if os.path.exists(output_path):
-                yield event.image_result(output_path)
-            else:
-                yield event.plain_result(Messages.LEADERBOARD_GENERATION_FAILED.value)
+            render_service = self.services.render_service
+            image_data = render_service.render(render_service.request('ranking', ranking, event))
+            yield render_service.image_result(event, image_data)
         except Exception as e:
             yield event.plain_result(f"{Messages.LEADERBOARD_IMAGE_ERROR.value}: {str(e)}")
+            return
+
+        # 附上发送者自己在这个排行榜上的名次和前后的用户
+        rank_service = self.services.rank_service
+        rank_info = rank_service.get_rank(event.get_sender_id(), board, group_id)
+        if rank_info:
+            yield event.plain_result(rank_service.describe_rank(rank_info))
 
     async def fish_gallery_command(self, event: AstrMessageEvent):
         """鱼类图鉴命令"""
@@ -303,11 +333,18 @@ class OtherService:
 
         yield event.plain_result(title_info)
 
+    def _state_rank(self, user_id: str, group_id: Optional[str]) -> dict:
+        """状态图片上显示的综合排行名次：本群（私聊或不是本群用户时为空）和全服"""
+        rank_service = self.services.rank_service
+        group_rank = rank_service.get_rank(user_id, group_id=group_id, neighbors=0) if group_id else None
+        global_rank = rank_service.get_rank(user_id, neighbors=0)
+        return {
+            'group': group_rank.rank if group_rank else None,
+            'global': global_rank.rank if global_rank else None,
+        }
+
     async def state_command(self, event: AstrMessageEvent):
         """状态命令 - 以图片形式展示用户状态"""
-        from ..draw.state import draw_state_image
-        import os
-
         user_id = event.get_sender_id()
 
         # 检查用户是否已注册
@@ -356,36 +393,32 @@ class OtherService:
 
         user_data = {
             'user_id': user_id,
+            # 头像最多等待 Constants.AVATAR_RENDER_BUDGET 秒，超时不带头像绘制
+            'avatar': self.services.avatar_service.get_avatar(user_id),
             'nickname': user.nickname or "未知用户",
             'coins': user.gold,
             'current_rod': current_rod_dict,
             'current_accessory': current_accessory_dict,
-            'current_bait': current_bait,
+            'current_bait': dict(current_bait) if current_bait else None,
             'auto_fishing_enabled': user.auto_fishing,
             'steal_cooldown_remaining': 0,  # 简化处理
             'fishing_zone': fishing_zone or {'name': '新手池', 'daily_rare_fish_quota': 0, 'rare_fish_caught_today': 0},
-            'current_title': current_title,
+            'current_title': dict(current_title) if current_title else None,
             'total_fishing_count': user.fishing_count,
             'steal_total_value': 0,  # 简化处理
             'signed_in_today': True,  # 简化处理
             'wipe_bomb_remaining': max(0, wipe_bomb_remaining),
-            'pond_info': pond_info or {'total_count': 0, 'total_value': 0}
+            'pond_info': dict(pond_info) if pond_info else {'total_count': 0, 'total_value': 0},
+            'rank': self._state_rank(user_id, event.get_group_id()),
+            # 生成时间精确到分钟并作为渲染缓存键的一部分，缓存命中时不会显示过期的时间
+            'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M')
         }
 
         # 生成状态图片
-        # 清理用户ID中的特殊字符，只保留字母、数字和下划线
-        import re
-        safe_user_id = re.sub(r'[^a-zA-Z0-9_]', '_', user_id)
-        output_path = f"data/plugins/astrbot_plugin_gaismanor/cache/user_state_{safe_user_id}.png"
-        # 确保缓存目录存在
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
         try:
-            image = draw_state_image(user_data)
-            image.save(output_path)
-            if os.path.exists(output_path):
-                yield event.image_result(output_path)
-            else:
-                yield event.plain_result(Messages.STATE_IMAGE_GENERATION_FAILED.value)
+            render_service = self.services.render_service
+            image_data = render_service.render(render_service.request('state', user_data, event))
+            yield render_service.image_result(event, image_data)
         except Exception as e:
             yield event.plain_result(f"{Messages.STATE_IMAGE_ERROR.value}: {str(e)}")
 
@@ -0,0 +1,309 @@
+"""
+排名服务：排行榜、用户名次和前后的用户
+
+启动后在内存中为每个排行榜（全服和每个群）维护按分数排好序的用户列表，
+用户数据修改时增量更新，查询不访问数据库；内存排行加载完成之前使用带索引的 SQL 查询
+"""
+import threading
+import time
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from astrbot.api import logger
+from ..dao.other_dao import OtherDAO
+from ..enums.constants import Constants
+from ..enums.messages import Messages
+from ..models.database import DatabaseManager, leaderboard_score
+from ..models.user import RankEntry, RankInfo
+from ..utils.metrics import metrics
+from ..utils.ranking import RankedList
+from .container import ServiceContainer
+
+# 各排行榜分数的显示格式
+RANK_SCORE_FORMATS = {
+    'comprehensive': "{:,} 分",
+    'weight': "{:,.1f}kg",
+    'rare': "{:,} 条",
+    'level': "{:,} 级",
+}
+
+
+def format_score(board: str, score) -> str:
+    """按排行榜格式化分数（或分差）"""
+    return RANK_SCORE_FORMATS[board].format(score or 0)
+
+
+class _RankRow(NamedTuple):
+    """内存排行中保存的用户数据"""
+    nickname: str
+    gold: int
+    fishing_count: int
+    total_income: int
+    total_fish_weight: float
+    rare_fish_count: int
+    level: int
+    groups: FrozenSet[str]  # 所在的群（user_groups）
+
+
+# 各排行榜由用户数据计算分数的方式，与 LEADERBOARD_COLUMNS 中的列一一对应
+BOARD_SCORES = {
+    'comprehensive': lambda row: leaderboard_score(row.gold, row.fishing_count, row.total_income),
+    'weight': lambda row: row.total_fish_weight or 0,
+    'rare': lambda row: row.rare_fish_count or 0,
+    'level': lambda row: row.level or 0,
+}
+
+GLOBAL_SCOPE = ""  # 全服排行在 _boards 中的群ID
+
+
+def _scopes(row: Optional[_RankRow]) -> Tuple[str, ...]:
+    """用户所在的排行范围：全服，以及所在的各个群"""
+    if row is None:
+        return ()
+    return (GLOBAL_SCOPE, *sorted(row.groups))
+
+
+class RankService:
+    """
+    排名服务
+
+    内存排行以 (排行榜, 群ID) 为键保存 RankedList，更新、查名次、取前 k 名都只涉及列表中的一小块。
+    数据来源：
+    - 启动时从数据库全量加载，之后每隔 Constants.RANK_RECONCILE_INTERVAL 秒全量对账一次，
+      修正 WebUI 等未经通知的修改；
+    - DatabaseManager.notify_user_changed 带着新值时直接更新内存；只知道有修改（如金币增减）时记为待刷新，
+      下次查询前批量从数据库读取这些用户
+    """
+
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
+        self.db = db_manager
+        self.services = ServiceContainer.attach(self, "rank_service", db_manager, services)
+        self.other_dao = OtherDAO(db_manager)
+
+        self._lock = threading.Lock()
+        self._rows: Dict[str, _RankRow] = {}
+        self._boards: Dict[Tuple[str, str], RankedList] = {}
+        self._dirty: Set[str] = set()
+        self._ready = False
+        self._rebuilding = False
+
+        db_manager.user_listeners.append(self._on_user_changed)
+        # 启动时加载内存排行，之后定期对账
+        self.reconcile_thread = threading.Thread(target=self._reconcile_loop, daemon=True)
+        self.reconcile_thread.start()
+
+    # ==================内存排行维护==================
+    def _on_user_changed(self, user_id: str, values: Optional[dict]) -> None:
+        """用户行修改的通知：带着新值时直接更新，否则记为待刷新"""
+        with self._lock:
+            if not self._ready or self._rebuilding or values is None:
+                self._dirty.add(user_id)
+                return
+
+            row = self._rows.get(user_id)
+            if row is None:
+                # 新用户：所在的群要从 user_groups 读取
+                self._dirty.add(user_id)
+                return
+            fields = {name: values[name] for name in _RankRow._fields if name in values}
+            if fields:
+                self._apply(user_id, row._replace(**fields))
+
+    def _apply(self, user_id: str, new_row: Optional[_RankRow]) -> None:
+        """把用户的新数据（None 表示用户已删除）更新到各排行榜（调用方持有锁）"""
+        old_row = self._rows.get(user_id)
+        if old_row == new_row:
+            return
+
+        old_scopes, new_scopes = _scopes(old_row), _scopes(new_row)
+        for board, score_of in BOARD_SCORES.items():
+            old_key = RankedList.make_key(user_id, score_of(old_row)) if old_row else None
+            new_key = RankedList.make_key(user_id, score_of(new_row)) if new_row else None
+            if old_key == new_key and old_scopes == new_scopes:
+                continue
+
+            for scope in old_scopes:
+                ranked = self._boards.get((board, scope))
+                if ranked is not None:
+                    ranked.remove(old_key)
+                    if scope != GLOBAL_SCOPE and not ranked:
+                        del self._boards[(board, scope)]
+            for scope in new_scopes:
+                self._boards.setdefault((board, scope), RankedList()).add(new_key)
+
+        if new_row:
+            self._rows[user_id] = new_row
+        else:
+            self._rows.pop(user_id, None)
+
+    def _load_rows(self, user_ids: Optional[List[str]] = None) -> Dict[str, _RankRow]:
+        """从数据库读取用户数据和所在的群，不传 user_ids 时读取所有用户"""
+        groups: Dict[str, Set[str]] = {}
+        for row in self.other_dao.get_rank_groups(user_ids):
+            groups.setdefault(row['user_id'], set()).add(row['group_id'])
+        return {
+            row['user_id']: _RankRow(row['nickname'] or "", row['gold'] or 0, row['fishing_count'] or 0,
+                                     row['total_income'] or 0, row['total_fish_weight'] or 0,
+                                     row['rare_fish_count'] or 0, row['level'] or 0,
+                                     frozenset(groups.get(row['user_id'], ())))
+            for row in self.other_dao.get_rank_rows(user_ids)
+        }
+
+    def rebuild(self) -> int:
+        """
+        从数据库全量重建内存排行，返回与重建前不一致的用户数
+
+        重建期间的修改通知都记为待刷新，重建完成后在下次查询时补上
+        """
+        with self._lock:
+            self._rebuilding = True
+            self._dirty.clear()
+
+        try:
+            with metrics.timer("rank.rebuild"):
+                rows = self._load_rows()
+                keys: Dict[Tuple[str, str], list] = {}
+                for board, score_of in BOARD_SCORES.items():
+                    for user_id, row in rows.items():
+                        key = RankedList.make_key(user_id, score_of(row))
+                        for scope in _scopes(row):
+                            keys.setdefault((board, scope), []).append(key)
+                boards = {scope: RankedList(scope_keys) for scope, scope_keys in keys.items()}
+        except Exception:
+            with self._lock:
+                self._rebuilding = False
+            raise
+
+        with self._lock:
+            previous, was_ready = self._rows, self._ready
+            self._rows, self._boards = rows, boards
+            self._ready, self._rebuilding = True, False
+
+        drift = 0
+        if was_ready:
+            drift = sum(1 for user_id, row in rows.items() if previous.get(user_id) != row)
+            drift += sum(1 for user_id in previous if user_id not in rows)
+        metrics.incr("rank.rebuilds")
+        metrics.incr("rank.reconcile.drift", drift)
+        return drift
+
+    def _reconcile_loop(self):
+        """启动时加载内存排行，之后定期全量对账"""
+        while True:
+            try:
+                drift = self.rebuild()
+                if drift:
+                    logger.info(f"内存排行对账完成，修正 {drift} 个用户")
+            except Exception as e:
+                metrics.incr("rank.rebuild.errors")
+                logger.error(f"加载内存排行出错: {e}")
+            time.sleep(Constants.RANK_RECONCILE_INTERVAL)
+
+    def _sync(self) -> bool:
+        """查询前刷新待刷新的用户，返回内存排行是否可用"""
+        with self._lock:
+            if not self._ready:
+                return False
+            if self._rebuilding or not self._dirty:
+                return True
+            user_ids = list(self._dirty)
+            self._dirty.clear()
+
+        for start in range(0, len(user_ids), Constants.RANK_SYNC_BATCH_SIZE):
+            batch = user_ids[start:start + Constants.RANK_SYNC_BATCH_SIZE]
+            rows = self._load_rows(batch)
+            with self._lock:
+                for user_id in batch:
+                    self._apply(user_id, rows.get(user_id))
+        metrics.incr("rank.sync.users", len(user_ids))
+        return True
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """等待内存排行首次加载完成（脚本和基准使用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._ready:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    # ==================查询==================
+    def _entry(self, key) -> RankEntry:
+        """把 RankedList 的条目转换为 RankEntry（调用方持有锁）"""
+        row = self._rows.get(key[1])
+        return RankEntry(key[1], (row.nickname if row else "") or "未知用户", -key[0] or 0)
+
+    def top(self, board: str = 'comprehensive', group_id: Optional[str] = None,
+            limit: int = Constants.LEADERBOARD_SIZE) -> List[RankEntry]:
+        """排行榜前 limit 名，group_id 为空时为全服排行"""
+        if self._sync():
+            with self._lock:
+                ranked = self._boards.get((board, group_id or GLOBAL_SCOPE))
+                return [self._entry(key) for key in ranked.top(limit)] if ranked else []
+
+        return [RankEntry(row['user_id'], row['nickname'] or "未知用户", row['score'])
+                for row in self.other_dao.get_leaderboard(board, group_id, limit)]
+
+    def get_leaderboard(self, board: str, group_id: Optional[str],
+                        limit: int = Constants.LEADERBOARD_SIZE) -> List[dict]:
+        """排行榜前 limit 名的展示信息（装备、称号），名次取自内存排行"""
+        if self._sync():
+            user_ids = [entry.user_id for entry in self.top(board, group_id, limit)]
+            return self.other_dao.get_leaderboard_users(board, user_ids)
+        return self.other_dao.get_leaderboard(board, group_id, limit)
+
+    def get_rank(self, user_id: str, board: str = 'comprehensive', group_id: Optional[str] = None,
+                 neighbors: int = 1) -> Optional[RankInfo]:
+        """
+        获取用户在排行榜上的名次，group_id 为空时为全服排行
+
+        用户不存在，或指定的群不是用户所在的群时返回 None
+        """
+        with metrics.timer("rank.lookup"):
+            if not self._sync():
+                return self.get_rank_from_db(user_id, board, group_id, neighbors)
+
+            with self._lock:
+                row = self._rows.get(user_id)
+                if row is None or (group_id and group_id not in row.groups):
+                    return None
+                ranked = self._boards[(board, group_id or GLOBAL_SCOPE)]
+                score = BOARD_SCORES[board](row)
+                above, below = ranked.neighbors(score, neighbors) if neighbors else ([], [])
+                return RankInfo(board=board, group_id=group_id or "", rank=ranked.rank(score), total=len(ranked),
+                                score=score, above=[self._entry(key) for key in above],
+                                below=[self._entry(key) for key in below])
+
+    def get_rank_from_db(self, user_id: str, board: str = 'comprehensive', group_id: Optional[str] = None,
+                         neighbors: int = 1) -> Optional[RankInfo]:
+        """
+        用带索引的 SQL 查询名次（内存排行加载完成之前使用）
+
+        名次 = 分数更高的人数 + 1，只扫描排行索引中排在前面的部分；前后的用户按分数在索引上各取 neighbors 个
+        """
+        row = self.other_dao.get_user_rank(board, user_id, group_id or None)
+        if not row:
+            return None
+
+        above, below = [], []
+        if neighbors:
+            for neighbor in self.other_dao.get_rank_neighbors(board, row['score'], group_id or None, neighbors):
+                entry = RankEntry(neighbor['user_id'], neighbor['nickname'] or "未知用户", neighbor['score'])
+                (above if neighbor['above'] else below).append(entry)
+        return RankInfo(board=board, group_id=group_id or "", rank=row['rank'], total=row['total'],
+                        score=row['score'], above=above, below=below)
+
+    def describe_rank(self, info: RankInfo) -> str:
+        """名次的文字说明：名次、与上一名的差距、领先下一名的差距"""
+        lines = [Messages.RANK_SELF.value.format(rank=info.rank, total=info.total,
+                                                  score=format_score(info.board, info.score))]
+        if info.above:
+            above = info.above[-1]
+            lines.append(Messages.RANK_ABOVE.value.format(
+                nickname=above.nickname, gap=format_score(info.board, above.score - info.score)))
+        else:
+            lines.append(Messages.RANK_FIRST.value)
+        if info.below:
+            below = info.below[0]
+            lines.append(Messages.RANK_BELOW.value.format(
+                nickname=below.nickname, gap=format_score(info.board, info.score - below.score)))
+        return "\n".join(lines)
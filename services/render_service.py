@@ -0,0 +1,272 @@
+"""
+图片渲染服务：在进程池中绘制图片，直接返回编码后的图片字节
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from astrbot.api import logger
+from ..enums.constants import Constants
+from ..models.database import DatabaseManager
+from ..utils.metrics import metrics
+from ..utils.render_cache import RenderCache, directory_fingerprint
+from .container import ServiceContainer
+
+# 绘图资源目录，资源文件变化时渲染缓存失效
+DRAW_RESOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "draw", "resource")
+
+# 内容固定的图片，插件启动时在后台预先渲染
+STATIC_RENDER_REQUESTS = (('help', None),)
+
+# 可以单独配置编码方案的图片类型
+RENDER_KINDS = ('state', 'ranking', 'help')
+
+# 支持的输出格式：格式名 → Pillow 编码器名称
+IMAGE_FORMATS = {
+    'png': 'PNG',
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+
+
+class EncodingProfile(NamedTuple):
+    """
+    图片编码方案
+
+    image_format: 输出格式（png / webp / jpeg）
+    quality: webp / jpeg 的编码质量
+    colors: 大于 0 时先量化为该颜色数的调色板图片（仅 png）
+    optimize: png / jpeg 使用更慢但更小的编码，webp 使用最慢的压缩方法
+    max_width / max_height: 大于 0 时按比例缩小到不超过该尺寸
+    """
+    image_format: str = 'png'
+    quality: int = 90
+    colors: int = 0
+    optimize: bool = False
+    max_width: int = 0
+    max_height: int = 0
+
+
+# 可选的编码方案，在插件配置中按名称选择
+ENCODING_PROFILES: Dict[str, EncodingProfile] = {
+    'png': EncodingProfile('png'),  # 无损，编码最快，体积最大
+    'png_optimized': EncodingProfile('png', optimize=True),  # 无损，编码较慢
+    'png_palette': EncodingProfile('png', colors=256, optimize=True),  # 256 色调色板，适合色块为主的图片
+    'webp': EncodingProfile('webp', quality=85),  # 有损，体积小，部分平台不支持
+    'jpeg': EncodingProfile('jpeg', quality=85, optimize=True),  # 有损，兼容性最好
+    'compact': EncodingProfile('webp', quality=75, max_width=640, max_height=1600),  # 缩小尺寸后有损压缩，体积最小
+}
+
+
+class RenderRequest(NamedTuple):
+    """
+    渲染请求，只包含可序列化的数据，可以直接发送到渲染进程
+
+    kind: 图片类型（state / ranking / help）
+    data: 绘图函数需要的数据（字典、列表等基本类型）
+    profile: 编码方案
+    """
+    kind: str
+    data: Any = None
+    profile: EncodingProfile = ENCODING_PROFILES[Constants.RENDER_ENCODING_PROFILE]
+
+
+def _draw(kind: str, data: Any):
+    """按类型调用对应的绘图函数，返回 PIL 图像"""
+    if kind == 'state':
+        from ..draw.state import draw_state_image
+        return draw_state_image(data)
+    if kind == 'ranking':
+        from ..draw.rank import draw_fishing_ranking
+        return draw_fishing_ranking(data['users'], title=data['title'])
+    if kind == 'help':
+        from ..draw.help import draw_help_image
+        return draw_help_image()
+    raise ValueError(f"未知的图片类型: {kind}")
+
+
+def encode_image(image, profile: EncodingProfile) -> bytes:
+    """按编码方案把 PIL 图像编码为字节"""
+    from PIL import Image
+
+    encoder = IMAGE_FORMATS.get(profile.image_format)
+    if encoder is None:
+        raise ValueError(f"不支持的图片格式: {profile.image_format}")
+
+    max_size = (profile.max_width or image.width, profile.max_height or image.height)
+    if image.width > max_size[0] or image.height > max_size[1]:
+        # 绘图结果可能是共享的底图，在副本上缩小
+        image = image.copy()
+        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+    if encoder == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    buffer = io.BytesIO()
+    if encoder == 'PNG':
+        if profile.colors:
+            image = image.quantize(profile.colors, method=Image.Quantize.FASTOCTREE)
+        image.save(buffer, encoder, optimize=profile.optimize)
+    elif encoder == 'WEBP':
+        image.save(buffer, encoder, quality=profile.quality, method=6 if profile.optimize else 4)
+    else:
+        image.save(buffer, encoder, quality=profile.quality, optimize=profile.optimize,
+                   progressive=profile.optimize)
+    return buffer.getvalue()
+
+
+def _init_render_worker(resource_version: str) -> None:
+    """渲染进程启动时设置资源文件版本并预加载字体和图片，第一次渲染不再承担加载开销"""
+    from ..draw import assets
+    assets.set_asset_version(resource_version)
+    assets.warm_up()
+
+
+def render_request(request: RenderRequest, resource_version: str) -> Tuple[bytes, float, float]:
+    """
+    执行一次渲染，返回 (图片字节, 绘制耗时, 编码耗时)
+
+    在渲染进程中运行，也用于进程池不可用时在当前进程中渲染；
+    resource_version 与进程中缓存的资源版本不同时（资源已替换）先清空绘图资源缓存
+    """
+    from ..draw import assets
+    assets.set_asset_version(resource_version)
+    start = time.perf_counter()
+    image = _draw(request.kind, request.data)
+    drawn = time.perf_counter()
+    data = encode_image(image, request.profile)
+    return data, drawn - start, time.perf_counter() - drawn
+
+
+class RenderService:
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
+        self.db = db_manager
+        self.services = ServiceContainer.attach(self, "render_service", db_manager, services)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._use_processes = Constants.RENDER_PROCESS_WORKERS > 0
+        # 编码方案：平台配置优先，其次是图片类型配置，最后是默认方案
+        self._default_profile = Constants.RENDER_ENCODING_PROFILE
+        self._kind_profiles: Dict[str, str] = {}
+        self._platform_profiles: Dict[str, str] = {}
+        self.cache = RenderCache(Constants.RENDER_CACHE_ENTRIES, Constants.RENDER_CACHE_MAX_BYTES,
+                                 Constants.RENDER_CACHE_SPILL_DIR, Constants.RENDER_CACHE_SPILL_MAX_BYTES)
+        # 资源文件版本在启动和配置编码方案时计算，渲染时不再扫描资源目录；替换资源后调用 invalidate_resources
+        self._resource_version = directory_fingerprint(DRAW_RESOURCE_DIR)
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """渲染进程池在首次渲染时创建；使用 spawn 启动，避免在多线程进程中 fork"""
+        with self._pool_lock:
+            if self._pool is None and self._use_processes:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=Constants.RENDER_PROCESS_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_render_worker,
+                    initargs=(self._resource_version,)
+                )
+            return self._pool
+
+    def render(self, request: RenderRequest, timeout: Optional[float] = None) -> bytes:
+        """
+        渲染图片并返回编码后的字节；输入与之前完全相同时直接返回缓存
+
+        缓存键包含绘图代码版本和资源文件版本，修改绘图代码或替换资源（并调用 invalidate_resources）后不会读到旧图片
+        """
+        timeout = timeout or Constants.RENDER_COMMAND_TIMEOUT
+        key = RenderCache.make_key(Constants.RENDER_VERSION, self._resource_version, *request)
+        return self.cache.get_or_render(key, lambda: self._render(request, timeout), timeout)
+
+    def invalidate_resources(self) -> None:
+        """
+        重新计算资源文件版本，替换字体或图片后调用：之后的渲染不会命中旧资源绘制的缓存，
+        渲染进程收到新版本时清空字体、图片和底图缓存
+        """
+        self._resource_version = directory_fingerprint(DRAW_RESOURCE_DIR)
+
+    def _render(self, request: RenderRequest, timeout: float) -> bytes:
+        """实际执行渲染，进程池不可用时退回当前进程渲染"""
+        start = time.perf_counter()
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                data, draw_time, encode_time = pool.submit(render_request, request, self._resource_version).result(timeout)
+            except BrokenProcessPool as e:
+                logger.error(f"渲染进程池不可用，改为在当前进程中渲染: {e}")
+                metrics.incr("render.pool.broken")
+                self.shutdown()
+                self._use_processes = False
+                data, draw_time, encode_time = render_request(request, self._resource_version)
+        else:
+            data, draw_time, encode_time = render_request(request, self._resource_version)
+
+        metrics.observe(f"render.{request.kind}.draw", draw_time)
+        metrics.observe(f"render.{request.kind}.encode", encode_time)
+        metrics.observe(f"render.{request.kind}.total", time.perf_counter() - start)
+        metrics.incr(f"render.{request.kind}.bytes", len(data))
+        return data
+
+    # ==================编码方案==================
+    def configure_profiles(self, config) -> None:
+        """
+        读取插件配置中的编码方案
+
+        image_profile: 默认方案；image_profile_by_output: 按图片类型；image_profile_by_platform: 按平台适配器。
+        未填写的项使用上一级，未知的方案名忽略
+        """
+        def valid(name, where):
+            if name and name not in ENCODING_PROFILES:
+                logger.warning(f"未知的图片编码方案 {name}（{where}），可选: {', '.join(ENCODING_PROFILES)}")
+                return None
+            return name or None
+
+        self._default_profile = valid(config.get("image_profile"), "image_profile") or Constants.RENDER_ENCODING_PROFILE
+        self._kind_profiles = {kind: name for kind, name in (config.get("image_profile_by_output") or {}).items()
+                               if valid(name, kind)}
+        self._platform_profiles = {platform: name
+                                   for platform, name in (config.get("image_profile_by_platform") or {}).items()
+                                   if valid(name, platform)}
+        self.invalidate_resources()
+
+    def profile_for(self, kind: str, platform: Optional[str] = None) -> EncodingProfile:
+        """图片类型和平台对应的编码方案"""
+        name = self._platform_profiles.get(platform) or self._kind_profiles.get(kind) or self._default_profile
+        return ENCODING_PROFILES[name]
+
+    def request(self, kind: str, data: Any = None, event=None) -> RenderRequest:
+        """构造渲染请求，按消息来源的平台选择编码方案"""
+        platform = event.get_platform_name() if event is not None else None
+        return RenderRequest(kind, data, self.profile_for(kind, platform))
+
+    def prerender_static(self) -> threading.Thread:
+        """在后台线程中预先渲染并编码内容固定的图片（帮助图片），第一次请求直接命中缓存"""
+        def run():
+            for kind, data in STATIC_RENDER_REQUESTS:
+                # 每种会用到的编码方案都预先编码一份
+                profiles = {self.profile_for(kind, platform) for platform in (None, *self._platform_profiles)}
+                for profile in profiles:
+                    try:
+                        self.render(RenderRequest(kind, data, profile))
+                    except Exception as e:
+                        logger.error(f"预渲染{kind}图片失败: {e}")
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def image_result(event, data: bytes):
+        """把图片字节包装为消息结果"""
+        from astrbot.api.message_components import Image
+        return event.chain_result([Image.fromBytes(data)])
+
+    def shutdown(self) -> None:
+        """关闭渲染进程池"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
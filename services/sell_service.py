@@ -4,14 +4,16 @@ from ..models.user import User
 from ..models.fishing import FishTemplate
 from ..models.equipment import Rod, Bait
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..dao.sell_dao import SellDAO
 from ..dao.user_dao import UserDAO
 from ..enums.messages import Messages
 import time
 
 class SellService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "sell_service", db_manager, services)
         self.sell_dao = SellDAO(db_manager)
         self.user_dao = UserDAO(db_manager)
 
@@ -5,14 +5,16 @@ from ..models.user import User
 from ..models.equipment import Rod, Accessory, Bait
 from ..models.fishing import FishTemplate, RodTemplate, AccessoryTemplate, BaitTemplate
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..dao.shop_dao import ShopDAO
 from ..dao.user_dao import UserDAO
 from ..enums.messages import Messages
 import time
 
 class ShopService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "shop_service", db_manager, services)
 
     async def shop_command(self, event: AstrMessageEvent):
         """商店主命令"""
@@ -208,8 +210,7 @@ class ShopService:
 
     async def use_accessory_command(self, event: AstrMessageEvent, accessory_id: int):
         """装备饰品命令"""
-        from ..services.equipment_service import EquipmentService
-        equipment_service = EquipmentService(self.db)
+        equipment_service = self.services.equipment_service
 
         user_id = event.get_sender_id()
         user = self.get_user(user_id)
@@ -444,6 +445,7 @@ class ShopService:
             "UPDATE users SET gold = gold - ? WHERE user_id = ?",
             (bait_info['cost'] * quantity, user_id)
         )
+        self.db.notify_user_changed(user_id)
 
         # 减少库存（如果库存不为0）
         if bait_info['stock'] is not None and bait_info['stock'] > 0:
@@ -502,6 +504,7 @@ class ShopService:
             "UPDATE users SET gold = gold - ? WHERE user_id = ?",
             (accessory_info['cost'], user_id)
         )
+        self.db.notify_user_changed(user_id)
 
         # 减少库存（如果库存不为0）
         if accessory_info['stock'] is not None and accessory_info['stock'] > 0:
@@ -565,6 +568,7 @@ class ShopService:
             "UPDATE users SET gold = gold - ? WHERE user_id = ?",
             (rod_info['purchase_cost'], user_id)
         )
+        self.db.notify_user_changed(user_id)
 
         # 减少库存（如果库存不为0）
         if rod_info['stock'] is not None and rod_info['stock'] > 0:
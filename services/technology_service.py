@@ -12,12 +12,14 @@ from ..dao.user_dao import UserDAO
 from ..models.user import User
 from ..models.tech import Technology, UserTechnology
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
 from ..enums.messages import Messages
 
 
 class TechnologyService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
+        self.services = ServiceContainer.attach(self, "technology_service", db_manager, services)
         self.tech_dao = TechnologyDAO(self.db)
         self.user_dao = UserDAO(self.db)
         self.fish_dao = FishingDAO(self.db)
@@ -1,13 +1,15 @@
-from typing import Optional, List, Any, Generator
+from functools import cached_property
+from typing import Dict, Optional, List, Any, Generator, Tuple
+import threading
 import time
 
 from astrbot.core.message.message_event_result import MessageEventResult
 from ..models.user import User
 from ..models.database import DatabaseManager
+from .container import ServiceContainer
+from astrbot.api import logger
 from astrbot.api.event import AstrMessageEvent
-from .achievement_service import AchievementService
-from .technology_service import TechnologyService
-from ..services.equipment_service import EquipmentService
+from ..dao.command_context import CommandContext
 from ..dao.user_dao import UserDAO
 from ..enums.messages import Messages
 from ..enums.constants import Constants
@@ -15,19 +17,42 @@ from ..utils.exp_utils import (
     calculate_level, get_exp_for_level, precompute_level_rewards,
     get_level_up_reward, check_and_unlock_technologies
 )
+from ..utils.metrics import metrics
 from ..utils.sign_in_utils import get_current_date, get_yesterday_date, calculate_sign_in_rewards
 
 
 class UserService:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, services: Optional[ServiceContainer] = None):
         self.db = db_manager
-        self.achievement_service = AchievementService(db_manager)
+        self.services = ServiceContainer.attach(self, "user_service", db_manager, services)
         self.user_dao = UserDAO(db_manager)
-        self.tech_service = TechnologyService(db_manager)
 
         # 缓存数据，避免重复计算/查询
         self._level_rewards = precompute_level_rewards()
-        self._all_technologies = self.tech_service.get_all_technologies()
+
+        # (用户ID, 群ID) → 最近一次写入 user_groups 的时间，用于防抖
+        self._group_touches: Dict[Tuple[str, str], int] = {}
+        self._group_touches_lock = threading.Lock()
+
+        # 待写入 sign_in_logs 的签到记录，由后台线程批量写入
+        self._sign_in_logs: List[tuple] = []
+        self._sign_in_logs_lock = threading.Lock()
+        if Constants.SIGN_IN_AUDIT_LOG:
+            self.sign_in_log_thread = threading.Thread(target=self._sign_in_log_loop, daemon=True)
+            self.sign_in_log_thread.start()
+
+    @property
+    def achievement_service(self):
+        return self.services.achievement_service
+
+    @property
+    def tech_service(self):
+        return self.services.technology_service
+
+    @cached_property
+    def _all_technologies(self) -> List:
+        """全部科技，第一次检查自动解锁时才创建科技服务并查询，之后使用缓存"""
+        return self.tech_service.get_all_technologies()
 
     def _require_user(self, user_id: str, event: AstrMessageEvent) -> Generator[MessageEventResult, Any, User | None]:
         """校验用户是否存在，不存在直接返回提示"""
@@ -53,11 +78,37 @@ class UserService:
         """根据等级获取升级奖励金币"""
         return get_level_up_reward(level, self._level_rewards)
 
-    def check_and_unlock_technologies(self, user: User) -> List:
+    def check_and_unlock_technologies(self, user: User, ctx: Optional[CommandContext] = None) -> List:
         """检查并自动解锁符合条件的科技"""
-        user_tech_ids = {ut.tech_id for ut in self.tech_service.get_user_technologies(user.user_id)}
+        if ctx is None:
+            user_tech_ids = {ut.tech_id for ut in self.tech_service.get_user_technologies(user.user_id)}
+        else:
+            user_tech_ids = ctx.get_unlocked_tech_ids(user.user_id)
         unlocked = check_and_unlock_technologies(user, self._all_technologies, user_tech_ids)
-        return [t for t in unlocked if self.tech_service.unlock_technology(user.user_id, t.id)]
+
+        result = []
+        for tech in unlocked:
+            # 需要金币的科技照常收费；金币记在内存中的用户上，随用户一起写回（有 ctx 时在 flush 时写回）
+            if tech.required_gold > 0:
+                if user.gold < tech.required_gold:
+                    continue
+                user.gold -= tech.required_gold
+            # 等级、前置科技和金币已在上面检查过，不再重复校验和扣费
+            success, _ = self.tech_service.unlock_technology(user.user_id, tech.id, skip_checks=True)
+            if not success:
+                user.gold += tech.required_gold
+                continue
+            result.append(tech)
+            if ctx is not None:
+                # 解锁已直接写库，同步到内存中的用户并记为已写入，flush 时不再重复累加
+                user_tech_ids.add(tech.id)
+                if tech.effect_type == "auto_fishing":
+                    user.auto_fishing = True
+                    user.mark_saved('auto_fishing')
+                elif tech.effect_type == "fish_pond_capacity":
+                    user.fish_pond_capacity += tech.effect_value
+                    user.mark_saved('fish_pond_capacity')
+        return result
 
     async def register_command(self, event: AstrMessageEvent):
         """用户注册命令"""
@@ -75,8 +126,7 @@ class UserService:
         user = self.create_user(user_id, platform, group_id, nickname)
 
         # 为新用户发放新手木竿
-        equipment_service = EquipmentService(self.db)
-        rod_given = equipment_service.give_rod_to_user(user_id, Constants.STARTER_ROD_TEMPLATE_ID)
+        rod_given = self.services.equipment_service.give_rod_to_user(user_id, Constants.STARTER_ROD_TEMPLATE_ID)
 
         # 构建欢迎消息
         if rod_given:
@@ -91,29 +141,60 @@ class UserService:
         yield event.plain_result(welcome_message)
 
     async def sign_in_command(self, event: AstrMessageEvent):
+        """签到命令：连续天数和奖励在一条 UPDATE 中完成，只有升级时才读取用户"""
         user_id = event.get_sender_id()
-        user = self.get_user(user_id)
-        if not user:
-            yield event.plain_result(Messages.NOT_REGISTERED.value)
-            return
-
         today, yesterday = get_current_date(), get_yesterday_date()
-        if self.user_dao.check_sign_in(user_id, today):
-            yield event.plain_result(Messages.ALREADY_SIGNED_IN.value)
+        row = self.user_dao.sign_in(user_id, today, yesterday)
+        if not row:
+            if not self.user_dao.get_user_basic_info(user_id):
+                yield event.plain_result(Messages.NOT_REGISTERED.value)
+            else:
+                yield event.plain_result(Messages.ALREADY_SIGNED_IN.value)
             return
 
-        # 计算奖励
-        yesterday_record = self.user_dao.yesterday_record(user_id, yesterday)
-        streak = (yesterday_record['streak'] + 1) if yesterday_record else 1
+        streak = row['sign_in_streak']
         reward_gold, reward_exp = calculate_sign_in_rewards(streak)
-        user.gold += reward_gold
+        self._log_sign_in(user_id, today, streak, reward_gold)
 
-        exp_result = self.handle_user_exp_gain(user, reward_exp)
-        self.user_dao.record_sign_in(user_id, today, streak, reward_gold)
+        # 签到经验已写入，达到升级经验时再读取用户处理升级奖励、科技和成就
+        if self._calculate_level(row['exp']) > row['level']:
+            exp_result = self._check_level_up(self.get_user(user_id))
+        else:
+            exp_result = self._exp_result(row['level'])
 
         message = self._build_sign_in_message(reward_gold, reward_exp, streak, exp_result)
         yield event.plain_result(message)
 
+    def _log_sign_in(self, user_id: str, date: str, streak: int, reward_gold: int) -> None:
+        """登记一条签到记录，由后台线程批量写入 sign_in_logs"""
+        if not Constants.SIGN_IN_AUDIT_LOG:
+            return
+        with self._sign_in_logs_lock:
+            self._sign_in_logs.append((user_id, date, streak, reward_gold, int(time.time())))
+
+    def flush_sign_in_logs(self) -> int:
+        """把登记的签到记录一次性写入 sign_in_logs，返回写入的条数"""
+        with self._sign_in_logs_lock:
+            records, self._sign_in_logs = self._sign_in_logs, []
+        if not records:
+            return 0
+        if not self.user_dao.record_sign_ins(records):
+            # 写入失败时放回，下一轮重试
+            with self._sign_in_logs_lock:
+                self._sign_in_logs[:0] = records
+            return 0
+        metrics.incr("sign_in.logs", len(records))
+        return len(records)
+
+    def _sign_in_log_loop(self):
+        """签到记录批量写入循环"""
+        while True:
+            time.sleep(Constants.SIGN_IN_LOG_FLUSH_INTERVAL)
+            try:
+                self.flush_sign_in_logs()
+            except Exception as e:
+                logger.error(f"写入签到记录出错: {e}")
+
     def _build_sign_in_message(self, gold: int, exp: int, streak: int, exp_result: dict) -> str:
         parts = [
             "签到成功！",
@@ -192,9 +273,34 @@ class UserService:
             updated_at=now
         )
 
-        self.user_dao.create_user(user)
+        if self.user_dao.create_user(user) and group_id:
+            self.user_dao.touch_group(user_id, group_id, now)
+            with self._group_touches_lock:
+                self._group_touches[(user_id, group_id)] = now
         return user
 
+    def group_touch_due(self, user_id: str, group_id: str) -> bool:
+        """
+        用户在群里使用命令时调用，返回是否需要写入 user_groups
+
+        同一用户在同一个群里 Constants.GROUP_TOUCH_INTERVAL 秒内只写一次，其余只查内存
+        """
+        if not group_id:
+            return False
+        now = int(time.time())
+        key = (user_id, group_id)
+        with self._group_touches_lock:
+            if now - self._group_touches.get(key, 0) < Constants.GROUP_TOUCH_INTERVAL:
+                return False
+            if len(self._group_touches) >= Constants.GROUP_TOUCH_CACHE_SIZE:
+                self._group_touches.clear()
+            self._group_touches[key] = now
+        return True
+
+    def touch_group(self, user_id: str, group_id: str) -> bool:
+        """记录用户在群里活跃（未注册的用户不记录）"""
+        return self.user_dao.touch_group(user_id, group_id, int(time.time()))
+
     def update_user(self, user: User) -> None:
         """更新用户信息"""
         self.user_dao.update_user(user)
@@ -213,30 +319,49 @@ class UserService:
 
         return self.user_dao.deduct_gold(user_id, amount)
 
-    def handle_user_exp_gain(self, user: User, exp_amount: int) -> dict:
-        result = {
+    def handle_user_exp_gain(self, user: User, exp_amount: int, ctx: Optional[CommandContext] = None) -> dict:
+        """
+        处理经验增加和升级
+
+        传入 ctx 时只标记用户待写回，成就由调用方在命令末尾统一检查
+        """
+        if exp_amount <= 0:
+            return self._exp_result(user.level)
+
+        user.exp += exp_amount
+        return self._check_level_up(user, ctx)
+
+    @staticmethod
+    def _exp_result(level: int) -> dict:
+        """没有升级时的经验处理结果"""
+        return {
             'leveled_up': False,
-            'old_level': user.level,
-            'new_level': user.level,
+            'old_level': level,
+            'new_level': level,
             'level_up_reward': 0,
             'unlocked_techs': [],
             'newly_achievements': []
         }
-        if exp_amount <= 0:
-            return result
 
-        user.exp += exp_amount
+    def _check_level_up(self, user: User, ctx: Optional[CommandContext] = None) -> dict:
+        """按用户当前经验处理升级并写回（传入 ctx 时只标记待写回），没有 ctx 时检查成就"""
+        result = self._exp_result(user.level)
         old_level = user.level
         new_level = self._calculate_level(user.exp)
 
         if new_level > old_level:
-            self._process_level_up(user, old_level, new_level, result)
+            self._process_level_up(user, old_level, new_level, result, ctx)
+
+        if ctx is not None:
+            ctx.mark_dirty(user)
+            return result
 
         self.update_user(user)
         result['newly_achievements'] = self.achievement_service.check_achievements(user)
         return result
 
-    def _process_level_up(self, user: User, old_level: int, new_level: int, result: dict):
+    def _process_level_up(self, user: User, old_level: int, new_level: int, result: dict,
+                          ctx: Optional[CommandContext] = None):
         result.update({
             'leveled_up': True,
             'old_level': old_level,
@@ -245,7 +370,7 @@ class UserService:
         })
         user.gold += result['level_up_reward']
         user.level = new_level
-        result['unlocked_techs'] = self.check_and_unlock_technologies(user)
+        result['unlocked_techs'] = self.check_and_unlock_technologies(user, ctx)
 
     def handle_user_level_up(self, exp_result: dict) -> str:
         parts = []
@@ -0,0 +1,79 @@
+"""
+缓存相关的工具函数
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    线程安全的定长 LRU 缓存，超出容量时淘汰最久未使用的条目
+
+    max_size 不为空时还按 sizeof(value) 的总和限制容量；
+    on_evict 在淘汰条目后（锁外）以 (key, value) 调用，可用于把条目转存到其他位置
+    """
+
+    def __init__(self, max_entries: int, max_size: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = len,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """读取缓存，命中时将条目移到最近使用的位置"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """写入缓存"""
+        evicted = []
+        with self._lock:
+            if self.max_size is not None:
+                if key in self._entries:
+                    self.size -= self.sizeof(self._entries[key])
+                self.size += self.sizeof(value)
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_size is not None and self.size > self.max_size)):
+                evicted.append(self._pop_oldest())
+
+        if self.on_evict:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def _pop_oldest(self) -> tuple:
+        """淘汰最久未使用的条目（调用方持有锁）"""
+        key, value = self._entries.popitem(last=False)
+        if self.max_size is not None:
+            self.size -= self.sizeof(value)
+        return key, value
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """移除并返回缓存条目"""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value = self._entries.pop(key)
+            if self.max_size is not None:
+                self.size -= self.sizeof(value)
+            return value
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,121 @@
+"""
+有界线程池：把同步的数据库和图片渲染工作移出事件循环
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, List, Optional
+
+from ..enums.constants import Constants
+from ..enums.messages import Messages
+from .metrics import metrics
+
+
+class ExecutorBusyError(Exception):
+    """线程池排队已满"""
+
+
+class BoundedExecutor:
+    """
+    有界线程池
+
+    同时在执行和排队的任务总数不超过 max_workers + max_queue，超出时直接拒绝；
+    每个任务有超时时间，超时后调用方不再等待，但已开始的任务会在线程中执行完，
+    占用的名额在任务真正结束时才释放，避免超时任务把线程池撑爆
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._thread_state = threading.local()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        """线程池在首次提交任务时创建，shutdown 之后再次使用会重新创建"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix=f"gaismanor-{self.name}")
+            return self._pool
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """在线程池中执行 func，排队已满时抛出 ExecutorBusyError，超时抛出 asyncio.TimeoutError"""
+        if not self._slots.acquire(blocking=False):
+            metrics.incr(f"executor.{self.name}.rejected")
+            raise ExecutorBusyError(self.name)
+
+        submitted_at = time.perf_counter()
+
+        def task():
+            started_at = time.perf_counter()
+            metrics.observe(f"executor.{self.name}.wait", started_at - submitted_at)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metrics.observe(f"executor.{self.name}.run", time.perf_counter() - started_at)
+                self._slots.release()
+
+        try:
+            future = self._get_pool().submit(task)
+        except Exception:
+            self._slots.release()
+            raise
+
+        metrics.incr(f"executor.{self.name}.submitted")
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            metrics.incr(f"executor.{self.name}.timeouts")
+            raise
+
+    def _collect(self, handler: Callable, args: tuple) -> List[Any]:
+        """在工作线程自己的事件循环中跑完命令处理函数（异步生成器），收集所有结果"""
+        loop = getattr(self._thread_state, 'loop', None)
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread_state.loop = loop
+
+        async def collect():
+            return [result async for result in handler(*args)]
+
+        return loop.run_until_complete(collect())
+
+    async def run_command(self, handler: Callable[..., AsyncGenerator], event, *args,
+                          timeout: Optional[float] = None) -> AsyncGenerator:
+        """
+        在线程池中执行命令处理函数，并依次返回它产生的结果
+
+        服务层的命令处理函数内部都是同步调用，整段放到工作线程执行，事件循环只负责转发结果
+        """
+        try:
+            results = await self.run(self._collect, handler, (event,) + args, timeout=timeout)
+        except ExecutorBusyError:
+            yield event.plain_result(Messages.COMMAND_BUSY.value)
+            return
+        except asyncio.TimeoutError:
+            yield event.plain_result(Messages.COMMAND_TIMEOUT.value)
+            return
+
+        for result in results:
+            yield result
+
+    def shutdown(self) -> None:
+        """关闭线程池，不等待执行中的任务"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+# 数据库命令线程池
+db_executor = BoundedExecutor("db", Constants.DB_EXECUTOR_WORKERS,
+                              Constants.DB_EXECUTOR_QUEUE, Constants.DB_COMMAND_TIMEOUT)
+
+# 图片渲染线程池
+render_executor = BoundedExecutor("render", Constants.RENDER_EXECUTOR_WORKERS,
+                                  Constants.RENDER_EXECUTOR_QUEUE, Constants.RENDER_COMMAND_TIMEOUT)
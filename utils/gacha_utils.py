@@ -0,0 +1,132 @@
+"""
+抽卡相关的工具函数
+"""
+import random
+import threading
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# 卡池配置版本号：WebUI 修改卡池后递增，抽卡服务据此重新编译卡池
+_pool_version = 0
+_pool_version_lock = threading.Lock()
+
+GACHA_ITEM_TYPES = ("rod", "accessory", "bait")
+
+
+def bump_gacha_pool_version() -> int:
+    """卡池配置发生变化时调用，使已编译的卡池失效"""
+    global _pool_version
+    with _pool_version_lock:
+        _pool_version += 1
+        return _pool_version
+
+
+def get_gacha_pool_version() -> int:
+    """获取当前卡池配置版本号"""
+    return _pool_version
+
+
+class GachaItem(NamedTuple):
+    """编译后卡池中的物品，名称和稀有度随物品一起存放"""
+    item_type: str
+    template_id: int
+    name: str
+    rarity: int
+
+
+class AliasSampler:
+    """Walker/Vose 别名采样器：按权重抽样，每次抽样 O(1)"""
+
+    def __init__(self, values: Sequence, weights: Sequence[float]):
+        total = float(sum(weights))
+        if not values or total <= 0:
+            raise ValueError("采样器需要至少一个正权重")
+
+        n = len(values)
+        self.values = list(values)
+        self.probabilities = [weight / total for weight in weights]
+        self._prob = [0.0] * n
+        self._alias = [0] * n
+
+        scaled = [p * n for p in self.probabilities]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    def sample(self, rng: random.Random = random):
+        """抽取一个值"""
+        i = rng.randrange(len(self.values))
+        return self.values[i] if rng.random() < self._prob[i] else self.values[self._alias[i]]
+
+    def sample_many(self, count: int, seed: Optional[int] = None) -> List:
+        """
+        批量抽取 count 个值，安装了 numpy 时使用同一张别名表向量化抽样
+
+        主要用于概率校验和基准测试，线上抽卡仍逐次调用 sample
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            rng = random.Random(seed)
+            return [self.sample(rng) for _ in range(count)]
+
+        generator = np.random.default_rng(seed)
+        columns = generator.integers(0, len(self.values), size=count)
+        accept = generator.random(count) < np.asarray(self._prob)[columns]
+        indices = np.where(accept, columns, np.asarray(self._alias)[columns])
+        return np.asarray(self.values)[indices]
+
+
+class CompiledGachaPool:
+    """
+    编译后的卡池：(类型, 稀有度) → 物品列表，以及稀有度别名采样器
+
+    没有任何物品的稀有度不参与抽样，其余稀有度按配置权重重新归一化
+    """
+
+    def __init__(self, pool_id: int, name: str, description: str,
+                 rarity_weights: Dict[int, int], items: List[GachaItem]):
+        self.pool_id = pool_id
+        self.name = name
+        self.description = description
+        self.rarity_weights = dict(rarity_weights)
+        self.items = items
+
+        self.items_by_type_rarity: Dict[Tuple[str, int], Tuple[GachaItem, ...]] = {}
+        for item in items:
+            key = (item.item_type, item.rarity)
+            self.items_by_type_rarity[key] = self.items_by_type_rarity.get(key, ()) + (item,)
+
+        # 每个稀有度下实际有物品的类型
+        present = {}
+        for item_type, rarity in self.items_by_type_rarity:
+            present.setdefault(rarity, set()).add(item_type)
+        self.types_by_rarity: Dict[int, Tuple[str, ...]] = {
+            rarity: tuple(t for t in GACHA_ITEM_TYPES if t in types) for rarity, types in present.items()
+        }
+
+        self.effective_weights = {
+            rarity: weight for rarity, weight in sorted(self.rarity_weights.items())
+            if weight > 0 and rarity in self.types_by_rarity
+        }
+        self.rarity_sampler = AliasSampler(
+            list(self.effective_weights.keys()), list(self.effective_weights.values())
+        ) if self.effective_weights else None
+
+    def draw(self, rng: random.Random = random) -> Optional[GachaItem]:
+        """抽一次：先按权重抽稀有度，再在该稀有度下等概率选类型和物品，不访问数据库"""
+        if not self.rarity_sampler:
+            return None
+        rarity = self.rarity_sampler.sample(rng)
+        item_type = rng.choice(self.types_by_rarity[rarity])
+        return rng.choice(self.items_by_type_rarity[(item_type, rarity)])
+
+    def items_of_type(self, item_type: str) -> List[GachaItem]:
+        """按类型列出卡池物品"""
+        return [item for item in self.items if item.item_type == item_type]
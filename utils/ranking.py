@@ -0,0 +1,144 @@
+"""
+排行用的有序容器：按分数从高到低保存用户，支持增量更新、查名次和取前 k 名
+"""
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate, islice
+from typing import Iterator, List, Optional, Tuple
+
+# 容器中的条目：(-分数, 用户ID)，按元组升序即为分数从高到低、同分按用户ID排列
+RankKey = Tuple[float, str]
+
+
+class _AfterAll:
+    """比任何用户ID都大的占位，用来定位同一分数的最后一个条目之后"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_AFTER_ALL = _AfterAll()
+
+
+class RankedList:
+    """
+    按分数从高到低排列的用户列表（不加锁，由调用方加锁）
+
+    条目分块存放在若干个有序小列表中：插入、删除先用二分找到所在的块，只移动块内的元素；
+    块过大时一分为二，块为空时删除。各块起始位置的前缀和在修改后首次查询时重新计算，
+    名次、前 k 名和相邻用户都由二分和前缀和直接定位，不需要遍历整个列表
+    """
+
+    LOAD = 256  # 每块的目标大小，超过两倍时拆分
+
+    def __init__(self, keys: Optional[List[RankKey]] = None):
+        self._lists: List[List[RankKey]] = []
+        self._maxes: List[RankKey] = []
+        self._offsets: Optional[List[int]] = None
+        self._len = 0
+        if keys:
+            keys = sorted(keys)
+            self._lists = [keys[i:i + self.LOAD] for i in range(0, len(keys), self.LOAD)]
+            self._maxes = [sub[-1] for sub in self._lists]
+            self._len = len(keys)
+
+    @staticmethod
+    def make_key(user_id: str, score) -> RankKey:
+        return (-(score or 0), user_id)
+
+    def __len__(self) -> int:
+        return self._len
+
+    # ==================修改==================
+    def add(self, key: RankKey) -> None:
+        """插入一个条目"""
+        self._offsets = None
+        self._len += 1
+        if not self._maxes:
+            self._lists.append([key])
+            self._maxes.append(key)
+            return
+
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            pos -= 1
+            self._lists[pos].append(key)
+            self._maxes[pos] = key
+        else:
+            insort(self._lists[pos], key)
+
+        sub = self._lists[pos]
+        if len(sub) > self.LOAD * 2:
+            half = sub[self.LOAD:]
+            del sub[self.LOAD:]
+            self._maxes[pos] = sub[-1]
+            self._lists.insert(pos + 1, half)
+            self._maxes.insert(pos + 1, half[-1])
+
+    def remove(self, key: RankKey) -> bool:
+        """删除一个条目，条目不存在时返回 False"""
+        pos = bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            return False
+        sub = self._lists[pos]
+        idx = bisect_left(sub, key)
+        if sub[idx] != key:
+            return False
+
+        self._offsets = None
+        self._len -= 1
+        del sub[idx]
+        if sub:
+            self._maxes[pos] = sub[-1]
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+        return True
+
+    # ==================查询==================
+    def _index(self, key, right: bool = False) -> int:
+        """key 在整个列表中的插入位置（bisect_left / bisect_right）"""
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(map(len, self._lists))]
+        bisect = bisect_right if right else bisect_left
+        pos = bisect(self._maxes, key)
+        if pos == len(self._maxes):
+            return self._len
+        return self._offsets[pos] + bisect(self._lists[pos], key)
+
+    def _iter_from(self, index: int) -> Iterator[RankKey]:
+        """从第 index 个条目（从 0 开始）往后遍历"""
+        if index >= self._len:
+            return
+        if self._offsets is None:
+            self._offsets = [0, *accumulate(map(len, self._lists))]
+        pos = bisect_right(self._offsets, index) - 1
+        yield from self._lists[pos][index - self._offsets[pos]:]
+        for sub in islice(self._lists, pos + 1, None):
+            yield from sub
+
+    def count_above(self, score) -> int:
+        """分数高于 score 的条目数"""
+        return self._index((-(score or 0),))
+
+    def rank(self, score) -> int:
+        """分数为 score 的用户的名次（同分同名次）"""
+        return self.count_above(score) + 1
+
+    def top(self, limit: int) -> List[RankKey]:
+        """前 limit 个条目"""
+        return list(islice(self._iter_from(0), limit))
+
+    def neighbors(self, score, limit: int = 1) -> Tuple[List[RankKey], List[RankKey]]:
+        """
+        分数紧挨着 score 的条目：(分数更高的 limit 个, 分数更低的 limit 个)，都按分数从高到低排列，
+        分数相同的不算
+        """
+        above_end = self._index((-(score or 0),))
+        above_start = max(above_end - limit, 0)
+        above = list(islice(self._iter_from(above_start), above_end - above_start))
+        below_start = self._index((-(score or 0), _AFTER_ALL), right=True)
+        below = list(islice(self._iter_from(below_start), limit))
+        return above, below
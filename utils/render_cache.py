@@ -0,0 +1,179 @@
+"""
+渲染结果缓存：按渲染输入的哈希缓存编码后的图片字节
+"""
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from .cache import LRUCache
+from .metrics import metrics
+
+
+def directory_fingerprint(path: str) -> str:
+    """目录中文件名、大小和修改时间的哈希，文件有变化时结果随之改变；目录不存在时返回空字符串"""
+    try:
+        entries = sorted(
+            (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+            for entry in os.scandir(path) if entry.is_file()
+        )
+    except OSError:
+        return ''
+    return RenderCache.make_key(entries)[:16]
+
+
+class RenderCache:
+    """
+    内容寻址的渲染缓存
+
+    键是渲染输入（图片类型、绘图数据、输出格式和质量）规范化 JSON 的 SHA-256，
+    输入完全相同时直接返回之前的图片字节。内存中按条目数和总字节数做 LRU 淘汰，
+    配置了 spill_dir 时被淘汰的条目转存到磁盘（文件名即哈希，不会互相覆盖），
+    磁盘同样按总字节数淘汰最旧的文件。相同输入的并发请求只渲染一次，其余请求等待同一个结果
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int,
+                 spill_dir: Optional[str] = None, spill_max_bytes: int = 0):
+        self._memory = LRUCache(max_entries, max_size=max_bytes, on_evict=self._spill)
+        self.spill_dir = spill_dir if spill_dir and spill_max_bytes > 0 else None
+        self.spill_max_bytes = spill_max_bytes
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        # 磁盘上的缓存文件：键 → 文件大小，按写入先后排列
+        self._disk: Dict[str, int] = {}
+        self._disk_bytes = 0
+        if self.spill_dir:
+            self._load_spill_dir()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """计算渲染输入的哈希键"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    # ==================磁盘==================
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.bin")
+
+    def _load_spill_dir(self) -> None:
+        """启动时登记磁盘上已有的缓存文件，按修改时间排序"""
+        os.makedirs(self.spill_dir, exist_ok=True)
+        files = []
+        for name in os.listdir(self.spill_dir):
+            if name.endswith('.bin'):
+                path = os.path.join(self.spill_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+        self._trim_disk()
+
+    def _spill(self, key: str, data: bytes) -> None:
+        """内存淘汰的条目写入磁盘"""
+        if not self.spill_dir or len(data) > self.spill_max_bytes:
+            return
+        path = self._spill_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"写入渲染缓存文件失败: {e}")
+            return
+
+        with self._lock:
+            self._disk_bytes += len(data) - self._disk.pop(key, 0)
+            self._disk[key] = len(data)
+            self._trim_disk()
+        metrics.incr("render.cache.spills")
+
+    def _trim_disk(self) -> None:
+        """删除最旧的缓存文件，直到磁盘占用不超过上限（调用方持有锁或在初始化中）"""
+        while self._disk and self._disk_bytes > self.spill_max_bytes:
+            key = next(iter(self._disk))
+            self._disk_bytes -= self._disk.pop(key)
+            try:
+                os.remove(self._spill_path(key))
+            except OSError:
+                pass
+
+    def _load_spilled(self, key: str) -> Optional[bytes]:
+        """从磁盘读取缓存，读取后移回内存"""
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is None:
+                return None
+            self._disk_bytes -= size
+        path = self._spill_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.remove(path)
+        except OSError:
+            return None
+        self._memory.set(key, data)
+        return data
+
+    # ==================读取==================
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存，先查内存再查磁盘"""
+        data = self._memory.get(key)
+        if data is not None:
+            metrics.incr("render.cache.hits")
+            return data
+        if self.spill_dir:
+            data = self._load_spilled(key)
+            if data is not None:
+                metrics.incr("render.cache.disk_hits")
+                return data
+        return None
+
+    def get_or_render(self, key: str, render: Callable[[], bytes], timeout: Optional[float] = None) -> bytes:
+        """读取缓存，未命中时渲染；同一个键同时只有一个渲染在执行"""
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            metrics.incr("render.cache.shared")
+            return future.result(timeout)
+
+        metrics.incr("render.cache.misses")
+        try:
+            data = render()
+            self._memory.set(key, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """缓存占用情况"""
+        with self._lock:
+            disk_entries, disk_bytes, inflight = len(self._disk), self._disk_bytes, len(self._inflight)
+        return {
+            'memory_entries': len(self._memory),
+            'memory_bytes': self._memory.size,
+            'disk_entries': disk_entries,
+            'disk_bytes': disk_bytes,
+            'inflight': inflight,
+        }
+
+    def clear(self) -> None:
+        """清空内存缓存（磁盘文件保留，按容量自然淘汰）"""
+        self._memory.clear()
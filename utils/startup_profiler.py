@@ -0,0 +1,119 @@
+"""
+插件启动耗时分析：记录每个模块的导入耗时和初始化各阶段耗时
+"""
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .metrics import metrics
+
+
+def _absolute_name(name: str, globals_: Optional[dict], level: int) -> str:
+    """把 import 语句中的相对模块名解析为绝对模块名"""
+    if level == 0 or not globals_:
+        return name
+    package = globals_.get('__package__') or ''
+    parts = package.rsplit('.', level - 1) if level > 1 else [package]
+    base = parts[0]
+    return f"{base}.{name}" if name else base
+
+
+class StartupProfiler:
+    """
+    启动耗时分析器
+
+    start 到 finish 之间替换内置的 __import__，记录首次导入的每个模块的自身耗时
+    （不含它导入的子模块），phase 记录初始化阶段耗时；finish 时把结果写入 metrics：
+    startup.import.<模块>、startup.phase.<阶段>、startup.total
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._original_import = None
+        self._local = threading.local()
+        self._started_at = 0.0
+        self.imports: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self.total = 0.0
+
+    def start(self) -> None:
+        """开始记录（插件重载时重新计时）"""
+        with self._lock:
+            self.imports = {}
+            self.phases = {}
+            self.total = 0.0
+            self._started_at = time.perf_counter()
+            if self._original_import is None:
+                self._original_import = builtins.__import__
+                builtins.__import__ = self._timed_import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        if original is None:
+            return builtins.__import__(name, globals, locals, fromlist, level)
+
+        # 只计首次导入：模块本身，或 from 包 import 子模块 中尚未导入的子模块
+        module_name = _absolute_name(name, globals, level)
+        if module_name in sys.modules:
+            pending = [f"{module_name}.{item}" for item in fromlist or ()
+                       if item != '*' and f"{module_name}.{item}" not in sys.modules]
+            if not pending:
+                return original(name, globals, locals, fromlist, level)
+            module_name = pending[0]
+
+        # 子模块的耗时记在自己名下，从父模块的耗时中扣除
+        stack: List[float] = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.imports[module_name] = self.imports.get(module_name, 0.0) + max(0.0, elapsed - children)
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个初始化阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def finish(self) -> float:
+        """停止记录并写入指标，返回从 start 到现在的总耗时（秒）"""
+        with self._lock:
+            if self._original_import is not None:
+                builtins.__import__ = self._original_import
+                self._original_import = None
+            self.total = time.perf_counter() - self._started_at
+
+        for module_name, seconds in self.imports.items():
+            metrics.observe(f"startup.import.{module_name}", seconds)
+        for phase_name, seconds in self.phases.items():
+            metrics.observe(f"startup.phase.{phase_name}", seconds)
+        metrics.observe("startup.total", self.total)
+        return self.total
+
+    def slowest_imports(self, limit: int = 10) -> List[tuple]:
+        """导入耗时最多的模块"""
+        return sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def report(self, limit: int = 10) -> str:
+        """生成文本报告"""
+        lines = [f"启动总耗时: {self.total * 1000:.1f}ms"]
+        for phase_name, seconds in self.phases.items():
+            lines.append(f"  阶段 {phase_name}: {seconds * 1000:.1f}ms")
+        for module_name, seconds in self.slowest_imports(limit):
+            lines.append(f"  导入 {module_name}: {seconds * 1000:.1f}ms")
+        return "\n".join(lines)
+
+
+# 全局启动分析器
+startup_profiler = StartupProfiler()
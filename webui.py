@@ -1,5 +1,6 @@
 from flask import Flask, render_template, jsonify, request, redirect, url_for, session, flash
-from .models.database import DatabaseManager
+from .models.database import DatabaseManager, LEADERBOARD_COLUMNS
+from .utils.gacha_utils import bump_gacha_pool_version
 import threading
 import webbrowser
 import time
@@ -8,12 +9,14 @@ import hashlib
 
 app = Flask(__name__)
 db_manager = None
+services = None  # 插件的服务容器，排行榜等接口使用
 secret_key = "SecretKey"  # 默认密钥
 
-def init_webui(db_mgr, sec_key):
+def init_webui(db_mgr, sec_key, service_container=None):
     """初始化WebUI"""
-    global db_manager, secret_key
+    global db_manager, services, secret_key
     db_manager = db_mgr
+    services = service_container
     secret_key = sec_key
     app.secret_key = hashlib.sha256(sec_key.encode()).hexdigest()
 
@@ -118,6 +121,7 @@ def add_user():
                VALUES (?, 'unknown', ?, ?, ?, ?, 0, 0, 0, FALSE, 0, ?, ?)""",
             (user_id, nickname, gold, exp, level, current_time, current_time)
         )
+        db_manager.notify_user_changed(user_id)
 
         return jsonify({'message': 'User added successfully'}), 201
     except Exception as e:
@@ -148,6 +152,7 @@ def update_user(user_id):
                WHERE user_id=?""",
             (nickname, gold, exp, level, auto_fishing, updated_at, user_id)
         )
+        db_manager.notify_user_changed(user_id)
 
         return jsonify({'message': 'User updated successfully'}), 200
     except Exception as e:
@@ -173,14 +178,43 @@ def delete_user(user_id):
         db_manager.execute_query("DELETE FROM user_titles WHERE user_id=?", (user_id,))
         db_manager.execute_query("DELETE FROM tax_logs WHERE user_id=?", (user_id,))
         db_manager.execute_query("DELETE FROM sign_in_logs WHERE user_id=?", (user_id,))
+        db_manager.execute_query("DELETE FROM user_groups WHERE user_id=?", (user_id,))
 
         # 删除用户
         db_manager.execute_query("DELETE FROM users WHERE user_id=?", (user_id,))
+        db_manager.notify_user_changed(user_id)
 
         return jsonify({'message': 'User deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/leaderboard', methods=['GET'])
+@login_required
+def get_leaderboard():
+    """获取排行榜（由内存排行提供），可按群筛选"""
+    if not services:
+        return jsonify({'error': 'Services not initialized'}), 500
+
+    board = request.args.get('board', 'comprehensive')
+    if board not in LEADERBOARD_COLUMNS:
+        return jsonify({'error': 'Invalid board'}), 400
+
+    try:
+        group_id = request.args.get('group_id') or None
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        entries = services.rank_service.top(board, group_id, limit)
+        return jsonify({
+            'board': board,
+            'group_id': group_id,
+            'entries': [
+                {'rank': i + 1, 'user_id': entry.user_id, 'nickname': entry.nickname, 'score': entry.score}
+                for i, entry in enumerate(entries)
+            ]
+        }), 200
+    except Exception as e:
+        print(f"获取排行榜失败: {e}")
+        return jsonify({'error': str(e)}), 500
+
 # 鱼类数据路由
 @app.route('/fish')
 @login_required
@@ -803,83 +837,79 @@ def update_gacha_pool(pool_id):
         rarity_weights = data.get('rarity_weights')
         items = data.get('items', {})
 
-        # 更新卡池基本信息
-        if name or description:
-            update_fields = []
-            update_values = []
-            if name:
-                update_fields.append("name = ?")
-                update_values.append(name)
-            if description:
-                update_fields.append("description = ?")
-                update_values.append(description)
-
-            if update_fields:
-                current_time = int(time.time())
-                update_values.append(current_time)
-                update_values.append(pool_id)
-                db_manager.execute_query(
-                    f"UPDATE gacha_pools SET {', '.join(update_fields)}, updated_at = ? WHERE id = ?",
-                    update_values
-                )
+        # 在同一个事务中更新卡池，避免抽卡服务编译到更新了一半的配置
+        with db_manager.transaction() as conn:
+            # 更新卡池基本信息
+            if name or description:
+                update_fields = []
+                update_values = []
+                if name:
+                    update_fields.append("name = ?")
+                    update_values.append(name)
+                if description:
+                    update_fields.append("description = ?")
+                    update_values.append(description)
+
+                if update_fields:
+                    current_time = int(time.time())
+                    update_values.append(current_time)
+                    update_values.append(pool_id)
+                    conn.execute(
+                        f"UPDATE gacha_pools SET {', '.join(update_fields)}, updated_at = ? WHERE id = ?",
+                        update_values
+                    )
 
-        # 更新稀有度权重
-        if rarity_weights:
-            # 先删除现有的权重配置
-            db_manager.execute_query(
-                "DELETE FROM gacha_pool_rarity_weights WHERE pool_id = ?",
-                (pool_id,)
-            )
+            # 更新稀有度权重
+            if rarity_weights:
+                # 先删除现有的权重配置
+                conn.execute(
+                    "DELETE FROM gacha_pool_rarity_weights WHERE pool_id = ?",
+                    (pool_id,)
+                )
 
-            # 插入新的权重配置
-            current_time = int(time.time())
-            for rarity, weight in rarity_weights.items():
-                db_manager.execute_query(
+                # 插入新的权重配置
+                current_time = int(time.time())
+                conn.executemany(
                     """INSERT INTO gacha_pool_rarity_weights
                        (pool_id, rarity, weight, created_at)
                        VALUES (?, ?, ?, ?)""",
-                    (pool_id, int(rarity), int(weight), current_time)
+                    [(pool_id, int(rarity), int(weight), current_time) for rarity, weight in rarity_weights.items()]
                 )
 
-        # 更新物品配置
-        if items:
-            # 先删除现有的物品配置
-            db_manager.execute_query(
-                "DELETE FROM gacha_pool_items WHERE pool_id = ?",
-                (pool_id,)
-            )
+            # 更新物品配置
+            if items:
+                # 先删除现有的物品配置
+                conn.execute(
+                    "DELETE FROM gacha_pool_items WHERE pool_id = ?",
+                    (pool_id,)
+                )
 
-            # 插入新的物品配置
-            current_time = int(time.time())
-            for item_type, item_ids in items.items():
-                for item_id in item_ids:
-                    # 获取物品的稀有度
-                    rarity = 1
-                    if item_type == "rod":
-                        item = db_manager.fetch_one(
-                            "SELECT rarity FROM rod_templates WHERE id = ?",
-                            (item_id,)
-                        )
-                    elif item_type == "accessory":
-                        item = db_manager.fetch_one(
-                            "SELECT rarity FROM accessory_templates WHERE id = ?",
-                            (item_id,)
-                        )
-                    elif item_type == "bait":
-                        item = db_manager.fetch_one(
-                            "SELECT rarity FROM bait_templates WHERE id = ?",
-                            (item_id,)
+                # 插入新的物品配置
+                current_time = int(time.time())
+                template_tables = {"rod": "rod_templates", "accessory": "accessory_templates", "bait": "bait_templates"}
+                for item_type, item_ids in items.items():
+                    for item_id in item_ids:
+                        # 获取物品的稀有度
+                        rarity = 1
+                        item = None
+                        if item_type in template_tables:
+                            item = conn.execute(
+                                f"SELECT rarity FROM {template_tables[item_type]} WHERE id = ?",
+                                (item_id,)
+                            ).fetchone()
+
+                        if item:
+                            rarity = item['rarity']
+
+                        conn.execute(
+                            """INSERT INTO gacha_pool_items
+                               (pool_id, item_type, item_template_id, rarity, weight, created_at)
+                               VALUES (?, ?, ?, ?, ?, ?)""",
+                            (pool_id, item_type, item_id, rarity, 100, current_time)
                         )
 
-                    if item:
-                        rarity = item['rarity']
-
-                    db_manager.execute_query(
-                        """INSERT INTO gacha_pool_items
-                           (pool_id, item_type, item_template_id, rarity, weight, created_at)
-                           VALUES (?, ?, ?, ?, ?, ?)""",
-                        (pool_id, item_type, item_id, rarity, 100, current_time)
-                    )
+        # 通知抽卡服务重新编译卡池
+        bump_gacha_pool_version()
 
         return jsonify({'message': '卡池更新成功'}), 200
     except Exception as e:
@@ -915,6 +945,42 @@ def get_all_items_for_gacha():
         print(f"获取物品列表失败: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/market/price_history/<item_type>/<int:template_id>', methods=['GET'])
+@login_required
+def get_market_price_history(item_type, template_id):
+    """获取物品的每日行情曲线数据（与 /市场行情 命令同样经市场服务读取每日汇总表）"""
+    if not services:
+        return jsonify({'error': 'Services not initialized'}), 500
+
+    if item_type not in ('fish', 'rod', 'accessory', 'bait'):
+        return jsonify({'error': 'Invalid item type'}), 400
+
+    try:
+        days = max(1, min(request.args.get('days', 30, type=int), 365))
+        history = services.market_service.get_price_history(item_type, template_id, days)
+
+        series = []
+        for day in history['days']:
+            series.append({
+                'day': day['day'],
+                'trade_count': day['trade_count'],
+                'min_price': day['min_price'],
+                'max_price': day['max_price'],
+                'avg_price': round(day['avg_price'], 2),
+                'last_price': day['last_price']
+            })
+
+        return jsonify({
+            'item_type': item_type,
+            'template_id': template_id,
+            'days': days,
+            'series': series,
+            'summary': history['summary']
+        }), 200
+    except Exception as e:
+        print(f"获取市场行情失败: {e}")
+        return jsonify({'error': str(e)}), 500
+
 def start_webui(port):
     """启动WebUI"""
     app.run(host='0.0.0.0', port=port, debug=False, use_reloader=False)